@@ -0,0 +1,426 @@
+"""サンプルファイルを繰り返し lint させ、スループット・レイテンシ・エラー率・メモリ量を計測する。
+
+    python -m benchmarks.load_test [--target inprocess|http|asgi] [オプション]
+
+target ごとの lint の呼び出し方:
+    inprocess: プロセスプールのワーカーで OpenDataLinter を実行する (--pool-size 0 で呼び出し元のスレッド)
+    http: --url に POST する。本文はファイルの内容、クエリ文字列 filename にファイル名を渡す
+    asgi: --app (module:attr) の ASGI アプリを、http と同じリクエストで同じプロセス内から呼び出す
+いずれも例外・タイムアウト・2xx 以外のステータスをエラーとして数える。
+lint 結果の違反 (読み込みエラーを含む) はエラーではない。
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from benchmarks.memory_benchmark import gen_csv
+from opendatalinter import OpenDataLinter
+from opendatalinter.schema_store import SchemaStore
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "tests", "samples")
+
+
+@dataclass
+class Sample:
+    name: str
+    data: bytes
+
+
+@dataclass
+class LoadReport:
+    requests: int
+    errors: int
+    elapsed: float
+    latencies: List[float]
+    # ワーカーのプロセス ID ごとの最大 RSS (バイト)
+    worker_max_rss: Dict[int, int] = field(default_factory=dict)
+    error_messages: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return float("nan")
+        return float(np.percentile(self.latencies, q))
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": self.error_rate,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "worker_max_rss": self.worker_max_rss,
+            "error_messages": self.error_messages,
+        }
+
+
+def build_corpus(paths: Sequence[str] = (SAMPLES_DIR, ),
+                 large_rows: int = 100000,
+                 include_malformed: bool = True) -> List[Sample]:
+    """ファイル・ディレクトリ直下のファイルと、合成した大きなファイル・壊れたファイルを集める。"""
+    corpus = []
+    for path in paths:
+        names = sorted(os.listdir(path)) if os.path.isdir(path) else [path]
+        for name in names:
+            file_path = os.path.join(path, name) if os.path.isdir(
+                path) else name
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    corpus.append(Sample(os.path.basename(file_path),
+                                         f.read()))
+    if large_rows > 0:
+        corpus.append(Sample(f"large_{large_rows}.csv", gen_csv(large_rows)))
+    if include_malformed:
+        corpus.extend(gen_malformed_samples())
+    return corpus
+
+
+def gen_malformed_samples() -> List[Sample]:
+    rnd = random.Random(0)
+    ragged = "\n".join(",".join(["a"] * rnd.randint(1, 8))
+                       for _ in range(1000))
+    return [
+        Sample("invalid_utf8.csv", b"a,b\n\xff\xfe\x80,1\n" * 100),
+        Sample("ragged.csv", ragged.encode()),
+        Sample("unclosed_quote.csv", b'a,b\n"1,2\n3,4\n' * 100),
+        Sample("binary.csv", bytes(rnd.getrandbits(8) for _ in range(4096))),
+        Sample("empty.csv", b""),
+        Sample("truncated.xlsx", b"PK\x03\x04" + b"\x00" * 64),
+    ]
+
+
+def _lint(data: bytes, filename: str, engine: Optional[str],
+          timeout: Optional[float]) -> Tuple[int, int]:
+    # 結果は捨て、ワーカーのプロセス ID と最大 RSS を返す
+    OpenDataLinter(data,
+                   filename,
+                   engine=engine,
+                   schema_store=_worker_schema_store,
+                   timeout=timeout).run()
+    return os.getpid(), _max_rss()
+
+
+_worker_schema_store: Optional[SchemaStore] = None
+
+
+def _init_worker(schema_store_path: Optional[str], use_schema_store: bool):
+    global _worker_schema_store
+    _worker_schema_store = SchemaStore(
+        schema_store_path) if use_schema_store else None
+
+
+def _max_rss() -> int:
+    # Linux の ru_maxrss は KiB、macOS はバイト
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class InProcessTarget:
+    """プロセスプールのワーカーで lint する。pool_size が 0 の場合は呼び出し元のスレッドで lint する。
+
+    Args:
+        use_schema_store: ワーカーごとに SchemaStore を使い、列の分類を再利用する
+    """
+    def __init__(self,
+                 pool_size: int = 0,
+                 engine: Optional[str] = None,
+                 timeout: Optional[float] = None,
+                 use_schema_store: bool = False,
+                 schema_store_path: Optional[str] = None):
+        self.engine = engine
+        self.timeout = timeout
+        self.__pool = None
+        if pool_size > 0:
+            self.__pool = ProcessPoolExecutor(pool_size,
+                                              initializer=_init_worker,
+                                              initargs=(schema_store_path,
+                                                        use_schema_store))
+        else:
+            _init_worker(schema_store_path, use_schema_store)
+
+    def request(self, sample: Sample) -> Tuple[int, int]:
+        args = (sample.data, sample.name, self.engine, self.timeout)
+        if self.__pool is None:
+            return _lint(*args)
+        return self.__pool.submit(_lint, *args).result()
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.shutdown()
+
+
+class HTTPTarget:
+    """起動済みの lint の HTTP エンドポイントに POST する。
+
+    Args:
+        server_pid: 同じホストのサーバーのプロセス ID。指定した場合は /proc から最大 RSS を読む
+    """
+    def __init__(self,
+                 url: str,
+                 timeout: Optional[float] = None,
+                 server_pid: Optional[int] = None):
+        self.url = url
+        self.timeout = timeout
+        self.server_pid = server_pid
+
+    def request(self, sample: Sample) -> Tuple[int, int]:
+        url = self.url + ("&" if "?" in self.url else "?") + \
+            urllib.parse.urlencode({"filename": sample.name})
+        req = urllib.request.Request(
+            url,
+            data=sample.data,
+            method="POST",
+            headers={"Content-Type": "application/octet-stream"})
+        # 2xx 以外のステータスは HTTPError として送出される
+        with urllib.request.urlopen(req, timeout=self.timeout) as res:
+            res.read()
+        if self.server_pid is None:
+            return 0, 0
+        return self.server_pid, _read_proc_max_rss(self.server_pid)
+
+    def close(self):
+        pass
+
+
+class ASGITarget:
+    """ASGI アプリを同じプロセス内で呼び出す。アプリは専用スレッドの1つのイベントループで実行する。"""
+    def __init__(self, app, path: str = "/", timeout: Optional[float] = None):
+        self.app = app
+        self.path = path
+        self.timeout = timeout
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever,
+                                         daemon=True)
+        self.__thread.start()
+
+    @classmethod
+    def from_spec(cls, spec: str, **kwargs):
+        """"module:attr" 形式で指定された ASGI アプリを読み込む。"""
+        module_name, attr = spec.split(":", 1)
+        return cls(getattr(importlib.import_module(module_name), attr),
+                   **kwargs)
+
+    def request(self, sample: Sample) -> Tuple[int, int]:
+        future = asyncio.run_coroutine_threadsafe(self.__call(sample),
+                                                  self.__loop)
+        status = future.result(self.timeout)
+        if not 200 <= status < 300:
+            raise RuntimeError(f"HTTP {status}")
+        return os.getpid(), _max_rss()
+
+    async def __call(self, sample: Sample) -> int:
+        scope = {
+            "type": "http",
+            "asgi": {
+                "version": "3.0"
+            },
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "query_string": urllib.parse.urlencode({
+                "filename": sample.name
+            }).encode(),
+            "headers": [(b"content-type", b"application/octet-stream"),
+                        (b"content-length", str(len(sample.data)).encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        received = False
+        status = []
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {"type": "http.disconnect"}
+            received = True
+            return {"type": "http.request", "body": sample.data}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await self.app(scope, receive, send)
+        return status[0] if status else 500
+
+    def close(self):
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+
+
+def _read_proc_max_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def run_load(target,
+             corpus: Sequence[Sample],
+             requests: int,
+             concurrency: int = 1) -> LoadReport:
+    """concurrency 個のクライアントから、コーパスを順に requests 回 target に送る。
+
+    Note:
+        レイテンシは成功したリクエストのみから求める。
+    """
+    samples = itertools.cycle(corpus)
+    lock = threading.Lock()
+    remaining = [requests]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    worker_max_rss: Dict[int, int] = {}
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                sample = next(samples)
+            started_at = time.perf_counter()
+            try:
+                pid, rss = target.request(sample)
+            except Exception as e:
+                with lock:
+                    key = f"{sample.name}: {type(e).__name__}"
+                    errors[key] = errors.get(key, 0) + 1
+                continue
+            latency = time.perf_counter() - started_at
+            with lock:
+                latencies.append(latency)
+                if pid:
+                    worker_max_rss[pid] = max(worker_max_rss.get(pid, 0), rss)
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started_at
+    return LoadReport(requests=requests,
+                      errors=sum(errors.values()),
+                      elapsed=elapsed,
+                      latencies=latencies,
+                      worker_max_rss=worker_max_rss,
+                      error_messages=errors)
+
+
+def print_report(report: LoadReport):
+    print(f"requests: {report.requests}, errors: {report.errors} "
+          f"({report.error_rate:.1%}), elapsed: {report.elapsed:.2f}s")
+    print(f"throughput: {report.throughput:.2f} req/s")
+    print(f"latency p50: {report.percentile(50) * 1000:.1f}ms, "
+          f"p95: {report.percentile(95) * 1000:.1f}ms, "
+          f"p99: {report.percentile(99) * 1000:.1f}ms")
+    for pid, rss in sorted(report.worker_max_rss.items()):
+        print(f"worker {pid}: max rss {rss / 2**20:.1f}Mi")
+    for key, count in sorted(report.error_messages.items()):
+        print(f"error {key}: {count}")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test")
+    parser.add_argument("--target",
+                        choices=["inprocess", "http", "asgi"],
+                        default="inprocess")
+    parser.add_argument("--url", help="http: lint のエンドポイント")
+    parser.add_argument("--server-pid",
+                        type=int,
+                        help="http: メモリ量を計測するサーバーのプロセス ID")
+    parser.add_argument("--app", help="asgi: module:attr 形式の ASGI アプリ")
+    parser.add_argument("--path", default="/", help="asgi: リクエストのパス")
+    parser.add_argument("--corpus",
+                        nargs="*",
+                        default=[SAMPLES_DIR],
+                        help="サンプルのファイルまたはディレクトリ")
+    parser.add_argument("--large-rows",
+                        type=int,
+                        default=100000,
+                        help="合成する大きな CSV の行数。0 の場合は合成しない")
+    parser.add_argument("--no-malformed",
+                        action="store_true",
+                        help="壊れたファイルを合成しない")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size",
+                        type=int,
+                        default=os.cpu_count(),
+                        help="inprocess: ワーカーのプロセス数")
+    parser.add_argument("--engine", help="inprocess: pandas または pyarrow")
+    parser.add_argument("--schema-store",
+                        action="store_true",
+                        help="inprocess: 列の分類をワーカーごとに再利用する")
+    parser.add_argument("--schema-store-path",
+                        help="inprocess: 列の分類を保存するファイル")
+    parser.add_argument("--timeout", type=float, help="1リクエストのタイムアウト (秒)")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    args = parser.parse_args(args)
+
+    if args.target == "http":
+        if not args.url:
+            parser.error("--url is required for the http target")
+        target = HTTPTarget(args.url,
+                            timeout=args.timeout,
+                            server_pid=args.server_pid)
+    elif args.target == "asgi":
+        if not args.app:
+            parser.error("--app is required for the asgi target")
+        target = ASGITarget.from_spec(args.app,
+                                      path=args.path,
+                                      timeout=args.timeout)
+    else:
+        target = InProcessTarget(args.pool_size,
+                                 engine=args.engine,
+                                 timeout=args.timeout,
+                                 use_schema_store=args.schema_store
+                                 or args.schema_store_path is not None,
+                                 schema_store_path=args.schema_store_path)
+
+    corpus = build_corpus(args.corpus,
+                          large_rows=args.large_rows,
+                          include_malformed=not args.no_malformed)
+    try:
+        report = run_load(target, corpus, args.requests, args.concurrency)
+    finally:
+        target.close()
+    if args.json:
+        print(json.dumps(report.to_dict()))
+    else:
+        print(f"target: {args.target}, samples: {len(corpus)}, "
+              f"concurrency: {args.concurrency}")
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""表の保持に使われるメモリ量を、compact の有無で比較する。
+
+    python -m benchmarks.memory_benchmark [行数]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+
+from opendatalinter import CSVLinter
+from opendatalinter.regex import VALID_PREFECTURE_NAME
+
+
+def gen_csv(row_count: int) -> bytes:
+    rnd = random.Random(0)
+    lines = ["都道府県,都道府県コード,年,人口,備考"]
+    for i in range(row_count):
+        code = rnd.randint(1, 47)
+        lines.append(",".join([
+            VALID_PREFECTURE_NAME[code - 1],
+            str(code),
+            f"平成{rnd.randint(1, 31)}年",
+            str(rnd.randint(0, 100000)),
+            rnd.choice(["***", "X", "-", ""]),
+        ]))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def measure(data: bytes, compact: bool):
+    gc.collect()
+    tracemalloc.start()
+    linter = CSVLinter(data, "benchmark.csv", compact=compact)
+    linter.prepare(["header_df", "df"])
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return linter.df.memory_usage(deep=True).sum(), retained, peak
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    data = gen_csv(row_count)
+    print(f"rows: {row_count}, file size: {len(data) / 2**20:.1f} MiB")
+    print(f"{'compact':>8} {'df':>12} {'retained':>12} {'peak':>12}")
+    for compact in [False, True]:
+        df_size, retained, peak = measure(data, compact)
+        print(f"{str(compact):>8} {df_size / 2**20:>10.1f}Mi "
+              f"{retained / 2**20:>10.1f}Mi {peak / 2**20:>10.1f}Mi")
+
+
+if __name__ == "__main__":
+    main()
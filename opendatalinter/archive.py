@@ -0,0 +1,96 @@
+import gzip
+import os
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+from .csv_linter import CSVLinter
+from .open_data_linter import OpenDataLinter
+from .vo import LintResult
+
+TAR_EXTENSIONS = [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"]
+ARCHIVE_EXTENSIONS = TAR_EXTENSIONS + [".zip", ".gz"]
+
+
+def is_archive(filename: str) -> bool:
+    return _archive_extension(filename) is not None
+
+
+def iter_members(f: BinaryIO, filename: str) -> Iterator[Tuple[str, bytes]]:
+    """アーカイブを先頭から展開しながら、(メンバーのパス, 内容) を順に返す。
+
+    Note:
+        ディスクには書き出さない。tar はストリームとして読むため、f はシークできなくてもよい。
+        .gz (tar 以外) は1ファイルの圧縮とみなし、拡張子を除いた名前をメンバーのパスとする。
+    """
+    extension = _archive_extension(filename)
+    if extension in TAR_EXTENSIONS:
+        with tarfile.open(fileobj=f, mode="r|*") as tar:
+            for member in tar:
+                if member.isfile():
+                    yield member.name, tar.extractfile(member).read()
+    elif extension == ".zip":
+        with zipfile.ZipFile(f) as z:
+            for info in z.infolist():
+                if not info.is_dir():
+                    yield info.filename, z.read(info)
+    elif extension == ".gz":
+        with gzip.GzipFile(fileobj=f) as gz:
+            yield os.path.basename(filename[:-len(extension)]), gz.read()
+    else:
+        raise ValueError(f"unsupported archive: {filename}")
+
+
+def lint_archive(f: BinaryIO,
+                 filename: str,
+                 max_workers: Optional[int] = None,
+                 engine=None) -> Dict[str, Dict[str, LintResult]]:
+    """アーカイブの各メンバーを CSV または Excel として lint する。
+
+    Note:
+        展開したメンバーから順にスレッドプールで lint するため、展開と lint が重なって実行される。
+        展開済みで lint を待つメンバーは max_workers の2倍までに抑え、メモリ使用量を制限する。
+        読み込めないメンバー (壊れた Excel ファイルなど) は、そのメンバーのみチェック項目1-1を
+        invalid とし、他のメンバーの結果は返す。
+
+    Returns:
+        メンバーのパスごとの、チェック項目名とその結果。
+    """
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    pending = threading.BoundedSemaphore(max_workers * 2)
+
+    def lint(path: str, data: bytes) -> Dict[str, LintResult]:
+        try:
+            return OpenDataLinter(data, path, engine=engine).run()
+        except Exception:
+            return _gen_load_error_results()
+        finally:
+            pending.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for path, data in iter_members(f, filename):
+            pending.acquire()
+            futures[path] = executor.submit(lint, path, data)
+        return {path: future.result() for path, future in futures.items()}
+
+
+def _gen_load_error_results() -> Dict[str, LintResult]:
+    results = {
+        name: LintResult.gen_simple_error_result(
+            "ファイルが読み込めなかったため、チェックできませんでした。", is_valid=None)
+        for name in CSVLinter.VALIDATION_ORDER
+    }
+    results["check_1_1"] = LintResult.gen_simple_error_result(
+        "ファイルが読み込めませんでした。正しいファイルかどうか確認してください。")
+    return results
+
+
+def _archive_extension(filename: str) -> Optional[str]:
+    lower = filename.lower()
+    for extension in ARCHIVE_EXTENSIONS:
+        if lower.endswith(extension):
+            return extension
+    return None
@@ -0,0 +1,272 @@
+from io import BytesIO, StringIO
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:  # pragma: no cover
+    pa = None
+
+PANDAS_ENGINE = "pandas"
+ARROW_ENGINE = "pyarrow"
+
+_ASCII_SPACES = r"[ \t\n\v\f\r]*"
+_INTEGER_PATTERN = rf"^{_ASCII_SPACES}[+-]?[0-9]+{_ASCII_SPACES}$"
+_FLOAT_PATTERN = (rf"^{_ASCII_SPACES}[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)"
+                  rf"([eE][+-]?[0-9]+)?{_ASCII_SPACES}$")
+_INF_PATTERN = r"(?i)^[+-]?inf(inity)?$"
+# pandas の数値パーサーは有効桁数が多い場合や指数表記で Arrow と丸めが異なることがある
+_PRECISION_LIMIT_DIGITS = 16
+# pd.read_csv が既定で欠損値とみなす文字列 (pandas._libs.parsers.STR_NA_VALUES)
+_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "n/a", "nan",
+    "null"
+]
+# pandas は大文字・小文字を区別せずに真偽値とみなすため、ASCII の小文字にしてから比較する
+_TRUE_VALUES = ["true"]
+_FALSE_VALUES = ["false"]
+
+
+class _FallbackToPandas(Exception):
+    pass
+
+
+def has_pyarrow() -> bool:
+    return pa is not None
+
+
+def resolve_engine(engine: Optional[str]) -> str:
+    """engine が未指定の場合、pyarrow がインストールされていれば Arrow を用いる。"""
+    if engine is None:
+        return ARROW_ENGINE if has_pyarrow() else PANDAS_ENGINE
+    if engine not in [PANDAS_ENGINE, ARROW_ENGINE]:
+        raise ValueError(f"unknown engine: {engine}")
+    if engine == ARROW_ENGINE and not has_pyarrow():
+        raise ImportError("pyarrow is required for the pyarrow engine")
+    return engine
+
+
+def pandas_buffer_lines(column_count: int) -> int:
+    """pandas の C パーサーが一度に読み込み、型を推定する行数 (pandas/_libs/parsers.pyx)"""
+    heuristic = 2**20 // max(column_count, 1)
+    buffer_lines = 1
+    while buffer_lines * 2 < heuristic:
+        buffer_lines *= 2
+    return buffer_lines
+
+
+def read_csv(text: str, column_count: int, engine: str) -> DataFrame:
+    """``pd.read_csv(StringIO(text), header=None)`` と同じ DataFrame を生成する。
+
+    Note:
+        Arrow の場合はマルチスレッドの CSV リーダーで全列を文字列として読み込み、
+        pandas の C パーサーと同じ規則で列の型を推定する。
+        型推定は pandas と同じ行数のチャンクごとに行い、チャンク間で型が異なる列は
+        pandas と同様に結合する。丸めが pandas と一致しない可能性のある数値を含む場合は
+        pandas で読み込む。
+    """
+    if engine == PANDAS_ENGINE or not text:
+        return pd.read_csv(StringIO(text), header=None)
+
+    try:
+        return _read_csv_by_arrow(text, column_count)[0]
+    except _FallbackToPandas:
+        return pd.read_csv(StringIO(text), header=None)
+
+
+def read_csv_batch(texts: List[str], record_counts: List[int],
+                   column_count: int) -> Optional[List[DataFrame]]:
+    """列数が同じ複数の CSV テキストを、Arrow でまとめて読み込む。
+
+    Note:
+        テキストをつなげて1度に読み込み、型推定と変換は (テキスト, 列, チャンク) ごとに行う。
+        結果はそれぞれのテキストを read_csv した場合と同じになる。
+
+    Args:
+        texts: レコードを含む CSV テキスト
+        record_counts: テキストごとのレコード数 (空行を除いた行数)
+
+    Returns:
+        テキストごとの DataFrame。pyarrow がない場合や、まとめて読み込めない場合は None。
+    """
+    if not has_pyarrow() or not texts:
+        return None
+    try:
+        return _read_csv_by_arrow("".join(texts), column_count, record_counts)
+    except (_FallbackToPandas, pa.ArrowInvalid):
+        # 列数が合わない行を含む場合なども、テキストごとに読み込んでエラーを判定する
+        return None
+
+
+def _read_csv_by_arrow(text: str,
+                       column_count: int,
+                       record_counts: Optional[List[int]] = None
+                       ) -> List[DataFrame]:
+    names = [f"f{i}" for i in range(column_count)]
+    table = pa_csv.read_csv(
+        BytesIO(text.encode()),
+        read_options=pa_csv.ReadOptions(column_names=names, use_threads=True),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.large_string()
+                          for name in names},
+            null_values=_NA_VALUES,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=True))
+    row_count = table.num_rows
+    if record_counts is None:
+        record_counts = [row_count]
+    elif sum(record_counts) != row_count:
+        raise _FallbackToPandas()
+
+    buffer_lines = pandas_buffer_lines(column_count)
+    # テキストごとのチャンクに通し番号を振る
+    chunk_counts = [max(-(-n // buffer_lines), 1) for n in record_counts]
+    chunk_starts = np.concatenate([[0], np.cumsum(chunk_counts)[:-1]])
+    chunk_count = int(sum(chunk_counts))
+    row_chunks = np.concatenate([
+        start + np.arange(n) // buffer_lines
+        for start, n in zip(chunk_starts, record_counts)
+    ] + [np.empty(0, dtype=np.int64)]).astype(np.int64)
+
+    # 全列を1本の配列につなげ、(列, チャンク) ごとの型推定をまとめて行う
+    values = pa.concat_arrays(
+        [table.column(name).combine_chunks() for name in names])
+    positions = np.arange(len(values))
+    keys = positions // max(row_count, 1) * chunk_count + \
+        row_chunks[positions % max(row_count, 1)]
+    kinds = _infer_kinds(values, keys, column_count * chunk_count)
+    normalized = pc.replace_substring_regex(pc.ascii_trim_whitespace(values),
+                                            pattern=r"^\+",
+                                            replacement="")
+
+    # 型と欠損値の有無が同じチャンクは、列ごとにまとめて変換する
+    has_nulls = np.bincount(keys,
+                            weights=pc.is_null(values).to_numpy(
+                                zero_copy_only=False).astype(np.float64),
+                            minlength=column_count * chunk_count) > 0
+    chunk_lengths = [
+        min(buffer_lines, n - k * buffer_lines)
+        for n, file_chunk_count in zip(record_counts, chunk_counts)
+        for k in range(file_chunk_count)
+    ]
+    converted = {}
+    for j in range(column_count):
+        groups = {}
+        for c in range(chunk_count):
+            key = j * chunk_count + c
+            groups.setdefault((kinds[key], has_nulls[key]), []).append(c)
+        column_values = values.slice(j * row_count, row_count)
+        column_normalized = normalized.slice(j * row_count, row_count)
+        for (kind, _), group_chunks in groups.items():
+            if len(groups) == 1:
+                array = _convert_chunk(kind, column_values, column_normalized)
+            else:
+                indices = pa.array(
+                    np.flatnonzero(np.isin(row_chunks, group_chunks)))
+                array = _convert_chunk(kind, column_values.take(indices),
+                                       column_normalized.take(indices))
+            # チャンクは行の順に並ぶため、変換した配列の連続した区間になる
+            offset = 0
+            for c in group_chunks:
+                converted[j * chunk_count + c] = \
+                    array[offset:offset + chunk_lengths[c]]
+                offset += chunk_lengths[c]
+
+    dfs = []
+    for first_chunk, file_chunk_count in zip(chunk_starts, chunk_counts):
+        columns = {}
+        for j in range(column_count):
+            chunks = [
+                converted[j * chunk_count + first_chunk + k]
+                for k in range(file_chunk_count)
+            ]
+            columns[j] = chunks[0] if len(chunks) == 1 else np.concatenate(
+                chunks)
+        dfs.append(pd.DataFrame(columns, columns=pd.RangeIndex(column_count)))
+    return dfs
+
+
+def _infer_kinds(values, keys: np.ndarray, key_count: int) -> List[str]:
+    """(列, チャンク) ごとに、pandas が推定する列の型を求める。
+
+    Note:
+        型推定は値の種類ごとに一度だけ行えばよいため、(列, チャンク) 内で重複を除いた値で判定する。
+    """
+    distinct = pa.table({
+        "key": keys,
+        "value": values
+    }).group_by(["key", "value"]).aggregate([])
+    distinct = distinct.filter(pc.is_valid(distinct.column("value")))
+    distinct_keys = distinct.column("key").to_numpy()
+    distinct_values = distinct.column("value")
+
+    def count(flags) -> np.ndarray:
+        return np.bincount(distinct_keys,
+                           weights=np.asarray(flags, dtype=np.float64),
+                           minlength=key_count)
+
+    is_number = pc.match_substring_regex(distinct_values,
+                                         _FLOAT_PATTERN).to_numpy(
+                                             zero_copy_only=False)
+    digit_counts = pc.utf8_length(
+        pc.replace_substring_regex(distinct_values,
+                                   pattern="[^0-9]",
+                                   replacement="")).to_numpy()
+    is_unsafe_number = is_number & (
+        pc.match_substring_regex(distinct_values, "[eE]").to_numpy(
+            zero_copy_only=False) |
+        (digit_counts >= _PRECISION_LIMIT_DIGITS))
+    if is_unsafe_number.any():
+        raise _FallbackToPandas()
+
+    value_counts = count(np.ones(len(distinct_keys)))
+    integer_counts = count(
+        pc.match_substring_regex(distinct_values, _INTEGER_PATTERN).to_numpy(
+            zero_copy_only=False))
+    float_counts = count(is_number | pc.match_substring_regex(
+        distinct_values, _INF_PATTERN).to_numpy(zero_copy_only=False))
+    bool_counts = count(
+        pc.is_in(pc.ascii_lower(distinct_values),
+                 pa.array(_TRUE_VALUES + _FALSE_VALUES)).to_numpy(
+                     zero_copy_only=False))
+
+    kinds = np.full(key_count, "object", dtype=object)
+    kinds[bool_counts == value_counts] = "bool"
+    kinds[float_counts == value_counts] = "float"
+    kinds[integer_counts == value_counts] = "integer"
+    kinds[value_counts == 0] = "null"
+    return list(kinds)
+
+
+def _convert_chunk(kind: str, values, normalized) -> np.ndarray:
+    has_null = values.null_count > 0
+    if kind == "null":
+        return np.full(len(values), np.nan)
+    if kind == "integer":
+        integers = pc.cast(normalized, pa.int64()).to_numpy(
+            zero_copy_only=False)
+        return integers.astype(np.float64) if has_null else integers
+    if kind == "float":
+        return pc.cast(normalized, pa.float64()).to_numpy(
+            zero_copy_only=False).astype(np.float64)
+    if kind == "bool":
+        bools = pc.if_else(pc.is_null(values), None,
+                           pc.is_in(pc.ascii_lower(values),
+                                    pa.array(_TRUE_VALUES)))
+        if not has_null:
+            return bools.to_numpy(zero_copy_only=False)
+        return _to_object_array(bools)
+    return _to_object_array(values)
+
+
+def _to_object_array(values) -> np.ndarray:
+    array = values.to_numpy(zero_copy_only=False).astype(object)
+    array[pd.isnull(array)] = np.nan
+    return array
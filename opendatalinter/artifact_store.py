@@ -0,0 +1,129 @@
+import json
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+FORMAT_VERSION = 1
+META_FILENAME = "artifacts.json"
+
+
+def save_artifacts(path: str, state: Dict, tables: Dict[str, DataFrame],
+                   arrays: Dict[str, np.ndarray]):
+    """linter の解析結果をディレクトリ path に保存する。
+
+    Note:
+        数値・bool の列と categorical の列のコード、arrays は .npy として保存し、
+        読み込み時にメモリマップする。それ以外の列は値の型 (str, int, float, bool) を
+        保ったまま JSON に保存する。メタデータは最後に書き出すため、途中で失敗した
+        ディレクトリは読み込めない。
+
+    Args:
+        state: JSON に変換できる値 (文字コード、タイトル・ヘッダーの行数、列の分類など)
+        tables: 保存する DataFrame
+        arrays: 保存する numpy の配列
+    """
+    os.makedirs(path, exist_ok=True)
+    meta = {
+        "version": FORMAT_VERSION,
+        "state": state,
+        "tables": {},
+        "arrays": list(arrays)
+    }
+    for name, df in tables.items():
+        meta["tables"][name] = {
+            "row_count": len(df),
+            "columns": [
+                _save_column(path, f"{name}_{k}", df[c])
+                for k, c in enumerate(df.columns)
+            ],
+            "column_names": [_to_json_value(c) for c in df.columns],
+        }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array, allow_pickle=False)
+
+    tmp_path = os.path.join(path, f"{META_FILENAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(path, META_FILENAME))
+
+
+def load_artifacts(
+    path: str,
+    mmap: bool = True
+) -> Tuple[Dict, Dict[str, DataFrame], Dict[str, np.ndarray]]:
+    """save_artifacts で保存した解析結果を読み込む。
+
+    Returns:
+        (state, tables, arrays)
+    """
+    with open(os.path.join(path, META_FILENAME), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"unsupported artifact version: {meta['version']}")
+
+    mmap_mode = "r" if mmap else None
+    tables = {}
+    for name, spec in meta["tables"].items():
+        columns = {
+            k: _load_column(path, spec_k, mmap_mode)
+            for k, spec_k in enumerate(spec["columns"])
+        }
+        df = pd.DataFrame(columns, index=pd.RangeIndex(spec["row_count"]))
+        df.columns = pd.Index(spec["column_names"])
+        tables[name] = df
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"),
+                      mmap_mode=mmap_mode,
+                      allow_pickle=False)
+        for name in meta["arrays"]
+    }
+    return meta["state"], tables, arrays
+
+
+def _save_column(path: str, name: str, column: pd.Series) -> Dict:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        np.save(os.path.join(path, f"{name}.npy"),
+                column.cat.codes.values,
+                allow_pickle=False)
+        return {
+            "kind": "category",
+            "name": name,
+            "categories": column.cat.categories.tolist()
+        }
+    if column.dtype.kind in "biuf":
+        np.save(os.path.join(path, f"{name}.npy"),
+                column.values,
+                allow_pickle=False)
+        return {"kind": "array", "name": name}
+    return {
+        "kind": "object",
+        "values": [_to_json_value(v) for v in column.values]
+    }
+
+
+def _load_column(path: str, spec: Dict, mmap_mode) -> pd.Series:
+    if spec["kind"] == "object":
+        values = np.empty(len(spec["values"]), dtype=object)
+        values[:] = [np.nan if v is None else v for v in spec["values"]]
+        return pd.Series(values, dtype=object)
+
+    array = np.load(os.path.join(path, f"{spec['name']}.npy"),
+                    mmap_mode=mmap_mode,
+                    allow_pickle=False)
+    if spec["kind"] == "category":
+        return pd.Series(
+            pd.Categorical.from_codes(array,
+                                      categories=spec["categories"]))
+    return pd.Series(array, copy=False)
+
+
+def _to_json_value(v):
+    # nan は null として保存し、読み込み時に nan に戻す
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and np.isnan(v):
+        return None
+    return v
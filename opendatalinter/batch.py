@@ -0,0 +1,525 @@
+import argparse
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .memory_budget import MemoryBudgetedLinter
+from .open_data_linter import OpenDataLinter
+from .result_sink import ResultSink
+from .scheduler import LANES, LONG_LANE, SHORT_LANE, estimate_cost
+
+# レーンを指定しないワーカーは、この回数に1回は長いレーンから先に取得する
+LONG_LANE_FIRST_INTERVAL = 4
+
+
+@dataclass
+class Task:
+    """内容のハッシュごとの lint 対象。同じ内容のファイルは1つのタスクにまとめる。"""
+    id: str
+    paths: List[str]
+    attempts: int = 0
+    lease_expires_at: Optional[float] = field(default=None, compare=False)
+    lane: str = SHORT_LANE
+    cost: float = 0
+    enqueued_at: Optional[float] = None
+    # 最後に取得されるまでに pending で待った時間 (秒)
+    queue_wait: Optional[float] = field(default=None, compare=False)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "paths": self.paths,
+            "attempts": self.attempts,
+            "lane": self.lane,
+            "cost": self.cost,
+            "enqueued_at": self.enqueued_at
+        }
+
+    @property
+    def filename(self) -> str:
+        # 同じレーンのタスクが投入された順に、同時に投入したタスクはコストの小さい順に並ぶようにする
+        enqueued_at = int((self.enqueued_at or 0) * 1e6)
+        return (f"{self.lane}-{enqueued_at:016d}-{int(self.cost):012d}"
+                f"-{self.id}.json")
+
+
+class WorkQueue:
+    """バッチ lint のタスクを複数のワーカーで分け合うキュー。"""
+    def enqueue(self, paths: Iterable[str]) -> List[Task]:
+        raise NotImplementedError
+
+    def claim(self,
+              worker_id: str,
+              lanes: Sequence[str] = LANES) -> Optional[Task]:
+        """未処理のタスクを1つ取得する。取得できない場合は None。
+
+        Args:
+            lanes: 取得するレーン。先に指定したレーンのタスクから取得する。
+        """
+        raise NotImplementedError
+
+    def renew(self, task: Task):
+        """実行中のタスクのリースを延長する。"""
+        raise NotImplementedError
+
+    def complete(self, task: Task, result: Dict, worker_id: str):
+        raise NotImplementedError
+
+    def is_empty(self) -> bool:
+        raise NotImplementedError
+
+
+class DirectoryWorkQueue(WorkQueue):
+    """共有ディレクトリ上のファイルで実装したキュー。
+
+    Note:
+        タスクは pending/ に置き、ワーカーは claimed/ へのリネームで取得する。
+        リネームはアトミックなため、同じタスクを複数のワーカーが取得することはない。
+        取得したタスクの更新時刻からリース時間が過ぎた場合、ワーカーが落ちたものとみなして
+        pending/ に戻し、max_attempts 回を超えたものは failed/ に移す。
+        実行中のワーカーは renew で更新時刻を進め、リースを延長する。
+        既に投入された内容と同じファイルを投入した場合は、pending/・claimed/・done/ にある
+        タスクのパスに追加し、merge_results で全てのパスの結果として書き出す。
+        結果はワーカーごとに results/<worker_id>.jsonl に追記するため、ロックは不要。
+
+        タスクは投入時に推定したコストで短いレーンと長いレーンに分け、ファイル名の先頭に
+        レーンを付ける。ワーカーは取得するレーンとその順序を選べるため、短いレーンのみを
+        処理するワーカーを置けば、短いタスクが長いタスクの後ろで待ち続けることはない。
+        レーン内は投入された順に取得し、大きいタスクが後から投入された小さいタスクに
+        追い越され続けることはない。同時に投入したタスクはコストの小さい順に取得する。
+    """
+    DEFAULT_LEASE_SECONDS = 600
+    DEFAULT_MAX_ATTEMPTS = 3
+
+    def __init__(self,
+                 root: str,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for d in ["pending", "claimed", "done", "failed", "results"]:
+            os.makedirs(os.path.join(root, d), exist_ok=True)
+
+    def enqueue(self, paths: Iterable[str]) -> List[Task]:
+        tasks: Dict[str, Task] = {}
+        now = time.time()
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in tasks:
+                cost = estimate_cost(data, len(data), path)
+                tasks[digest] = Task(digest, [],
+                                     lane=cost.lane,
+                                     cost=cost.cost,
+                                     enqueued_at=now)
+            tasks[digest].paths.append(path)
+
+        existing = self.__find_tasks(["pending", "claimed", "done"])
+        for task in tasks.values():
+            if task.id in existing:
+                self.__add_paths(existing[task.id], task.paths)
+            else:
+                self.__write(self.__path("pending", task), task)
+        return list(tasks.values())
+
+    def __find_tasks(self, states: List[str]) -> Dict[str, str]:
+        """タスクの ID ごとの、states のいずれかにあるタスクのファイルのパス。"""
+        paths = {}
+        for state in states:
+            for name in os.listdir(os.path.join(self.root, state)):
+                if name.endswith(".json"):
+                    # ファイル名は "<レーン>-<投入時刻>-<コスト>-<ハッシュ>.json"
+                    task_id = name[:-len(".json")].rsplit("-", 1)[-1]
+                    paths.setdefault(task_id,
+                                     os.path.join(self.root, state, name))
+        return paths
+
+    def __add_paths(self, task_path: str, paths: List[str]):
+        try:
+            task = self.__read(task_path)
+        except FileNotFoundError:
+            # 取得・完了で移動した。移動先のファイルに追加する
+            moved = self.__find_tasks(["claimed", "done", "pending"])
+            task_id = os.path.basename(task_path)[:-len(".json")].rsplit(
+                "-", 1)[-1]
+            if task_id in moved:
+                self.__add_paths(moved[task_id], paths)
+            return
+        task.paths.extend(p for p in paths if p not in task.paths)
+        self.__write(task_path, task)
+
+    def claim(self,
+              worker_id: str,
+              lanes: Sequence[str] = LANES) -> Optional[Task]:
+        self.__requeue_expired_tasks()
+        pending = os.listdir(os.path.join(self.root, "pending"))
+        for name in self.__order_by_lane(pending, lanes):
+            claimed_path = os.path.join(self.root, "claimed", name)
+            try:
+                os.rename(os.path.join(self.root, "pending", name),
+                          claimed_path)
+                # リネームでは更新時刻が変わらないため、リースの開始時刻とする
+                os.utime(claimed_path)
+                task = self.__read(claimed_path)
+                task.attempts += 1
+                if task.attempts > self.max_attempts:
+                    os.replace(claimed_path, self.__path("failed", task))
+                    continue
+                self.__write(claimed_path, task)
+            except FileNotFoundError:
+                continue  # 他のワーカーが先に取得した、またはリース切れで戻された
+            now = time.time()
+            task.lease_expires_at = now + self.lease_seconds
+            if task.enqueued_at is not None:
+                task.queue_wait = now - task.enqueued_at
+            return task
+        return None
+
+    def renew(self, task: Task):
+        try:
+            os.utime(self.__path("claimed", task))
+        except FileNotFoundError:
+            return  # リースが切れて他のワーカーに渡った
+        task.lease_expires_at = time.time() + self.lease_seconds
+
+    def complete(self, task: Task, result: Dict, worker_id: str):
+        line = json.dumps(dict(task.to_dict(),
+                               worker_id=worker_id,
+                               queue_wait=task.queue_wait,
+                               **result),
+                          ensure_ascii=False)
+        with open(os.path.join(self.root, "results", f"{worker_id}.jsonl"),
+                  "a",
+                  encoding="utf-8") as f:
+            f.write(line + "\n")
+        try:
+            os.replace(self.__path("claimed", task),
+                       self.__path("done", task))
+        except FileNotFoundError:
+            pass  # リースが切れて他のワーカーに渡った。重複した結果は merge で除く
+
+    def is_empty(self) -> bool:
+        return not os.listdir(os.path.join(
+            self.root, "pending")) and not os.listdir(
+                os.path.join(self.root, "claimed"))
+
+    def merge_results(self, output_path: str) -> int:
+        """ワーカーごとの結果を、ファイルごとの1つの JSONL にまとめる。
+
+        Note:
+            同じ ID の結果は最初のものを用い、パスは全ての結果と done/ のタスクの和集合とする。
+
+        Returns:
+            書き出した行数。
+        """
+        results: Dict[str, Dict] = {}
+        results_dir = os.path.join(self.root, "results")
+        for name in sorted(os.listdir(results_dir)):
+            with open(os.path.join(results_dir, name), encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    result = json.loads(line)
+                    merged = results.setdefault(result["id"], result)
+                    _merge_paths(merged, result["paths"])
+        # 完了した後に同じ内容で投入されたパスは、done/ のタスクにのみ記録されている
+        for task_path in self.__find_tasks(["done"]).values():
+            try:
+                task = self.__read(task_path)
+            except FileNotFoundError:
+                continue
+            if task.id in results:
+                _merge_paths(results[task.id], task.paths)
+
+        lines = []
+        for result in results.values():
+            for path in result["paths"]:
+                lines.append(
+                    dict(path=path,
+                         sha256=result["id"],
+                         worker_id=result["worker_id"],
+                         lane=result.get("lane"),
+                         queue_wait=result.get("queue_wait"),
+                         error=result.get("error"),
+                         memory_plan=result.get("memory_plan"),
+                         results=result.get("results")))
+        with open(output_path, "w", encoding="utf-8") as f:
+            for line in sorted(lines, key=lambda r: r["path"]):
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        return len(lines)
+
+    def __requeue_expired_tasks(self):
+        claimed_dir = os.path.join(self.root, "claimed")
+        now = time.time()
+        for name in os.listdir(claimed_dir):
+            claimed_path = os.path.join(claimed_dir, name)
+            try:
+                if os.path.getmtime(claimed_path) + self.lease_seconds > now:
+                    continue
+                os.rename(claimed_path,
+                          os.path.join(self.root, "pending", name))
+            except FileNotFoundError:
+                continue
+
+    def queue_wait_stats(self) -> Dict[str, Dict[str, float]]:
+        """結果に記録した、レーンごとの待ち時間 (秒) の件数・平均・最大"""
+        waits: Dict[str, List[float]] = {lane: [] for lane in LANES}
+        results_dir = os.path.join(self.root, "results")
+        for name in sorted(os.listdir(results_dir)):
+            with open(os.path.join(results_dir, name), encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    result = json.loads(line)
+                    if result.get("queue_wait") is not None:
+                        waits.setdefault(result["lane"],
+                                         []).append(result["queue_wait"])
+        return {
+            lane: {
+                "count": len(w),
+                "mean": sum(w) / len(w) if w else 0.0,
+                "max": max(w, default=0.0),
+            }
+            for lane, w in waits.items()
+        }
+
+    @staticmethod
+    def __order_by_lane(names: List[str], lanes: Sequence[str]) -> List[str]:
+        # ファイル名は "<レーン>-<投入時刻>-<コスト>-<ハッシュ>.json"
+        ordered = []
+        for lane in lanes:
+            ordered.extend(sorted(name for name in names
+                                  if name.startswith(f"{lane}-")))
+        return ordered
+
+    def __path(self, state: str, task: Task) -> str:
+        return os.path.join(self.root, state, task.filename)
+
+    @staticmethod
+    def __read(path: str) -> Task:
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        return Task(d["id"],
+                    d["paths"],
+                    d["attempts"],
+                    lane=d.get("lane", SHORT_LANE),
+                    cost=d.get("cost", 0),
+                    enqueued_at=d.get("enqueued_at"))
+
+    @staticmethod
+    def __write(path: str, task: Task):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(task.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def lint_file(path: str,
+              workers: Optional[int] = None,
+              memory_budget: Optional[int] = None) -> Dict:
+    """ファイルを lint し、JSON に変換できる形で全てのチェック結果を返す。
+
+    Args:
+        workers: セルごとのチェックに用いるプロセス数。未指定の場合は並列に実行しない。
+        memory_budget: 指定された場合、lint が使用するメモリをこのバイト数に収める
+            (MemoryBudgetedLinter)。選んだ実行経路を memory_plan に記録する。
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if memory_budget is None:
+        linter = OpenDataLinter(data, path, workers=workers)
+    else:
+        linter = MemoryBudgetedLinter(data,
+                                      path,
+                                      memory_budget,
+                                      workers=workers)
+    try:
+        results = {
+            name: result.to_dict()
+            for name, result in linter.run().items()
+        }
+    finally:
+        linter.close()
+    output = {
+        "results": json.loads(json.dumps(results, default=_to_json_value))
+    }
+    if memory_budget is not None:
+        output["memory_plan"] = linter.plan.to_dict()
+    return output
+
+
+def run_worker(queue: WorkQueue,
+               worker_id: Optional[str] = None,
+               poll_interval: float = 1.0,
+               exit_when_empty: bool = True,
+               sink: Optional[ResultSink] = None,
+               lanes: Optional[Sequence[str]] = None,
+               split_workers: Optional[int] = None,
+               memory_budget: Optional[int] = None) -> int:
+    """キューが空になるまでタスクを取得して lint する。
+
+    Args:
+        sink: 指定された場合、lint 結果を列指向のファイルにも書き出す。
+        lanes: 取得するレーン。先に指定したレーンのタスクから取得する。
+            未指定の場合は短いレーンから先に取得し、LONG_LANE_FIRST_INTERVAL 回に1回は
+            長いレーンから先に取得する。
+        split_workers: 長いレーンのタスクのセルごとのチェックに用いるプロセス数。
+            未指定の場合は分割しない。短いレーンのタスクは分割しない。
+        memory_budget: タスクごとに lint が使用してよいメモリのバイト数。
+
+    Returns:
+        処理したタスクの数。
+    """
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    processed = 0
+    while True:
+        task = queue.claim(
+            worker_id,
+            _default_lanes(processed) if lanes is None else lanes)
+        if task is None:
+            if exit_when_empty and queue.is_empty():
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        stop_heartbeat = _start_heartbeat(queue, task)
+        try:
+            result = lint_file(
+                task.paths[0],
+                workers=split_workers if task.lane == LONG_LANE else 1,
+                memory_budget=memory_budget)
+        except Exception as e:
+            result = {"error": repr(e)}
+        finally:
+            stop_heartbeat()
+        queue.complete(task, result, worker_id)
+        if sink is not None and "results" in result:
+            for path in task.paths:
+                sink.write(path, result["results"])
+        processed += 1
+
+
+def _default_lanes(claimed: int) -> List[str]:
+    if claimed % LONG_LANE_FIRST_INTERVAL == LONG_LANE_FIRST_INTERVAL - 1:
+        return [LONG_LANE, SHORT_LANE]
+    return LANES
+
+
+def _start_heartbeat(queue: WorkQueue, task: Task):
+    """リースの 1/3 ごとに queue.renew を呼び出すスレッドを開始し、停止する関数を返す。"""
+    if task.lease_expires_at is None:
+        return lambda: None
+    interval = max((task.lease_expires_at - time.time()) / 3, 0.01)
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval):
+            queue.renew(task)
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+
+    def stop():
+        stopped.set()
+        thread.join()
+
+    return stop
+
+
+def _merge_paths(result: Dict, paths: List[str]):
+    result["paths"] = result["paths"] + [
+        p for p in paths if p not in result["paths"]
+    ]
+
+
+def _to_json_value(o):
+    # numpy のスカラー (np.int64 など) を Python の値に変換する
+    if hasattr(o, "item"):
+        return o.item()
+    raise TypeError(f"{type(o)} is not JSON serializable")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m opendatalinter.batch",
+        description="共有ディレクトリのキューを使って複数ノードで lint する。")
+    parser.add_argument("queue_dir")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue")
+    enqueue_parser.add_argument("paths", nargs="+")
+
+    worker_parser = subparsers.add_parser("worker")
+    worker_parser.add_argument("--worker-id")
+    worker_parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DirectoryWorkQueue.DEFAULT_LEASE_SECONDS)
+    worker_parser.add_argument("--columnar",
+                               action="store_true",
+                               help="結果を columnar/ に列指向の形式でも書き出す")
+    worker_parser.add_argument(
+        "--lanes",
+        help="取得するレーンを優先する順にカンマ区切りで指定する (short, long)。"
+        f"未指定の場合は {LONG_LANE_FIRST_INTERVAL} 回に1回 long を優先する")
+    worker_parser.add_argument("--split-workers",
+                               type=int,
+                               help="長いタスクのチェックに用いるプロセス数")
+    worker_parser.add_argument(
+        "--memory-budget-mib",
+        type=float,
+        help="タスクごとに lint が使用してよいメモリ (MiB)。超える場合は安い実行経路に切り替える")
+    worker_parser.add_argument("--wait",
+                               action="store_true",
+                               help="キューが空になっても終了しない")
+
+    merge_parser = subparsers.add_parser("merge")
+    merge_parser.add_argument("output_path")
+
+    subparsers.add_parser("stats")
+
+    args = parser.parse_args(args)
+    if args.command == "worker":
+        queue = DirectoryWorkQueue(args.queue_dir,
+                                   lease_seconds=args.lease_seconds)
+        worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        sink = ResultSink.for_worker(os.path.join(
+            args.queue_dir, "columnar"), worker_id) if args.columnar else None
+        try:
+            run_worker(queue,
+                       worker_id,
+                       exit_when_empty=not args.wait,
+                       sink=sink,
+                       lanes=args.lanes.split(",") if args.lanes else None,
+                       split_workers=args.split_workers,
+                       memory_budget=None if args.memory_budget_mib is None
+                       else int(args.memory_budget_mib * 2**20))
+        finally:
+            if sink is not None:
+                sink.close()
+    elif args.command == "enqueue":
+        tasks = DirectoryWorkQueue(args.queue_dir).enqueue(args.paths)
+        print(f"{len(tasks)} tasks enqueued")
+    elif args.command == "stats":
+        stats = DirectoryWorkQueue(args.queue_dir).queue_wait_stats()
+        for lane, s in stats.items():
+            print(f"{lane}: {s['count']} tasks, queue wait "
+                  f"mean {s['mean']:.2f}s, max {s['max']:.2f}s")
+    else:
+        count = DirectoryWorkQueue(args.queue_dir).merge_results(
+            args.output_path)
+        print(f"{count} results merged")
+
+
+if __name__ == "__main__":
+    main()
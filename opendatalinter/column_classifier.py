@@ -1,14 +1,18 @@
 from enum import Enum
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from jeraconv import jeraconv
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
 
 from .funcs import (is_number, is_string, is_prefecture_code,
-                    is_prefecture_name, is_empty, is_jp_calendar_year)
+                    is_prefecture_name, is_empty, is_jp_calendar_year,
+                    get_j2w)
 from .regex import (
     CHRISTIAN_ERA_REGEX,
     DATETIME_CODE_REGEX,
 )
+from .deadline import Deadline
 
 
 class ColumnType(Enum):
@@ -33,10 +37,20 @@ class ColumnType(Enum):
 
 class ColumnClassifier:
     DEFAULT_CLASSIFY_RATE = 0.8  # 列の分類の判定基準(値が含まれているセル数 / (列の長さ - 空のセル))
+    BLOCK_ROWS = 4096  # 列の分類が確定したか判定する行数の間隔
 
-    def __init__(self, df, classify_rate=None):
+    def __init__(self, df, classify_rate=None, deadline=None):
+        """
+        Args:
+            deadline: 制限時刻。過ぎた場合は DeadlineExceededError を送出する。
+
+        Note:
+            列ごとに値の種類を1度だけ分類し、分類が確定した時点で数え上げを打ち切るため、
+            プロセスプールで全てのセルを数えるより速い。並列には実行しない。
+        """
         self.df = df
         self.classify_rate = self.DEFAULT_CLASSIFY_RATE if classify_rate is None else classify_rate
+        self.deadline = Deadline() if deadline is None else deadline
 
     def perform(self):
         return [
@@ -44,72 +58,270 @@ class ColumnClassifier:
         ]
 
     def __get_column_type(self, column_index: int) -> ColumnType:
-        counts, empty_count = self.__count_elements_and_empty(column_index)
-        return self.__get_plausible_column_type(counts, empty_count)
-
-    def __count_elements_and_empty(
-            self, column_index: int) -> Tuple[Dict[ColumnType, int], int]:
-        empty_count = 0
-        counts = {
-            ColumnType.PREFECTURE_CODE: 0,
-            ColumnType.CHRISTIAN_ERA: 0,
-            ColumnType.DATETIME_CODE: 0,
-            ColumnType.OTHER_NUMBER: 0,
-            ColumnType.PREFECTURE_NAME: 0,
-            ColumnType.OTHER_STRING: 0,
-            ColumnType.JP_CALENDAR_YEAR: 0,
-            ColumnType.NONE_CATEGORY: 0
-        }
-        column = self.df.iloc[:, column_index]
-
-        j2w = jeraconv.J2W()
-        for elem in column:
-            if is_empty(elem):
-                empty_count += 1
-            elif is_prefecture_code(elem):
-                counts[ColumnType.PREFECTURE_CODE] += 1
-                counts[ColumnType.CHRISTIAN_ERA] += 1
-                counts[ColumnType.OTHER_NUMBER] += 1
-            elif CHRISTIAN_ERA_REGEX.match(str(elem)):
-                counts[ColumnType.CHRISTIAN_ERA] += 1
-                counts[ColumnType.OTHER_NUMBER] += 1
-            elif DATETIME_CODE_REGEX.match(str(elem)):
-                counts[ColumnType.DATETIME_CODE] += 1
-                counts[ColumnType.OTHER_NUMBER] += 1
-            elif is_number(elem):
-                counts[ColumnType.OTHER_NUMBER] += 1
-            elif is_prefecture_name(elem):
-                counts[ColumnType.PREFECTURE_NAME] += 1
-                counts[ColumnType.OTHER_STRING] += 1
-            elif is_string(elem):
-                counts[ColumnType.OTHER_STRING] += 1
-            elif is_jp_calendar_year(j2w, elem):
-                counts[ColumnType.JP_CALENDAR_YEAR] += 1
-            else:
-                counts[ColumnType.NONE_CATEGORY] += 1
-
-        return counts, empty_count
-
-    def __get_plausible_column_type(self, counts: Dict[ColumnType, int],
-                                    empty_count: int) -> ColumnType:
-        if len(self.df) == empty_count:
-            return ColumnType.NONE_CATEGORY
-
-        priority = [
-            ColumnType.PREFECTURE_CODE, ColumnType.CHRISTIAN_ERA,
-            ColumnType.DATETIME_CODE, ColumnType.OTHER_NUMBER,
-            ColumnType.PREFECTURE_NAME, ColumnType.OTHER_STRING,
-            ColumnType.JP_CALENDAR_YEAR, ColumnType.NONE_CATEGORY
+        return classify_column(self.df.iloc[:, column_index],
+                               self.classify_rate,
+                               block_rows=self.BLOCK_ROWS,
+                               deadline=self.deadline)
+
+
+# 分類の優先順位。数が同じ場合は先の分類を選ぶ
+PRIORITY = [
+    ColumnType.PREFECTURE_CODE, ColumnType.CHRISTIAN_ERA,
+    ColumnType.DATETIME_CODE, ColumnType.OTHER_NUMBER,
+    ColumnType.PREFECTURE_NAME, ColumnType.OTHER_STRING,
+    ColumnType.JP_CALENDAR_YEAR, ColumnType.NONE_CATEGORY
+]
+# セルの値の分類ごとに、数え上げる列の分類
+COUNTED_TYPES = {
+    ColumnType.PREFECTURE_CODE: [
+        ColumnType.PREFECTURE_CODE, ColumnType.CHRISTIAN_ERA,
+        ColumnType.OTHER_NUMBER
+    ],
+    ColumnType.CHRISTIAN_ERA:
+    [ColumnType.CHRISTIAN_ERA, ColumnType.OTHER_NUMBER],
+    ColumnType.DATETIME_CODE:
+    [ColumnType.DATETIME_CODE, ColumnType.OTHER_NUMBER],
+    ColumnType.OTHER_NUMBER: [ColumnType.OTHER_NUMBER],
+    ColumnType.PREFECTURE_NAME:
+    [ColumnType.PREFECTURE_NAME, ColumnType.OTHER_STRING],
+    ColumnType.OTHER_STRING: [ColumnType.OTHER_STRING],
+    ColumnType.JP_CALENDAR_YEAR: [ColumnType.JP_CALENDAR_YEAR],
+    ColumnType.NONE_CATEGORY: [ColumnType.NONE_CATEGORY],
+}
+
+
+# 値の分類の番号 (0 は空のセル、以降は PRIORITY の順) ごとに、数え上げる列の分類を 1 とする行列
+ELEMENT_INCREMENTS = np.array([[0] * len(PRIORITY)] + [[
+    int(t in COUNTED_TYPES[element_type]) for t in PRIORITY
+] for element_type in PRIORITY],
+                              dtype=np.int64)
+
+
+def get_plausible_column_type(counts: Dict[ColumnType, int], empty_count: int,
+                              row_count: int,
+                              classify_rate: float) -> ColumnType:
+    """分類ごとの数と空のセルの数から、列の分類を決める。"""
+    if row_count == empty_count:
+        return ColumnType.NONE_CATEGORY
+
+    plausible_type = None
+    max_count = 0
+    for t in PRIORITY:
+        if counts[t] > max_count:
+            plausible_type = t
+            max_count = counts[t]
+
+    if max_count / (row_count - empty_count) > classify_rate:
+        return plausible_type
+    else:
+        return ColumnType.NONE_CATEGORY
+
+
+def classify_element(elem) -> Optional[ColumnType]:
+    """セルの値を分類する。空のセルは None を返す。"""
+    if is_empty(elem):
+        return None
+    elif is_prefecture_code(elem):
+        return ColumnType.PREFECTURE_CODE
+    elif CHRISTIAN_ERA_REGEX.match(str(elem)):
+        return ColumnType.CHRISTIAN_ERA
+    elif DATETIME_CODE_REGEX.match(str(elem)):
+        return ColumnType.DATETIME_CODE
+    elif is_number(elem):
+        return ColumnType.OTHER_NUMBER
+    elif is_prefecture_name(elem):
+        return ColumnType.PREFECTURE_NAME
+    elif is_string(elem):
+        return ColumnType.OTHER_STRING
+    elif is_jp_calendar_year(get_j2w(), elem):
+        return ColumnType.JP_CALENDAR_YEAR
+    else:
+        return ColumnType.NONE_CATEGORY
+
+
+def count_elements_and_empty(
+        column: Iterable,
+        deadline: Optional[Deadline] = None
+) -> Tuple[Dict[ColumnType, int], int]:
+    """列の値を分類ごとに数え、分類ごとの数と空のセルの数を返す。"""
+    deadline = Deadline() if deadline is None else deadline
+    empty_count = 0
+    counts = {
+        ColumnType.PREFECTURE_CODE: 0,
+        ColumnType.CHRISTIAN_ERA: 0,
+        ColumnType.DATETIME_CODE: 0,
+        ColumnType.OTHER_NUMBER: 0,
+        ColumnType.PREFECTURE_NAME: 0,
+        ColumnType.OTHER_STRING: 0,
+        ColumnType.JP_CALENDAR_YEAR: 0,
+        ColumnType.NONE_CATEGORY: 0
+    }
+
+    for elem in column:
+        deadline.tick()
+        element_type = classify_element(elem)
+        if element_type is None:
+            empty_count += 1
+            continue
+        for t in COUNTED_TYPES[element_type]:
+            counts[t] += 1
+
+    return counts, empty_count
+
+
+def classify_column(column: pd.Series,
+                    classify_rate: float,
+                    block_rows: int = ColumnClassifier.BLOCK_ROWS,
+                    deadline: Optional[Deadline] = None) -> ColumnType:
+    """列を分類する。結果は count_elements_and_empty で全ての値を数えた場合と同じ。
+
+    Note:
+        block_rows 行ごとに値の分類を数え、残りの行の値によらず結果が決まった時点で打ち切る。
+        残りの行の値が最も不利な場合でも最も多い分類が変わらず、その割合が classify_rate を
+        超える場合と、最も有利な場合でもどの分類の割合も classify_rate を超えない場合が該当する。
+        数値の列は欠損値以外の値が全て OTHER_NUMBER に数えられるため、残りの行の空のセルと
+        OTHER_NUMBER の数が確定し、多くの場合は最初のブロックで打ち切れる。
+        値の分類は、ユニークな値ごとに1度だけ行う。
+    """
+    deadline = Deadline() if deadline is None else deadline
+    row_count = len(column)
+    is_numeric = column.dtype.kind in "iuf"
+    # 数値の列は欠損値のみが空のセルになる
+    remaining_empty = int(column.isna().sum()) if is_numeric else None
+    element_counts = np.zeros(len(PRIORITY) + 1, dtype=np.int64)
+    memo: Dict[Tuple[type, object], int] = {}
+    for start in range(0, row_count, block_rows):
+        deadline.check()
+        block_counts = _count_element_indices(
+            column.iloc[start:start + block_rows], memo, deadline)
+        element_counts += block_counts
+        if is_numeric:
+            remaining_empty -= int(block_counts[0])
+        column_type = _decide_column_type(
+            element_counts, row_count - min(start + block_rows, row_count),
+            remaining_empty, row_count, classify_rate)
+        if column_type is not None:
+            return column_type
+    return get_plausible_column_type(
+        dict(zip(PRIORITY, (element_counts @ ELEMENT_INCREMENTS).tolist())),
+        int(element_counts[0]), row_count, classify_rate)
+
+
+def _count_element_indices(values: pd.Series, memo: Dict,
+                           deadline: Deadline) -> np.ndarray:
+    """値の分類の番号ごとの数。memo に値ごとの分類の番号を記録する。"""
+    if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype.kind in "iuf":
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for k, v in enumerate(uniques.tolist()):
+            mapping[k] = _get_element_index(v, memo, deadline)
+        indices = mapping[codes]
+    else:
+        # object の列は True と 1 のように等価な値をまとめないよう、型ごとに分類する
+        indices = np.fromiter(
+            (_get_element_index(v, memo, deadline) for v in values.tolist()),
+            dtype=np.int64,
+            count=len(values))
+    return np.bincount(indices, minlength=len(PRIORITY) + 1)
+
+
+def _get_element_index(v, memo: Dict, deadline: Deadline) -> int:
+    deadline.tick()
+    key = (type(v), v)
+    index = memo.get(key)
+    if index is None:
+        element_type = classify_element(v)
+        index = 0 if element_type is None else PRIORITY.index(element_type) + 1
+        memo[key] = index
+    return index
+
+
+def _decide_column_type(element_counts: np.ndarray, remaining: int,
+                        remaining_empty: Optional[int], row_count: int,
+                        classify_rate: float) -> Optional[ColumnType]:
+    """残りの remaining 行の値によらず列の分類が決まる場合はその分類、決まらない場合は None。
+
+    Args:
+        remaining_empty: 残りの行のうち空のセルの数。不明な場合は None
+    """
+    counts = (element_counts @ ELEMENT_INCREMENTS).tolist()
+    empty_count = int(element_counts[0])
+    if remaining_empty is None:
+        # 残りの行が全て空でない場合に、割合の最小値・最大値の分母となる
+        denominator = row_count - empty_count
+        lows = counts
+        highs = [c + remaining for c in counts]
+    else:
+        non_empty = remaining - remaining_empty
+        denominator = row_count - empty_count - remaining_empty
+        lows = [
+            c + non_empty if t == ColumnType.OTHER_NUMBER else c
+            for t, c in zip(PRIORITY, counts)
         ]
+        highs = [c + non_empty for c in counts]
+    if denominator == 0:
+        return ColumnType.NONE_CATEGORY
+    if all(high / denominator <= classify_rate for high in highs):
+        return ColumnType.NONE_CATEGORY
+
+    for k, t in enumerate(PRIORITY):
+        # 優先順位が先の分類より多く、後の分類以上であれば最も多い分類になる
+        if lows[k] > 0 and lows[k] / denominator > classify_rate and all(
+                lows[k] > highs[u] if u < k else lows[k] >= highs[u]
+                for u in range(len(PRIORITY)) if u != k):
+            return t
+    return None
+
+
+def classify_tables(dfs: List[DataFrame],
+                    classify_rate: Optional[float] = None,
+                    deadline: Optional[Deadline] = None
+                    ) -> List[List[ColumnType]]:
+    """複数の表の列をまとめて分類する。結果は表ごとに ColumnClassifier で分類した場合と同じ。
+
+    Note:
+        列ごとにユニークな値を求め、値の分類は全ての表を通じてユニークな値ごとに1度だけ行う。
+        各セルの値の分類を (表, 列) の境界を表す番号とともに1本の配列につなげ、
+        np.bincount でまとめて数える。小さな表が多数ある場合に、列ごとの走査の固定費を抑える。
+    """
+    classify_rate = ColumnClassifier.DEFAULT_CLASSIFY_RATE if classify_rate is None else classify_rate
+    deadline = Deadline() if deadline is None else deadline
+    # 値の分類の番号。0 は空のセル、以降は PRIORITY の順
+    element_indices: Dict[Tuple[type, object], int] = {}
+    segment_codes = []
+    row_counts = []
+    for df in dfs:
+        for j in range(len(df.columns)):
+            codes, uniques = pd.factorize(df.iloc[:, j], use_na_sentinel=False)
+            mapping = np.empty(len(uniques), dtype=np.int64)
+            for k, v in enumerate(uniques.tolist()):
+                deadline.tick()
+                key = (type(v), v)
+                if key not in element_indices:
+                    element_type = classify_element(v)
+                    element_indices[key] = 0 if element_type is None else \
+                        PRIORITY.index(element_type) + 1
+                mapping[k] = element_indices[key]
+            segment_codes.append(len(row_counts) * (len(PRIORITY) + 1) +
+                                 mapping[codes])
+            row_counts.append(len(df))
+
+    element_counts = np.bincount(
+        np.concatenate(segment_codes) if segment_codes else np.empty(
+            0, dtype=np.int64),
+        minlength=len(row_counts) * (len(PRIORITY) + 1)).reshape(
+            len(row_counts), len(PRIORITY) + 1)
+    type_counts = element_counts @ ELEMENT_INCREMENTS
 
-        plausible_type = None
-        max_count = 0
-        for t in priority:
-            if counts[t] > max_count:
-                plausible_type = t
-                max_count = counts[t]
-
-        if max_count / (len(self.df) - empty_count) > self.classify_rate:
-            return plausible_type
-        else:
-            return ColumnType.NONE_CATEGORY
+    column_types = [
+        get_plausible_column_type(dict(zip(PRIORITY, type_counts[s].tolist())),
+                                  int(element_counts[s, 0]), row_counts[s],
+                                  classify_rate)
+        for s in range(len(row_counts))
+    ]
+    results = []
+    start = 0
+    for df in dfs:
+        results.append(column_types[start:start + len(df.columns)])
+        start += len(df.columns)
+    return results
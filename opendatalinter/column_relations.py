@@ -0,0 +1,201 @@
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from .column_classifier import ColumnType
+from .deadline import Deadline
+from .funcs import get_j2w, is_empty
+from .regex import CHRISTIAN_ERA_REGEX, DATETIME_CODE_REGEX
+
+PREFECTURE_CODES = {
+    '北海道': 1,
+    '青森': 2,
+    '岩手': 3,
+    '宮城': 4,
+    '秋田': 5,
+    '山形': 6,
+    '福島': 7,
+    '茨城': 8,
+    '栃木': 9,
+    '群馬': 10,
+    '埼玉': 11,
+    '千葉': 12,
+    '東京': 13,
+    '神奈川': 14,
+    '新潟': 15,
+    '富山': 16,
+    '石川': 17,
+    '福井': 18,
+    '山梨': 19,
+    '長野': 20,
+    '岐阜': 21,
+    '静岡': 22,
+    '愛知': 23,
+    '三重': 24,
+    '滋賀': 25,
+    '京都': 26,
+    '大阪': 27,
+    '兵庫': 28,
+    '奈良': 29,
+    '和歌山': 30,
+    '鳥取': 31,
+    '島根': 32,
+    '岡山': 33,
+    '広島': 34,
+    '山口': 35,
+    '徳島': 36,
+    '香川': 37,
+    '愛媛': 38,
+    '高知': 39,
+    '福岡': 40,
+    '佐賀': 41,
+    '長崎': 42,
+    '熊本': 43,
+    '大分': 44,
+    '宮崎': 45,
+    '鹿児島': 46,
+    '沖縄': 47
+}
+
+
+class ColumnRelation(Enum):
+    # 和暦の年と、隣接する列の時間軸コードの年が一致する
+    JP_CALENDAR_WITH_DATETIME_CODE = 'jp_calendar_with_datetime_code'
+    # 和暦の年と、隣接する列の西暦が一致する
+    JP_CALENDAR_WITH_CHRISTIAN_ERA = 'jp_calendar_with_christian_era'
+    # 都道府県名と、隣接する列の都道府県コードが一致する
+    PREFECTURE_NAME_WITH_CODE = 'prefecture_name_with_code'
+
+
+class ColumnRelationIndex:
+    """隣接する列の組ごとに、全ての行で成り立つ関係を求めておく。
+
+    Note:
+        列ごとの値 (和暦・西暦・時間軸コードの年、都道府県コード) は列のユニークな値ごとに
+        1度だけ求めて配列にし、列の組の関係は配列の比較で判定する。
+        分類が関係の組み合わせに一致する隣接列のみを比較するため、列数に線形の時間で終わる。
+    """
+    # 関係ごとの (対象の列の分類, 隣接する列の分類)
+    RELATION_TYPES = {
+        ColumnRelation.JP_CALENDAR_WITH_DATETIME_CODE:
+        (ColumnType.JP_CALENDAR_YEAR, ColumnType.DATETIME_CODE),
+        ColumnRelation.JP_CALENDAR_WITH_CHRISTIAN_ERA:
+        (ColumnType.JP_CALENDAR_YEAR, ColumnType.CHRISTIAN_ERA),
+        ColumnRelation.PREFECTURE_NAME_WITH_CODE:
+        (ColumnType.PREFECTURE_NAME, ColumnType.PREFECTURE_CODE),
+    }
+
+    def __init__(self,
+                 df: DataFrame,
+                 column_types: List[ColumnType],
+                 deadline: Optional[Deadline] = None):
+        self.df = df
+        self.column_types = column_types
+        self.deadline = Deadline() if deadline is None else deadline
+        self.__features: Dict[Tuple[int, str], np.ndarray] = {}
+        self.__relations: Dict[Tuple[int, int], Set[ColumnRelation]] = {}
+
+        for target in range(len(column_types)):
+            for adjacent in [target - 1, target + 1]:
+                if 0 <= adjacent < len(column_types):
+                    self.__add_relations(target, adjacent)
+
+    def holds(self, target: int, adjacent: int,
+              relation: ColumnRelation) -> bool:
+        """列 target と列 adjacent の間に relation が成り立つか"""
+        return relation in self.__relations.get((target, adjacent), ())
+
+    def has_adjacent(self, target: int,
+                     relations: Iterable[ColumnRelation]) -> bool:
+        """左右いずれかの隣接列との間に、relations のいずれかが成り立つか"""
+        relations = set(relations)
+        return any(
+            self.__relations.get((target, adjacent), set()) & relations
+            for adjacent in [target - 1, target + 1])
+
+    def __add_relations(self, target: int, adjacent: int):
+        for relation, types in self.RELATION_TYPES.items():
+            if types != (self.column_types[target],
+                         self.column_types[adjacent]):
+                continue
+            self.deadline.check()
+            if relation == ColumnRelation.PREFECTURE_NAME_WITH_CODE:
+                is_valid = self.__is_prefecture_with_code(target, adjacent)
+            else:
+                is_valid = self.__is_jp_calendar_with_year(
+                    target, adjacent, relation)
+            if is_valid:
+                self.__relations.setdefault((target, adjacent),
+                                            set()).add(relation)
+
+    def __is_jp_calendar_with_year(self, target: int, adjacent: int,
+                                   relation: ColumnRelation) -> bool:
+        # 和暦に変換できないセルと空のセルは、隣接する列の値によらず成り立つとみなす
+        jp_years = self.__feature(target, "jp_calendar_year",
+                                  _to_jp_calendar_year)
+        if relation == ColumnRelation.JP_CALENDAR_WITH_DATETIME_CODE:
+            years = self.__feature(adjacent, "datetime_code_year",
+                                   _year_parser(DATETIME_CODE_REGEX))
+        else:
+            years = self.__feature(adjacent, "christian_era_year",
+                                   _year_parser(CHRISTIAN_ERA_REGEX))
+        return bool(np.all(np.isnan(jp_years) | (jp_years == years)))
+
+    def __is_prefecture_with_code(self, target: int, adjacent: int) -> bool:
+        # 都道府県名が文字列、都道府県コードが整数である行のみ、空のセルか一致するものを許す
+        codes = self.__feature(target, "prefecture_code", _to_prefecture_code)
+        is_empty_name = self.__feature(target, "is_empty_prefecture_name",
+                                       _is_empty_name)
+        numbers = self.__feature(adjacent, "integer", _to_integer)
+        return bool(
+            np.all(~np.isnan(numbers) & ((is_empty_name == 1) |
+                                         (codes == numbers))))
+
+    def __feature(self, j: int, name: str,
+                  func: Callable[[Any], float]) -> np.ndarray:
+        """列 j のユニークな値ごとに func を評価し、行ごとの配列にする。列ごとに1度だけ求める。"""
+        key = (j, name)
+        if key not in self.__features:
+            codes, uniques = pd.factorize(self.df.iloc[:, j],
+                                          use_na_sentinel=False)
+            values = np.empty(len(uniques), dtype=np.float64)
+            for k, v in enumerate(uniques.tolist()):
+                self.deadline.tick()
+                values[k] = func(v)
+            self.__features[key] = values[codes]
+        return self.__features[key]
+
+
+def _to_jp_calendar_year(v) -> float:
+    # 和暦に変換できない値と空のセルは nan
+    try:
+        year = get_j2w().convert(str(v))
+    except ValueError:
+        return np.nan
+    return np.nan if is_empty(v) else year
+
+
+def _year_parser(regex) -> Callable[[Any], float]:
+    def parse(v) -> float:
+        result = regex.match(str(v))
+        return np.nan if result is None else int(result.groups()[0])
+
+    return parse
+
+
+def _to_prefecture_code(v) -> float:
+    # 文字列でない値と、コードのない都道府県名は nan
+    if not isinstance(v, str):
+        return np.nan
+    return PREFECTURE_CODES.get(v, np.nan)
+
+
+def _is_empty_name(v) -> float:
+    return float(isinstance(v, str) and bool(is_empty(v)))
+
+
+def _to_integer(v) -> float:
+    return float(v) if isinstance(v, int) else np.nan
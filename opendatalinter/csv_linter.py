@@ -1,219 +1,736 @@
 import os
 import re
 import traceback
-from dataclasses import dataclass
-from functools import partial
-from typing import List, Callable, Any, Pattern
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
 
 import chardet
 import numpy as np
-from jeraconv import jeraconv
+from pandas import DataFrame
 
+from .arrow_engine import resolve_engine
+from .artifact_store import load_artifacts, save_artifacts
 from .column_classifier import ColumnClassifier, ColumnType
+from .column_relations import ColumnRelation, ColumnRelationIndex
 from .csv_structure_analyzer import CSVStructureAnalyzer
-from .errors import HeaderEstimateError
+from .deadline import Deadline
+from .errors import (
+    DeadlineExceededError,
+    HeaderEstimateError,
+    MemoryBudgetExceededError,
+    RaggedTableError,
+)
 from .funcs import (
-    before_check_1_1,
+    concat_chunks,
+    find_first_cell,
     is_number,
     is_empty,
     is_include_number,
+    map_cells,
+    requires,
+    to_compact_df,
+    validate_in_order,
 )
 from .regex import (
     SPACES_AND_LINE_BREAK_REGEX,
-    DATETIME_CODE_REGEX,
-    CHRISTIAN_ERA_REGEX,
     NUM_WITH_BRACKETS_REGEX,
     NUM_WITH_NUM_REGEX,
     VALID_PREFECTURE_NAME,
     INVALID_PREFECTURE_NAME,
     NUMBER_STRING_REGEX,
 )
-from .vo import LintResult, InvalidContent, InvalidCellFactory
-
-
-@dataclass
-class AdjacentColumnCondition:
-    type: ColumnType
-    predicate: Callable[[Any, Any], bool]
+from .table_segmenter import TableSegmenter
+from .tiling import map_tiles, SharedTable, UnsupportedValueError
+from .vo import (
+    LintResult,
+    InvalidContent,
+    InvalidCellFactory,
+    TableRegion,
+    TableSchema,
+    TimedOutLintResult,
+    ValidationResult,
+)
 
 
 class CSVLinter:
     CLASSIFY_RATE = 0.8  # 列の分類の判定基準(値が含まれているセル数 / (列の長さ - 空のセル))
+    # 記録された列の分類を確認する際に分類し直す行数
+    SCHEMA_SAMPLE_SIZE = 100
+    # セルごとのチェックをプロセスプールで並列に実行する表の最小のセル数
+    PARALLEL_MIN_CELLS = 1_000_000
+    # validate で実行するチェック項目。計算コストの小さい順に並べる
+    VALIDATION_ORDER = [
+        "check_1_1", "check_1_4", "check_1_7", "check_1_6", "check_2_x",
+        "check_1_5", "check_1_10", "check_1_13", "check_1_3", "check_1_2",
+        "check_1_12", "check_1_11"
+    ]
+    # 成果物と、その生成に必要な成果物
+    ARTIFACT_DEPENDENCIES = {
+        "encoding": [],
+        "text": ["encoding"],
+        "structure": ["text"],
+        "header_df": ["structure"],
+        "df": ["structure"],
+        "column_types": ["df"],
+        "column_relations": ["df", "column_types"],
+        "non_empty_mask": ["structure"],
+    }
+    # タイトル・ヘッダーの行数に依存する成果物。resegment で生成し直す
+    SEGMENT_ARTIFACTS = [
+        "structure", "header_df", "df", "column_types", "column_relations"
+    ]
+    # save_artifacts で保存する成果物
+    STORED_ARTIFACTS = [
+        "encoding", "text", "structure", "header_df", "df", "column_types",
+        "non_empty_mask"
+    ]
+    # チェック項目1-1で読み込めることを確認する成果物
+    CHECK_1_1_ARTIFACTS = ["structure"]
+    # 成果物ごとに生成される属性
+    ARTIFACT_ATTRIBUTES = {
+        "encoding": "encoding",
+        "text": "text",
+        "csv_structure_analyzer": "structure",
+        "title_line_num": "structure",
+        "header_line_num": "structure",
+        "header_invalid_cell_factory": "structure",
+        "content_invalid_cell_factory": "structure",
+        "header_df": "header_df",
+        "df": "df",
+        "column_classify": "column_types",
+        "column_relations": "column_relations",
+        "non_empty_mask": "non_empty_mask",
+    }
 
     def __init__(self,
                  data: bytes,
                  filename: str,
                  title_line_num=None,
-                 header_line_num=None):
+                 header_line_num=None,
+                 encoding=None,
+                 rows=None,
+                 engine=None,
+                 compact=True,
+                 memory_budget=None,
+                 chunk_rows=None,
+                 workers=None,
+                 schema_store=None,
+                 timeout=None):
+        """
+        Args:
+            encoding: 文字コード。指定された場合は推定を省略する。
+            rows: ``csv.reader`` でパース済みの行。指定された場合は再度パースしない。
+            engine: 表の読み込みに用いるエンジン ("pandas" または "pyarrow")。
+                未指定の場合、pyarrow がインストールされていれば "pyarrow" を用いる。
+                どちらのエンジンでもチェック結果は同一になる。
+            compact: True の場合、文字列の列を categorical に変換してメモリ使用量を抑える。
+            memory_budget: 読み込んだ表が使用してよいメモリのバイト数。超えた場合はチェックしない。
+            chunk_rows: 指定された場合、表本体をおよそこの行数ごとに読み込んで結合する。
+                compact の場合は表全体の object の配列を作らないため、読み込み中のメモリ使用量が減る。
+                結果は一度に読み込んだ場合と同一になる。
+            workers: セルごとのチェックに用いるプロセス数。未指定の場合は 1 で、並列に実行しない。
+                2 以上の場合、表のセル数が PARALLEL_MIN_CELLS 以上の場合のみ並列に実行する。
+                プロセスプールは linter ごとに1つ作り、close するまでチェックの間で使い回す。
+            schema_store: SchemaStore。指定された場合、ヘッダーが一致する表の列の分類を再利用する。
+            timeout: 読み込みとチェックに使える時間 (秒)。過ぎた場合、以降のチェックは
+                TimedOutLintResult を返す。
+        """
         self.cache = {}
+        self.engine = resolve_engine(engine)
+        self.compact = compact
+        self.memory_budget = memory_budget
+        self.chunk_rows = chunk_rows
+        self.workers = 1 if workers is None else workers
+        self.schema_store = schema_store
+        self.deadline = Deadline(timeout)
+        self.__built_artifacts = set()
+        self.__failed_artifact = None
+        self.__executor = None
+        self.__shared_df = None
+        self.__shared_table = None
+        self.__shared_table_finalizer = None
+        self.__encoding = encoding
+        self.__rows = rows
+        self.__title_line_num = title_line_num
+        self.__header_line_num = header_line_num
+
+        self.data = data
+        self.filename = filename
 
         exp = os.path.splitext(filename)[1]
         if exp not in [".csv", ".CSV"]:
             self.cache["1-1"] = LintResult.gen_simple_error_result(
                 "ファイルが読み込めませんでした。ファイル形式が Excel か CSV となっているか確認してください。")
+
+    @classmethod
+    def from_artifacts(cls, path: str, **kwargs):
+        """save_artifacts で保存した解析結果から linter を生成する。
+
+        Note:
+            ファイルの読み込み、構造の推定、表の生成、列の分類を行わずにチェックを実行できる。
+            元のファイルの内容とテキストは保存しないため、data と text は空となる。
+        """
+        state, tables, arrays = load_artifacts(path)
+        linter = cls(b"", state["filename"], **kwargs)
+        linter.__restore(state, tables, arrays)
+        return linter
+
+    def save_artifacts(self, path: str):
+        """全ての成果物を生成し、ディレクトリ path に保存する。
+
+        Note:
+            成果物の生成に失敗した場合は、チェック項目1-1の結果を保存する。
+        """
+        state = {"filename": self.filename}
+        if not self.prepare(self.STORED_ARTIFACTS):
+            state["error"] = self.cache["1-1"].invalid_contents[0].error_message
+            return save_artifacts(path, state, {}, {})
+
+        state.update({
+            "encoding": self.encoding,
+            "title_line_num": self.title_line_num,
+            "header_line_num": self.header_line_num,
+            "column_types": [t.value for t in self.column_classify],
+        })
+        save_artifacts(path, state, {
+            "header_df": self.header_df,
+            "df": self.df
+        }, {"non_empty_mask": self.non_empty_mask})
+
+    def __restore(self, state: Dict, tables: Dict[str, DataFrame],
+                  arrays: Dict[str, np.ndarray]):
+        if "error" in state:
+            self.cache["1-1"] = LintResult.gen_simple_error_result(
+                state["error"])
             return
 
-        try:
-            self.data = data
-            self.filename = filename
-            self.text = self.__decode(data)
-
-            csv_structure_analyzer = CSVStructureAnalyzer(self.text)
-            self.title_line_num = csv_structure_analyzer.title_line_num if title_line_num is None else title_line_num
-            self.header_line_num = csv_structure_analyzer.header_line_num if header_line_num is None else header_line_num
-            self.header_invalid_cell_factory = InvalidCellFactory(
-                self.title_line_num)
-            self.content_invalid_cell_factory = InvalidCellFactory(
-                self.title_line_num + self.header_line_num)
-
-            self.header_df = csv_structure_analyzer.gen_header_df()
-            self.df = csv_structure_analyzer.gen_rows_df()
-            self.column_classify = ColumnClassifier(
-                self.df, self.CLASSIFY_RATE).perform()
-        except UnicodeDecodeError:
+        self.text = None
+        self.csv_structure_analyzer = None
+        self.encoding = state["encoding"]
+        self.title_line_num = state["title_line_num"]
+        self.header_line_num = state["header_line_num"]
+        self.header_invalid_cell_factory = InvalidCellFactory(
+            self.title_line_num)
+        self.content_invalid_cell_factory = InvalidCellFactory(
+            self.title_line_num + self.header_line_num)
+        self.header_df = tables["header_df"]
+        self.df = tables["df"]
+        self.column_classify = [ColumnType(t) for t in state["column_types"]]
+        self.non_empty_mask = arrays["non_empty_mask"]
+        self.__built_artifacts.update(self.STORED_ARTIFACTS)
+
+    def resegment(self, title_line_num=None, header_line_num=None):
+        """タイトル・ヘッダーの行数を指定し直す。
+
+        Note:
+            文字コードの推定、デコード、パース済みの行と、ファイル全体から求める成果物
+            (non_empty_mask、表の領域) はそのまま使う。表の区切りに依存する成果物
+            (header_df、df、列の分類) とチェック項目1-1の結果のみ破棄し、次に参照された時点で生成し直す。
+
+        Args:
+            title_line_num: タイトルの行数。None の場合は推定した値を用いる。
+            header_line_num: ヘッダーの行数。None の場合は推定した値を用いる。
+
+        Raises:
+            ValueError: from_artifacts で生成した linter など、パース済みの行を持たない場合。
+        """
+        if "structure" in self.__built_artifacts and \
+                self.csv_structure_analyzer is None:
+            raise ValueError("parsed rows are not available")
+
+        self.__title_line_num = title_line_num
+        self.__header_line_num = header_line_num
+        # 読み込めないファイルや、区切りに依存しない成果物で失敗した場合の結果は残す
+        result = self.cache.get("1-1")
+        if result is not None and (
+                result.is_valid
+                or self.__failed_artifact in self.SEGMENT_ARTIFACTS):
+            del self.cache["1-1"]
+            self.__failed_artifact = None
+        self.__built_artifacts.difference_update(self.SEGMENT_ARTIFACTS)
+        for name, artifact in self.ARTIFACT_ATTRIBUTES.items():
+            if artifact in self.SEGMENT_ARTIFACTS and \
+                    name != "csv_structure_analyzer":
+                self.__dict__.pop(name, None)
+
+    def assign_artifacts(self, header_df=None, df=None, column_types=None):
+        """外部で生成した成果物を設定し、その生成を省略する。
+
+        Note:
+            複数のファイルの表をまとめて読み込む・分類する場合 (micro_batch) に用いる。
+            設定した成果物は resegment した場合に破棄し、生成し直す。
+
+        Args:
+            header_df: ヘッダーの表。read_csv で読み込んだものと同じである必要がある。
+            df: 表本体。read_csv で読み込んだものと同じである必要がある。
+            column_types: 列の分類
+        """
+        if not self.prepare(["structure"]):
+            return
+        if header_df is not None:
+            self.header_df = self.__to_table(header_df)
+            self.__built_artifacts.add("header_df")
+        if df is not None:
+            self.df = self.__to_table(df)
+            self.__built_artifacts.add("df")
+            self.__built_artifacts.discard("column_types")
+            self.__dict__.pop("column_classify", None)
+        if column_types is not None:
+            if len(column_types) != len(self.df.columns):
+                raise ValueError(
+                    f"expected {len(self.df.columns)} column types, got {len(column_types)}"
+                )
+            self.column_classify = list(column_types)
+            self.__built_artifacts.add("column_types")
+        self.__built_artifacts.discard("column_relations")
+        self.__dict__.pop("column_relations", None)
+
+    def __getattr__(self, name):
+        # 成果物に含まれる属性は、参照された時点で生成する
+        artifact = self.ARTIFACT_ATTRIBUTES.get(name)
+        if artifact is None or not self.prepare([artifact]):
+            raise AttributeError(name)
+        return self.__dict__[name]
+
+    def prepare(self, artifacts) -> bool:
+        """指定された成果物と、それらが依存する成果物のうち未生成のものを生成する。
+
+        Args:
+            artifacts: 成果物名のリスト。ARTIFACT_DEPENDENCIES のキーのいずれか。
+
+        Returns:
+            全ての成果物を生成できた場合に True。失敗した場合はチェック項目1-1の結果にエラーを記録する。
+
+        Raises:
+            DeadlineExceededError: 制限時間を過ぎた場合。生成済みの成果物はそのまま残る。
+        """
+        if "1-1" in self.cache and not self.cache["1-1"].is_valid:
+            return False
+
+        for artifact in self.__resolve_artifacts(artifacts):
+            if artifact in self.__built_artifacts:
+                continue
+            self.deadline.check()
+            try:
+                getattr(self, f"_CSVLinter__build_{artifact}")()
+            except DeadlineExceededError:
+                raise
+            except Exception as e:
+                self.__failed_artifact = artifact
+                self.cache["1-1"] = self.__gen_load_error_result(e)
+                return False
+            self.__built_artifacts.add(artifact)
+        return True
+
+    def __gen_load_error_result(self, e: Exception) -> LintResult:
+        """成果物の生成に失敗した場合の、チェック項目1-1の結果を生成する。"""
+        if isinstance(e, UnicodeDecodeError):
             if self.encoding == "utf-8":
-                self.cache["1-1"] = LintResult.gen_simple_error_result(
+                return LintResult.gen_simple_error_result(
                     "ファイルが読み込めませんでした。正しいファイルかどうか確認してください。")
-            else:
-                self.cache["1-1"] = LintResult.gen_simple_error_result(
-                    "文字コードが読み取れませんでした。文字コードがutf-8になっているか確認してください。")
-        except HeaderEstimateError:
-            self.cache["1-1"] = LintResult.gen_simple_error_result(
-                "ヘッダー部分の推定に失敗しました。")
-        except Exception:
-            traceback.print_exc()
-            self.cache["1-1"] = LintResult.gen_simple_error_result(
-                "未知のエラーが発生しました。お手数ですがサーバー運営者にお問い合わせください。")
+            return LintResult.gen_simple_error_result(
+                "文字コードが読み取れませんでした。文字コードがutf-8になっているか確認してください。")
+        if isinstance(e, HeaderEstimateError):
+            return LintResult.gen_simple_error_result("ヘッダー部分の推定に失敗しました。")
+        if isinstance(e, RaggedTableError):
+            return LintResult.gen_simple_error_result(
+                "指定されたタイトル・ヘッダーの行数では、表に列数の異なる行が含まれます。行数を確認してください。")
+        if isinstance(e, MemoryBudgetExceededError):
+            return LintResult.gen_simple_error_result(
+                "ファイルが大きすぎるため、チェックできませんでした。")
+        traceback.print_exception(type(e), e, e.__traceback__)
+        return LintResult.gen_simple_error_result(
+            "未知のエラーが発生しました。お手数ですがサーバー運営者にお問い合わせください。")
+
+    def run(self, checks=None) -> Dict[str, LintResult]:
+        """指定されたチェックが依存する成果物だけを生成し、チェックを実行する。
+
+        Args:
+            checks: 実行するチェック項目名のリスト。None の場合は全てのチェックを実行する。
+
+        Returns:
+            チェック項目名をキーとするチェック結果。
+        """
+        if checks is None:
+            checks = self.VALIDATION_ORDER
+        methods = [getattr(self, name) for name in checks]
+        try:
+            self.prepare([
+                artifact for method in methods
+                for artifact in getattr(method, "required_artifacts", [])
+            ])
+        except DeadlineExceededError:
+            pass  # 制限時間を過ぎたチェックは TimedOutLintResult を返す
+        return {name: method() for name, method in zip(checks, methods)}
+
+    def __resolve_artifacts(self, artifacts) -> List[str]:
+        """依存する成果物を含めて、生成する順に並べる。"""
+        resolved = []
+
+        def visit(artifact):
+            if artifact in resolved:
+                return
+            for dependency in self.ARTIFACT_DEPENDENCIES[artifact]:
+                visit(dependency)
+            resolved.append(artifact)
+
+        for a in artifacts:
+            visit(a)
+        return resolved
+
+    def __build_encoding(self):
+        if self.__encoding is None:
+            self.__encoding = chardet.detect(self.data)['encoding']
+        self.encoding = 'utf-8' if self.__encoding is None else self.__encoding
+
+    def __build_text(self):
+        self.text = self.data.decode(encoding=self.encoding)
+
+    def __build_structure(self):
+        csv_structure_analyzer = self.__dict__.get("csv_structure_analyzer")
+        if csv_structure_analyzer is not None:
+            # 区切り直す場合は、パース済みの行と推定済みの表の範囲を再利用する
+            csv_structure_analyzer.resegment(self.__title_line_num,
+                                             self.__header_line_num)
+        else:
+            csv_structure_analyzer = CSVStructureAnalyzer(
+                self.text,
+                rows=self.__rows,
+                deadline=self.deadline,
+                title_line_num=self.__title_line_num,
+                header_line_num=self.__header_line_num)
+            self.csv_structure_analyzer = csv_structure_analyzer
+        self.title_line_num = csv_structure_analyzer.title_line_num
+        self.header_line_num = csv_structure_analyzer.header_line_num
+        self.header_invalid_cell_factory = InvalidCellFactory(
+            self.title_line_num)
+        self.content_invalid_cell_factory = InvalidCellFactory(
+            self.title_line_num + self.header_line_num)
+
+    def __build_header_df(self):
+        self.header_df = self.__to_table(
+            self.csv_structure_analyzer.gen_header_df(self.engine))
+
+    def __build_df(self):
+        if self.chunk_rows is None:
+            self.df = self.__to_table(
+                self.csv_structure_analyzer.gen_rows_df(self.engine))
+            return
+        self.df = self.__check_memory_budget(
+            concat_chunks(
+                self.csv_structure_analyzer.gen_rows_dfs(
+                    self.engine, self.chunk_rows), self.compact))
+
+    def __to_table(self, df: DataFrame) -> DataFrame:
+        if self.compact:
+            df = to_compact_df(df)
+        return self.__check_memory_budget(df)
+
+    def __check_memory_budget(self, df: DataFrame) -> DataFrame:
+        if self.memory_budget is not None and df.memory_usage(
+                deep=True).sum() > self.memory_budget:
+            raise MemoryBudgetExceededError()
+        return df
+
+    def __build_non_empty_mask(self):
+        self.non_empty_mask = self.csv_structure_analyzer.gen_non_empty_mask()
+
+    def __build_column_types(self):
+        if self.schema_store is not None:
+            fingerprint = self.csv_structure_analyzer.gen_header_fingerprint()
+            schema = self.schema_store.get(fingerprint)
+            if schema is not None and self.__matches_schema(schema):
+                self.column_classify = [
+                    ColumnType(t) for t in schema.column_types
+                ]
+                return
+
+        self.column_classify = ColumnClassifier(
+            self.df, self.CLASSIFY_RATE, deadline=self.deadline).perform()
+        if self.schema_store is not None:
+            self.schema_store.put(
+                fingerprint,
+                TableSchema(self.title_line_num, self.header_line_num,
+                            [t.value for t in self.column_classify]))
+
+    def __build_column_relations(self):
+        self.column_relations = ColumnRelationIndex(self.df,
+                                                    self.column_classify,
+                                                    deadline=self.deadline)
+
+    def __matches_schema(self, schema: TableSchema) -> bool:
+        """記録された構造が一致し、一部の行で分類し直した結果が記録された列の分類と一致するか確認する。"""
+        if (schema.title_line_num, schema.header_line_num) != (
+                self.title_line_num, self.header_line_num) or len(
+                    schema.column_types) != len(self.df.columns):
+            return False
 
-    def check_1_1(self):
+        sample_size = min(len(self.df), self.SCHEMA_SAMPLE_SIZE)
+        rows = np.unique(
+            np.linspace(0, len(self.df) - 1, sample_size).astype(int))
+        sample_types = ColumnClassifier(self.df.iloc[rows],
+                                        self.CLASSIFY_RATE,
+                                        deadline=self.deadline).perform()
+        return [t.value for t in sample_types] == schema.column_types
+
+    def __tile_workers(self, column_count: int) -> int:
+        if len(self.df) * column_count < self.PARALLEL_MIN_CELLS:
+            return 1
+        return self.workers
+
+    def __executor_for(self, column_count: int) -> Optional[ProcessPoolExecutor]:
+        workers = self.__tile_workers(column_count)
+        if workers < 2:
+            return None
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=workers)
+            weakref.finalize(self,
+                             self.__executor.shutdown,
+                             wait=False,
+                             cancel_futures=True)
+        return self.__executor
+
+    def __shared_table_for_df(self) -> Optional[SharedTable]:
+        """self.df の全ての列を置いた共有メモリの表。共有メモリに置けない値を含む場合は None。
+
+        Note:
+            セルごとのチェックの間で使い回し、self.df が作り直された場合のみ作り直す。
+        """
+        if self.__shared_df is not self.df:
+            self.__release_shared_table()
+            self.__shared_df = self.df
+            try:
+                table = SharedTable(self.df, range(len(self.df.columns)))
+            except UnsupportedValueError:
+                return None
+            self.__shared_table = table
+            self.__shared_table_finalizer = weakref.finalize(self, table.close)
+        return self.__shared_table
+
+    def __release_shared_table(self):
+        if self.__shared_table_finalizer is not None:
+            self.__shared_table_finalizer()
+        self.__shared_df = None
+        self.__shared_table = None
+        self.__shared_table_finalizer = None
+
+    def close(self):
+        """セルごとのチェックに用いたプロセスプールと共有メモリを破棄する。"""
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+        self.__release_shared_table()
+
+    def __map_tiles(self, kernel, columns: List[int]) -> Optional[List]:
+        """列 columns をタイルに分割して並列に kernel を実行する。並列に実行しない場合は None。"""
+        workers = self.__tile_workers(len(columns))
+        if workers < 2:
+            return None
+        table = self.__shared_table_for_df()
+        if table is None:
+            return None
+        return map_tiles(self.df,
+                         kernel,
+                         columns,
+                         workers,
+                         deadline=self.deadline,
+                         executor=self.__executor_for(len(columns)),
+                         table=table)
+
+    def validate(self, checks=None) -> ValidationResult:
+        """各チェックを計算コストの小さい順に実行し、最初に違反が見つかった時点で打ち切る。
+
+        Args:
+            checks: 実行するチェック項目名のリスト。None の場合は全てのチェックを実行する。
+
+        Returns:
+            合否と、最初に見つかった違反の位置。
+        """
+        return validate_in_order(self, self.VALIDATION_ORDER, checks)
+
+    def check_1_1(self, fail_fast=False):
         """チェック項目1-1に沿って、ファイル形式が Excel か CSV となっているか確認する。
+
+        Note:
+            ファイルの読み込みと構造の推定まで行う。以降の成果物の生成に失敗した場合は、
+            その時点でこのチェックの結果もエラーとなる。
         """
         if "1-1" not in self.cache:
-            self.cache["1-1"] = LintResult(True, [])
+            try:
+                if self.prepare(self.CHECK_1_1_ARTIFACTS):
+                    self.cache["1-1"] = LintResult(True, [])
+            except DeadlineExceededError:
+                return TimedOutLintResult.gen_result()
         return self.cache["1-1"]
 
-    @before_check_1_1
-    def check_1_2(self):
+    @requires("df")
+    def check_1_2(self, fail_fast=False):
         """チェック項目2-2に沿って、1セル1データとなっているか確認する。
         """
         comma_separated_invalid_cells = []
         num_with_brackets_invalid_cells = []
-        for i in range(len(self.df)):
-            for j in range(len(self.df.columns)):
-                v = self.df.iat[i, j]
-                if not isinstance(v, str):
-                    continue
-                elms = re.split("[、,]", v)
-                if len(elms) > 1:
-                    for elm in elms:
-                        m = NUM_WITH_BRACKETS_REGEX.match(
-                            elm.strip())  # todo: もっと広いケースで通るように
-                        if m is not None:
-                            comma_separated_invalid_cells.append(
-                                self.content_invalid_cell_factory.create(i, j))
-                            break
-                else:
-                    for r in [NUM_WITH_BRACKETS_REGEX, NUM_WITH_NUM_REGEX]:
-                        m = r.match(v.strip())
-                        if m is not None:
-                            num_with_brackets_invalid_cells.append(
-                                self.content_invalid_cell_factory.create(i, j))
+        tiles = None if fail_fast else self.__map_tiles(
+            _find_data_divisions_in_tile, list(range(len(self.df.columns))))
+        if tiles is None:
+            columns = [
+                self.df.iloc[:, j].tolist()
+                for j in range(len(self.df.columns))
+            ]
+            divisions = ((i, j, _find_data_division(column[i]))
+                         for i in range(len(self.df))
+                         for j, column in enumerate(columns))
+        else:
+            divisions = sorted((i, j, division) for j, _, cells in tiles
+                               for i, division in cells)
+
+        for i, j, division in divisions:
+            self.deadline.tick()
+            if division == _DIVIDED_BY_COMMA:
+                comma_separated_invalid_cells.append(
+                    self.content_invalid_cell_factory.create(i, j))
+                if fail_fast:
+                    return LintResult.gen_single_error_message_result(
+                        _COMMA_DIVISION_MESSAGE,
+                        comma_separated_invalid_cells)
+            elif division == _DIVIDED_BY_BRACKETS:
+                num_with_brackets_invalid_cells.append(
+                    self.content_invalid_cell_factory.create(i, j))
+                if fail_fast:
+                    return LintResult.gen_single_error_message_result(
+                        _BRACKETS_DIVISION_MESSAGE,
+                        num_with_brackets_invalid_cells)
         invalid_contents = []
         if len(comma_separated_invalid_cells):
             invalid_contents.append(
-                InvalidContent("句点によりデータが分割されています。",
+                InvalidContent(_COMMA_DIVISION_MESSAGE,
                                comma_separated_invalid_cells))
         if len(num_with_brackets_invalid_cells):
             invalid_contents.append(
-                InvalidContent("括弧によりデータが分割されています。",
+                InvalidContent(_BRACKETS_DIVISION_MESSAGE,
                                num_with_brackets_invalid_cells))
 
         return LintResult(not (bool(len(invalid_contents))), invalid_contents)
 
-    @before_check_1_1
-    def check_1_3(self):
+    @requires("df", "column_types")
+    def check_1_3(self, fail_fast=False):
         """チェック項目1-3に沿って、数値データは数値属性とし、⽂字列を含まないことを確認する。
 
         Note:
             単位が列全てに含まれている場合、列ごとに警告する。
         """
 
-        invalid_cells = []
-        invalid_columns = []
-
-        for j in range(len(self.df.columns)):
-            column = self.df.iloc[:, j]
-
-            # セルごとのチェック
-            if self.column_classify[j].is_number():
-                for i, elem in enumerate(column):
-                    # TODO: 問題のあるセルの定義が以下の分岐で拾えているか要確認
-                    if is_number(elem):
-                        continue
-                    if is_include_number(elem):
-                        invalid_cells.append(
-                            self.content_invalid_cell_factory.create(i, j))
-
-            # 統一された列の単位チェック
-            # TODO: sample/check_1_3の4列目のような列の判定を要確認
-            if self.column_classify[j] == ColumnType.NONE_CATEGORY:
-                empty_count = 0
-                number_string_pattern_cell_count = 0  # ex.1000円
-
-                for elem in column:
-                    if is_empty(elem):
-                        empty_count += 1
-                        continue
-
-                    if NUMBER_STRING_REGEX.match(str(elem)):
-                        number_string_pattern_cell_count += 1
-
-                if number_string_pattern_cell_count + empty_count == len(
-                        self.df):
-                    invalid_columns.append(
-                        self.content_invalid_cell_factory.create(None, j))
+        tiled = None if fail_fast else self.__check_1_3_in_tiles()
+        if tiled is not None:
+            invalid_cells, invalid_columns = tiled
+        else:
+            invalid_cells = []
+            invalid_columns = []
+            for j in range(len(self.df.columns)):
+                column = self.df.iloc[:, j]
+
+                # セルごとのチェック
+                if self.column_classify[j].is_number():
+                    for i, elem in enumerate(column):
+                        self.deadline.tick()
+                        if _is_invalid_number(elem):
+                            invalid_cells.append(
+                                self.content_invalid_cell_factory.create(i, j))
+                            if fail_fast:
+                                return LintResult.gen_single_error_message_result(
+                                    _INVALID_NUMBER_MESSAGE, invalid_cells)
+
+                # 統一された列の単位チェック
+                # TODO: sample/check_1_3の4列目のような列の判定を要確認
+                if self.column_classify[j] == ColumnType.NONE_CATEGORY:
+                    if _count_number_strings(column,
+                                         self.deadline) == len(self.df):
+                        invalid_columns.append(
+                            self.content_invalid_cell_factory.create(None, j))
+                        if fail_fast:
+                            return LintResult.gen_single_error_message_result(
+                                _NUMBER_WITH_UNIT_MESSAGE,
+                                invalid_columns)
 
         invalid_contents = []
         if len(invalid_cells):
             invalid_contents.append(
-                InvalidContent("数値データに文字や空欄が含まれています。", invalid_cells))
+                InvalidContent(_INVALID_NUMBER_MESSAGE, invalid_cells))
         if len(invalid_columns):
             invalid_contents.append(
-                InvalidContent("数値データの列に単位などの文字が含まれている可能性があります。",
+                InvalidContent(_NUMBER_WITH_UNIT_MESSAGE,
                                invalid_columns))
 
         return LintResult(len(invalid_contents) == 0, invalid_contents)
 
-    @before_check_1_1
-    def check_1_4(self):
+    def __check_1_3_in_tiles(self):
+        number_columns = [
+            j for j in range(len(self.df.columns))
+            if self.column_classify[j].is_number()
+        ]
+        none_category_columns = [
+            j for j in range(len(self.df.columns))
+            if self.column_classify[j] == ColumnType.NONE_CATEGORY
+        ]
+        cell_tiles = self.__map_tiles(_find_invalid_numbers_in_tile,
+                                      number_columns)
+        column_tiles = self.__map_tiles(_count_number_strings_in_tile,
+                                        none_category_columns)
+        if (number_columns and cell_tiles is None) or (none_category_columns
+                                                       and column_tiles is None):
+            return None
+
+        invalid_cells = [
+            self.content_invalid_cell_factory.create(i, j)
+            for j, _, rows in cell_tiles or [] for i in rows
+        ]
+        counts = {j: 0 for j in none_category_columns}
+        for j, _, count in column_tiles or []:
+            counts[j] += count
+        invalid_columns = [
+            self.content_invalid_cell_factory.create(None, j)
+            for j in none_category_columns if counts[j] == len(self.df)
+        ]
+        return invalid_cells, invalid_columns
+
+    @requires("structure")
+    def check_1_4(self, fail_fast=False):
         """チェック項目1-4に沿って、セルの結合をしていないか確認する。（Excelのみ適用する）
         """
         return LintResult(True, [])
 
-    @before_check_1_1
-    def check_1_5(self):
+    @requires("header_df", "df")
+    def check_1_5(self, fail_fast=False):
         """チェック項目1-5に沿って、スペースや改⾏等で体裁を整えていないか確認する。
 
         Note:
             スペースと改行を1つ以上含む要素を invalid とみなす。
         """
+        def is_formatted(cell):
+            return SPACES_AND_LINE_BREAK_REGEX.match(str(cell)) is not None
+
         invalid_cells = []
         for df, invalid_cell_factory in [
             (self.header_df, self.header_invalid_cell_factory),
             (self.df, self.content_invalid_cell_factory)
         ]:
-            is_formatted = df.applymap(lambda cell: SPACES_AND_LINE_BREAK_REGEX
-                                       .match(str(cell)) is not None)
-            indices = list(np.argwhere(is_formatted.values))
+            self.deadline.check()
+            if fail_fast:
+                first = find_first_cell(df, is_formatted, self.deadline)
+                if first is not None:
+                    return LintResult.gen_single_error_message_result(
+                        _SPACES_MESSAGE, [invalid_cell_factory.create(*first)])
+                continue
+            indices = list(np.argwhere(map_cells(df, is_formatted)))
             invalid_cells.extend(
                 map(lambda i: invalid_cell_factory.create(i[0], i[1]),
                     indices))
 
         return LintResult.gen_single_error_message_result(
-            "スペースや改⾏が含まれています。", invalid_cells)
+            _SPACES_MESSAGE, invalid_cells)
 
-    @before_check_1_1
-    def check_1_6(self):
+    @requires("header_df")
+    def check_1_6(self, fail_fast=False):
         """チェック項目1-6に沿って、項⽬名等を省略していないか確認する。
 
         Note:
@@ -222,17 +739,19 @@ class CSVLinter:
         invalid_cells = list(
             map(lambda t: self.header_invalid_cell_factory.create(t[0], t[1]),
                 np.argwhere(self.header_df.isnull().values)))
+        if fail_fast:
+            invalid_cells = invalid_cells[:1]
         return LintResult.gen_single_error_message_result(
             "ヘッダーに空欄があります。", invalid_cells)
 
-    @before_check_1_1
-    def check_1_7(self):
+    @requires("structure")
+    def check_1_7(self, fail_fast=False):
         """チェック項目1-7に沿って、数式が使用されていないかを確認する。（Excelのみ適用する）
         """
         return LintResult(True, [])
 
-    @before_check_1_1
-    def check_1_10(self):
+    @requires("header_df", "df")
+    def check_1_10(self, fail_fast=False):
         """チェック項目1-10に沿って，機種依存⽂字を使⽤していないか確認する。
 
         Note:
@@ -243,17 +762,27 @@ class CSVLinter:
             start_row = self.title_line_num
             invalid_cells = []
 
+            def is_platform_dependent(cell):
+                return not self.__can_encode_from_cp932_to_sjis(str(cell))
+
             for df in dfs:
-                is_formatted = df.applymap(
-                    lambda cell: not self.__can_encode_from_cp932_to_sjis(
-                        str(cell)))
-                indices = list(np.argwhere(is_formatted.values))
-                invalid_cells.extend(
-                    map(lambda i: (i[0] + start_row, i[1]), indices))
+                self.deadline.check()
+                if fail_fast:
+                    first = find_first_cell(df, is_platform_dependent,
+                                            self.deadline)
+                    if first is not None:
+                        return LintResult.gen_single_error_message_result(
+                            _PLATFORM_DEPENDENT_CHARACTER_MESSAGE,
+                            [(first[0] + start_row, first[1])])
+                else:
+                    indices = list(
+                        np.argwhere(map_cells(df, is_platform_dependent)))
+                    invalid_cells.extend(
+                        map(lambda i: (i[0] + start_row, i[1]), indices))
                 start_row += self.header_line_num
 
             return LintResult.gen_single_error_message_result(
-                "機種依存⽂字が含まれています。", invalid_cells)
+                _PLATFORM_DEPENDENT_CHARACTER_MESSAGE, invalid_cells)
 
         return LintResult(True, [])
 
@@ -264,53 +793,35 @@ class CSVLinter:
         except UnicodeDecodeError:
             return False
 
-    @before_check_1_1
-    def check_1_11(self):
+    @requires("df", "column_types", "column_relations")
+    def check_1_11(self, fail_fast=False):
         """チェック項目1-11に沿って、e-Stat の時間軸コードの表記、⻄暦表記⼜は和暦に⻄暦の併記がされているか確認する。
 
         Note:
             時刻コードもしくは西暦が隣接する列に併記されていない和暦の列を invalid とみなす。
         """
-        j2w = jeraconv.J2W()
-
-        def is_valid_element(jp_calendar: Any, adjacent: Any,
-                             regex: Pattern) -> bool:
-            try:
-                target_year = j2w.convert(str(jp_calendar))
-            except ValueError:
-                return True
-
-            if is_empty(jp_calendar):
-                return True
-
-            result = regex.match(str(adjacent))
-            if result is None:
-                return False
-            return int(result.groups()[0]) == target_year
-
         invalid_columns = []
-        conditions = [
-            AdjacentColumnCondition(
-                ColumnType.DATETIME_CODE,
-                partial(is_valid_element, regex=DATETIME_CODE_REGEX)),
-            AdjacentColumnCondition(
-                ColumnType.CHRISTIAN_ERA,
-                partial(is_valid_element, regex=CHRISTIAN_ERA_REGEX)),
+        relations = [
+            ColumnRelation.JP_CALENDAR_WITH_DATETIME_CODE,
+            ColumnRelation.JP_CALENDAR_WITH_CHRISTIAN_ERA
         ]
 
         for column in range(len(self.df.columns)):
+            self.deadline.check()
             if not self.column_classify[column] == ColumnType.JP_CALENDAR_YEAR:
                 continue
 
-            if not self.__check_adjacent_columns(column, conditions):
+            if not self.column_relations.has_adjacent(column, relations):
                 invalid_columns.append(
                     self.content_invalid_cell_factory.create(None, column))
+                if fail_fast:
+                    break
 
         return LintResult.gen_single_error_message_result(
             "和暦に適切な時間軸コードまたは⻄暦が併記されていません。", invalid_columns)
 
-    @before_check_1_1
-    def check_1_12(self):
+    @requires("df", "column_types", "column_relations")
+    def check_1_12(self, fail_fast=False):
         """チェック1-12に沿って、地域コードまたは地域名称が表記されているか確認する
 
         Note:
@@ -318,59 +829,10 @@ class CSVLinter:
             都道府県コードが隣接する列に併記されていない，都道府県名が省略された列を invalid とみなす
         """
 
-        prefectures_numbers = {
-            '北海道': 1,
-            '青森': 2,
-            '岩手': 3,
-            '宮城': 4,
-            '秋田': 5,
-            '山形': 6,
-            '福島': 7,
-            '茨城': 8,
-            '栃木': 9,
-            '群馬': 10,
-            '埼玉': 11,
-            '千葉': 12,
-            '東京': 13,
-            '神奈川': 14,
-            '新潟': 15,
-            '富山': 16,
-            '石川': 17,
-            '福井': 18,
-            '山梨': 19,
-            '長野': 20,
-            '岐阜': 21,
-            '静岡': 22,
-            '愛知': 23,
-            '三重': 24,
-            '滋賀': 25,
-            '京都': 26,
-            '大阪': 27,
-            '兵庫': 28,
-            '奈良': 29,
-            '和歌山': 30,
-            '鳥取': 31,
-            '島根': 32,
-            '岡山': 33,
-            '広島': 34,
-            '山口': 35,
-            '徳島': 36,
-            '香川': 37,
-            '愛媛': 38,
-            '高知': 39,
-            '福岡': 40,
-            '佐賀': 41,
-            '長崎': 42,
-            '熊本': 43,
-            '大分': 44,
-            '宮崎': 45,
-            '鹿児島': 46,
-            '沖縄': 47
-        }
-
         # 都道府県名に該当するセルのうち，完全な都道府県名で列が構成されている場合True
         def is_valid_prefecture_name_column(c_index):
             for name in self.df.iloc[:, c_index]:
+                self.deadline.tick()
                 if is_empty(name):
                     continue
 
@@ -381,6 +843,7 @@ class CSVLinter:
         # 都道府県を省略した記法で統一されている場合True
         def is_invalid_column(c_index):
             for name in self.df.iloc[:, c_index]:
+                self.deadline.tick()
                 if name == '北海道':
                     continue
 
@@ -400,23 +863,13 @@ class CSVLinter:
                 return True
             return False
 
-        def is_valid_prefecture_with_prefecture_code(name: Any, number: Any):
-            if not (isinstance(name, str) and isinstance(number, int)):
-                return False
-
-            return is_empty(name) or \
-                   (name == '北海道' and str(number) == '1') or \
-                   prefectures_numbers[name] == number
-
         invalid_cells = []
         invalid_columns = []
-        conditions = [
-            AdjacentColumnCondition(ColumnType.PREFECTURE_CODE,
-                                    is_valid_prefecture_with_prefecture_code)
-        ]
+        relations = [ColumnRelation.PREFECTURE_NAME_WITH_CODE]
 
         # 都道府県名に分類される列ごとに判定
         for j in range(len(self.df.columns)):
+            self.deadline.check()
             if not self.column_classify[j] == ColumnType.PREFECTURE_NAME:
                 continue
 
@@ -427,14 +880,21 @@ class CSVLinter:
             # 列の中で一部が省略されている場合
             if not is_invalid_column(j):
                 for i, name in enumerate(self.df.iloc[:, j]):
+                    self.deadline.tick()
                     if is_invalid_cell(name):
                         invalid_cells.append(
                             self.content_invalid_cell_factory.create(i, j))
+                        if fail_fast:
+                            break
+                if fail_fast and invalid_cells:
+                    break
                 continue
 
-            if not self.__check_adjacent_columns(j, conditions):
+            if not self.column_relations.has_adjacent(j, relations):
                 invalid_columns.append(
                     self.content_invalid_cell_factory.create(None, j))
+                if fail_fast:
+                    break
 
         invalid_contents = []
         if len(invalid_cells):
@@ -447,79 +907,171 @@ class CSVLinter:
 
         return LintResult(len(invalid_contents) == 0, invalid_contents)
 
-    @before_check_1_1
-    def check_1_13(self):
+    @requires("df", "column_types")
+    def check_1_13(self, fail_fast=False):
         """チェック項目1-13に沿って、数値データの同一列内に特殊記号（秘匿等）が含まれるか確認する。
 
         Note:
             数値データの同⼀列内に'0'、'X'、'***'以外の文字列が含まれる要素を invalid とみなす。
         """
         invalid_cells = []
+        number_columns = [
+            j for j in range(len(self.df.columns))
+            if self.column_classify[j].is_number()
+        ]
 
-        for j in range(len(self.df.columns)):
+        tiles = None if fail_fast else self.__map_tiles(
+            _find_invalid_symbols_in_tile, number_columns)
+        if tiles is not None:
+            invalid_cells = [
+                self.content_invalid_cell_factory.create(i, j)
+                for j, _, rows in tiles for i in rows
+            ]
+            number_columns = []
+
+        for j in number_columns:
             column = self.df.iloc[:, j]
-            if self.column_classify[j].is_number():
-                for i, elem in enumerate(column):
-                    # ex.1000円のようなケースはcheck_1_3でチェックするためスルー
-                    if is_include_number(elem):
-                        continue
-                    if elem not in ["***", "X", "0"]:
-                        invalid_cells.append(
-                            self.content_invalid_cell_factory.create(i, j))
+            for i, elem in enumerate(column):
+                self.deadline.tick()
+                if _is_invalid_symbol(elem):
+                    invalid_cells.append(
+                        self.content_invalid_cell_factory.create(i, j))
+                    if fail_fast:
+                        return LintResult.gen_single_error_message_result(
+                            _INVALID_SYMBOL_MESSAGE,
+                            invalid_cells)
 
         return LintResult.gen_single_error_message_result(
-            "数値データの列の空欄には'***','X','0'のいずれかを適切に入力してください。", invalid_cells)
+            _INVALID_SYMBOL_MESSAGE, invalid_cells)
 
-    @before_check_1_1
-    def check_2_x(self):
+    @requires("df", "non_empty_mask")
+    def check_2_x(self, fail_fast=False):
         """チェック項目2-1，2-2に沿って，データが分断されていないか，1シートに複数の表が掲載されていないか確認する。
 
         Note:
-            データのない行または列がある場合 invalid とみなす。
+            データのない行または列がある場合、もしくは空のセルで区切られた表が複数ある場合 invalid とみなす。
+            1列のみの領域はタイトルや注記とみなし、表として数えない。
         """
-        column_results = self.df.isnull().all(axis=1)
-        row_results = self.df.isnull().all()
+        empty_rows = np.flatnonzero(self.df.isnull().all(axis=1).values)
+        empty_columns = np.flatnonzero(self.df.isnull().all().values)
+        empty_cells = [
+            self.content_invalid_cell_factory.create(int(i), None)
+            for i in empty_rows
+        ] + [
+            self.content_invalid_cell_factory.create(None, int(j))
+            for j in empty_columns
+        ]
 
-        if column_results.sum() + row_results.sum():
-            return LintResult.gen_simple_error_result(
-                "データのない列や行が含まれている、もしくは複数の表が含まれています。")
-        else:
-            return LintResult(True, [])
+        if fail_fast and empty_cells:
+            return LintResult.gen_single_error_message_result(
+                _EMPTY_LINE_MESSAGE, empty_cells[:1])
 
-    def __decode(self, data: bytes) -> str:
-        self.encoding = chardet.detect(data)['encoding']
-        self.encoding = 'utf-8' if self.encoding is None else self.encoding
-        return data.decode(encoding=self.encoding)
+        self.deadline.check()
+        tables = [r for r in self.estimate_table_regions() if r.width > 1]
+
+        invalid_contents = []
+        if len(empty_cells):
+            invalid_contents.append(
+                InvalidContent(_EMPTY_LINE_MESSAGE, empty_cells))
+        if len(tables) > 1:
+            invalid_contents.append(
+                InvalidContent("1シートに複数の表が含まれています。",
+                               [(r.top, r.left) for r in tables]))
 
-    def __check_adjacent_columns(
-            self, column_i: int,
-            conditions: List[AdjacentColumnCondition]) -> bool:
-        """隣接する左右の列が条件を満たしているかを確認。
+        return LintResult(len(invalid_contents) == 0, invalid_contents)
 
-        Args:
-            column_i: 隣接を確認する対象の列のindex。
-            conditions: 確認する条件のリスト。
+    def estimate_table_regions(self) -> List[TableRegion]:
+        """シート全体から、空のセルで区切られた表の領域を推定する。
 
         Returns:
-            条件を満たす列が存在する場合にTrue、それ以外はFalse。
+            表の領域のリスト。上から順に並ぶ。ファイルが読み込めない場合は空のリスト。
+
+        Raises:
+            DeadlineExceededError: 制限時間を過ぎた場合。
         """
-        def check_adjacent_column(target_i: int, adjacent_i: int,
-                                  condition: AdjacentColumnCondition) -> bool:
-            if condition.type != self.column_classify[adjacent_i]:
-                return False
+        if "table_regions" not in self.cache:
+            if not self.prepare(["non_empty_mask"]) or \
+                    not self.check_1_1().is_valid:
+                return []
+            self.cache["table_regions"] = TableSegmenter(
+                self.non_empty_mask).perform()
+        return self.cache["table_regions"]
 
-            for target, adjacent in zip(self.df.iloc[:, target_i],
-                                        self.df.iloc[:, adjacent_i]):
-                if not condition.predicate(target, adjacent):
-                    return False
-            return True
 
-        if column_i > 0 and any(
-                map(partial(check_adjacent_column, column_i, column_i - 1),
-                    conditions)):
-            return True
-        if column_i + 1 < len(self.df.columns) and any(
-                map(partial(check_adjacent_column, column_i, column_i + 1),
-                    conditions)):
-            return True
-        return False
+_COMMA_DIVISION_MESSAGE = "句点によりデータが分割されています。"
+_BRACKETS_DIVISION_MESSAGE = "括弧によりデータが分割されています。"
+_INVALID_NUMBER_MESSAGE = "数値データに文字や空欄が含まれています。"
+_NUMBER_WITH_UNIT_MESSAGE = "数値データの列に単位などの文字が含まれている可能性があります。"
+_SPACES_MESSAGE = "スペースや改⾏が含まれています。"
+_PLATFORM_DEPENDENT_CHARACTER_MESSAGE = "機種依存⽂字が含まれています。"
+_INVALID_SYMBOL_MESSAGE = "数値データの列の空欄には'***','X','0'のいずれかを適切に入力してください。"
+_EMPTY_LINE_MESSAGE = "データのない列や行が含まれています。"
+
+_DIVIDED_BY_COMMA = "comma"
+_DIVIDED_BY_BRACKETS = "brackets"
+
+
+def _find_data_division(v) -> Optional[str]:
+    """1セルに複数のデータが含まれる場合、その区切り方を返す。"""
+    if not isinstance(v, str):
+        return None
+    elms = re.split("[、,]", v)
+    if len(elms) > 1:
+        for elm in elms:
+            m = NUM_WITH_BRACKETS_REGEX.match(
+                elm.strip())  # todo: もっと広いケースで通るように
+            if m is not None:
+                return _DIVIDED_BY_COMMA
+        return None
+    for r in [NUM_WITH_BRACKETS_REGEX, NUM_WITH_NUM_REGEX]:
+        if r.match(v.strip()) is not None:
+            return _DIVIDED_BY_BRACKETS
+    return None
+
+
+def _is_invalid_number(elem) -> bool:
+    # TODO: 問題のあるセルの定義が以下の分岐で拾えているか要確認
+    return not is_number(elem) and is_include_number(elem)
+
+
+def _count_number_strings(column, deadline: Optional[Deadline] = None) -> int:
+    """空のセルと、数値と単位の組 (ex.1000円) のセルの数を返す。"""
+    deadline = Deadline() if deadline is None else deadline
+    count = 0
+    for elem in column:
+        deadline.tick()
+        if is_empty(elem) or NUMBER_STRING_REGEX.match(str(elem)):
+            count += 1
+    return count
+
+
+def _is_invalid_symbol(elem) -> bool:
+    # ex.1000円のようなケースはcheck_1_3でチェックするためスルー
+    return not is_include_number(elem) and elem not in ["***", "X", "0"]
+
+
+# 以下は tiling.map_tiles でタイルごとに実行する関数。行の位置は DataFrame 上の位置で返す
+
+
+def _find_data_divisions_in_tile(values, row_start):
+    return [(row_start + i, division)
+            for i, division in enumerate(map(_find_data_division, values))
+            if division is not None]
+
+
+def _find_invalid_numbers_in_tile(values, row_start):
+    return [
+        row_start + i for i, elem in enumerate(values)
+        if _is_invalid_number(elem)
+    ]
+
+
+def _count_number_strings_in_tile(values, row_start):
+    return _count_number_strings(values)
+
+
+def _find_invalid_symbols_in_tile(values, row_start):
+    return [
+        row_start + i for i, elem in enumerate(values)
+        if _is_invalid_symbol(elem)
+    ]
@@ -1,67 +1,234 @@
 import csv
+import hashlib
+import json
+import unicodedata
 from io import StringIO
-from typing import List, Tuple
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
-from .errors import HeaderEstimateError
+from .arrow_engine import PANDAS_ENGINE, pandas_buffer_lines, read_csv
+from .deadline import Deadline
+from .errors import HeaderEstimateError, RaggedTableError
 from .funcs import is_number
+from .row_index import RowIndex
 
 
 class CSVStructureAnalyzer:
-    def __init__(self, text: str, should_print_info: bool = False):
-        reader = csv.reader(StringIO(text))
-        self.__rows = list(reader)
-        self.__row_element_counts = list(map(len, self.__rows))
+    # gen_non_empty_mask でまとめて文字列の配列に変換する行数
+    MASK_BLOCK_ROWS = 4096
+
+    def __init__(self,
+                 text: str,
+                 should_print_info: bool = False,
+                 rows: Optional[List[List[str]]] = None,
+                 deadline: Optional[Deadline] = None,
+                 title_line_num: Optional[int] = None,
+                 header_line_num: Optional[int] = None):
+        """
+        :param text: 解析対象の CSV テキスト
+        :param rows: 解析済みの行。与えられた場合は text を再度パースしない。
+            与えられない場合は RowIndex で行ごとの要素数のみを求め、行の値は必要な範囲だけパースする
+        :param deadline: 制限時刻。過ぎた場合は DeadlineExceededError を送出する
+        :param title_line_num: タイトルの行数。与えられた場合は推定しない
+        :param header_line_num: ヘッダーの行数。与えられた場合は推定しない
+        """
+        self.__deadline = Deadline() if deadline is None else deadline
+        self.__index = RowIndex.from_text(text) if rows is None else None
+        if self.__index is not None:
+            self.__rows = None
+            self.__row_element_counts = self.__index.field_counts
+        else:
+            self.__rows = self.parse(text,
+                                     self.__deadline) if rows is None else rows
+            self.__row_element_counts = np.fromiter(map(len, self.__rows),
+                                                    dtype=np.int64,
+                                                    count=len(self.__rows))
         self.__row_count = len(self.__row_element_counts)
+        self.__deadline.check()
 
-        self.__content_range = self.__estimate_content_range()
-        self.title_line_num = self.__content_range[0]
-        self.header_line_num = self.__estimate_header_line_num()
+        self.__estimated_content_range = self.__estimate_content_range()
+        self.resegment(title_line_num, header_line_num)
 
         if should_print_info:
             self.__print_debug_info()
 
-    def gen_header_df(self) -> DataFrame:
+    def resegment(self,
+                  title_line_num: Optional[int] = None,
+                  header_line_num: Optional[int] = None):
+        """
+        パース済みの行と推定済みの表の範囲はそのままに、タイトル・ヘッダーの行数を指定し直す
+        :param title_line_num: タイトルの行数。None の場合は推定した値
+        :param header_line_num: ヘッダーの行数。None の場合は推定し直す
+        :raises ValueError: 行数が範囲外の場合
+        :raises RaggedTableError: 表 (ヘッダーと表本体) に要素の数が異なる行が含まれる場合
+        """
+        start, end = self.__estimated_content_range
+        if title_line_num is not None:
+            if not 0 <= title_line_num < self.__row_count:
+                raise ValueError(
+                    f"title_line_num out of range: {title_line_num}")
+            start, end = title_line_num, max(end, title_line_num)
+        content_range = (start, end)
+        if header_line_num is None:
+            header_line_num = self.__estimate_header_line_num(content_range)
+        elif not 0 <= header_line_num <= self.__row_count - start:
+            raise ValueError(f"header_line_num out of range: {header_line_num}")
+        self.__validate_element_counts(start, max(end, start + header_line_num))
+
+        self.__content_range = content_range
+        self.title_line_num = start
+        self.header_line_num = header_line_num
+
+    def get_header_rows(self) -> List[List[str]]:
+        return self.__get_rows(*self.__header_range())
+
+    def get_content_rows(self) -> List[List[str]]:
+        return self.__get_rows(*self.__rows_range())
+
+    def get_header_text(self) -> str:
+        """
+        ヘッダーの行の CSV テキスト。各行は改行で終わる
+        """
+        return self.__get_text(*self.__header_range())
+
+    def get_content_text(self) -> str:
+        """
+        表本体の行の CSV テキスト。各行は改行で終わる
+        """
+        return self.__get_text(*self.__rows_range())
+
+    def get_record_counts(self) -> Tuple[int, int]:
+        """
+        ヘッダーと表本体の、空行を除いた行数
+        """
+        return tuple(
+            int(np.count_nonzero(self.__row_element_counts[start:stop]))
+            for start, stop in [self.__header_range(),
+                                self.__rows_range()])
+
+    def get_row_count(self) -> int:
+        """
+        テキスト全体の行数。空行を含む
+        """
+        return self.__row_count
+
+    def get_content_range(self) -> Tuple[int, int]:
+        """
+        タイトルを除いた表 (ヘッダーと表本体) の行のレンジ(inclusive, exclusive)
+        """
+        return self.__content_range
+
+    def get_column_count(self) -> int:
+        return int(self.__row_element_counts[self.__content_range[0]])
+
+    def gen_header_df(self, engine: str = PANDAS_ENGINE) -> DataFrame:
         if self.header_line_num == 0:
             return pd.DataFrame(np.empty(0))
 
-        return pd.read_csv(StringIO(self.__get_header()), header=None)
+        return read_csv(self.get_header_text(), self.get_column_count(),
+                        engine)
+
+    def gen_rows_df(self, engine: str = PANDAS_ENGINE) -> DataFrame:
+        return read_csv(self.get_content_text(), self.get_column_count(),
+                        engine)
 
-    def gen_rows_df(self) -> DataFrame:
-        return pd.read_csv(StringIO(self.__get_rows()), header=None)
+    def gen_rows_dfs(self,
+                     engine: str = PANDAS_ENGINE,
+                     chunk_rows: int = 1) -> Iterator[DataFrame]:
+        """
+        表本体を行のチャンクごとに読み込む
+        :param chunk_rows: チャンクの行数の目安。pandas が型を推定するチャンクの行数の倍数に切り上げるため、
+            funcs.concat_chunks で結合した表は gen_rows_df と一致する
+        """
+        column_count = self.get_column_count()
+        buffer_lines = pandas_buffer_lines(column_count)
+        step = -(-max(chunk_rows, 1) // buffer_lines) * buffer_lines
+        start, stop = self.__rows_range()
+        for chunk_start in range(start, max(stop, start + 1), step):
+            self.__deadline.check()
+            yield read_csv(
+                self.__get_text(chunk_start, min(chunk_start + step, stop)),
+                column_count, engine)
+
+    def gen_non_empty_mask(self) -> np.ndarray:
+        """
+        ファイル全体について、空白以外の値を含むセルを True とするマスクを生成
+        セルの文字列の配列は MASK_BLOCK_ROWS 行ごとに作り、ファイル全体の配列は作らない
+        :return: (行数, 最大の列数) の bool 配列
+        """
+        column_count = max(self.__row_element_counts, default=0)
+        mask = np.zeros((self.__row_count, column_count), dtype=bool)
+        for start in range(0, self.__row_count, self.MASK_BLOCK_ROWS):
+            stop = min(start + self.MASK_BLOCK_ROWS, self.__row_count)
+            cells = np.full((stop - start, column_count), "", dtype=object)
+            for i, row in enumerate(self.__iter_rows(start, stop)):
+                cells[i, :len(row)] = row
+            mask[start:stop] = np.char.str_len(
+                np.char.strip(cells.astype(str))) > 0
+            self.__deadline.check()
+        return mask
+
+    def gen_header_fingerprint(self) -> str:
+        """
+        ヘッダーの内容と列数から、表のレイアウトを識別するハッシュを生成
+        :return: 全角・半角と前後の空白の違いを除いたヘッダーの SHA-256
+        """
+        header = [[unicodedata.normalize("NFKC", cell).strip() for cell in row]
+                  for row in self.get_header_rows()]
+        return hashlib.sha256(
+            json.dumps([self.get_column_count(), header],
+                       ensure_ascii=False).encode()).hexdigest()
+
+    @staticmethod
+    def parse(text: str,
+              deadline: Optional[Deadline] = None) -> List[List[str]]:
+        """
+        制限時刻を確認しながら、一定の行数ごとに CSV をパース
+        """
+        deadline = Deadline() if deadline is None else deadline
+        reader = csv.reader(StringIO(text))
+        rows = []
+        while True:
+            chunk = list(islice(reader, Deadline.CHECK_INTERVAL))
+            if not chunk:
+                return rows
+            rows.extend(chunk)
+            deadline.check()
 
     def __estimate_content_range(self) -> Tuple[int, int]:
         """
         行ごとにカンマで区切られた要素の数を計算し、同じ数が最も連続している部分をContentと判別
         :return: Contentが含まれる行のレンジ(inclusive, exclusive)
         """
-        consecutive_counts: List[int] = []
-        count = 0
-        for i in range(self.__row_count):
-            if i == self.__row_count - 1 or self.__row_element_counts[
-                    i] == self.__row_element_counts[i + 1]:
-                count += 1
-                continue
-
-            consecutive_counts.append(count + 1)
-            count = 0
-        consecutive_counts.append(count)
-
-        max_count = max(consecutive_counts)
-        start_index = 0
-        for c in consecutive_counts:
-            if c == max_count:
-                break
-            start_index += c
-
-        return start_index, start_index + max_count
-
-    def __estimate_header_line_num(self):
-        cr = self.__content_range
-        for i, row in enumerate(self.__rows[cr[0]:cr[1]]):
+        if self.__row_count == 0:
+            return 0, 0
+        counts = self.__row_element_counts
+        run_starts = np.concatenate([[0],
+                                     np.flatnonzero(np.diff(counts)) + 1])
+        run_lengths = np.diff(np.append(run_starts, self.__row_count))
+        # 最も長い連続のうち、最初のもの
+        k = int(np.argmax(run_lengths))
+        start_index = int(run_starts[k])
+        return start_index, start_index + int(run_lengths[k])
+
+    def __validate_element_counts(self, start: int, stop: int):
+        """
+        指定した範囲の行の要素の数が揃っているか確認する。空行は読み込み時に読み飛ばすため除く
+        """
+        counts = self.__row_element_counts[start:stop]
+        counts = counts[counts > 0]
+        if len(counts) > 0 and (counts != counts[0]).any():
+            raise RaggedTableError(
+                f"rows [{start}, {stop}) have different element counts: "
+                f"{sorted(set(counts.tolist()))}")
+
+    def __estimate_header_line_num(self, cr: Tuple[int, int]) -> int:
+        for i, row in enumerate(self.__iter_rows(cr[0], cr[1])):
+            self.__deadline.tick()
             for element in row:
                 if is_number(element):
                     return i
@@ -69,7 +236,8 @@ class CSVStructureAnalyzer:
         raise HeaderEstimateError()
 
     def __print_debug_info(self):
-        lines = list(map(self.__to_line, self.__rows))
+        lines = list(
+            map(self.__to_line, self.__get_rows(0, self.__row_count)))
         print(f"========== Title([0, {self.title_line_num})) ==========")
         print("\n".join(lines[:self.title_line_num]))
 
@@ -77,23 +245,48 @@ class CSVStructureAnalyzer:
         print(
             f"========== Header([{self.title_line_num}, {header_end})) =========="
         )
-        print(self.__get_header())
+        print(self.get_header_text())
 
         rows_end = self.__content_range[1]
         print(f"========== Rows([{header_end}, {rows_end})) ==========")
-        print(self.__get_rows())
+        print(self.get_content_text())
 
-    def __get_header(self):
-        header_end = self.title_line_num + self.header_line_num
-        header_lines = map(self.__to_line,
-                           self.__rows[self.title_line_num:header_end])
-        return "".join(header_lines)
-
-    def __get_rows(self):
-        cr = self.__content_range
-        content_lines = map(self.__to_line,
-                            self.__rows[cr[0] + self.header_line_num:cr[1]])
-        return "".join(content_lines)
+    def __header_range(self) -> Tuple[int, int]:
+        return self.title_line_num, self.title_line_num + self.header_line_num
+
+    def __rows_range(self) -> Tuple[int, int]:
+        return self.__content_range[0] + self.header_line_num, \
+            self.__content_range[1]
+
+    def __iter_rows(self, start: int, stop: int) -> Iterator[List[str]]:
+        if self.__index is not None:
+            return self.__index.iter_rows(start, stop)
+        return iter(self.__rows[start:stop])
+
+    def __get_rows(self, start: int, stop: int) -> List[List[str]]:
+        if self.__index is not None:
+            return self.__index.get_rows(start, stop)
+        return self.__rows[start:stop]
+
+    def __get_text(self, start: int, stop: int) -> str:
+        # RowIndex がある場合は元のテキストを切り出す。改行で終わらない最後の行には改行を補う。
+        # 1列の表は、クォートされていない空白のみの行を to_lines と同様にクォートするため書き直す
+        if self.__index is None or self.get_column_count() == 1:
+            return self.to_lines(self.__get_rows(start, stop))
+        text = self.__index.get_text(start, stop)
+        return text if not text or text.endswith("\n") else text + "\n"
+
+    @staticmethod
+    def to_lines(rows: List[List[str]]) -> str:
+        output = StringIO()
+        writer = csv.writer(output)
+        for row in rows:
+            if len(row) == 1 and row[0] and not row[0].strip():
+                # 空白のみの1列の行は、クォートしないと read_csv が空行として読み飛ばす
+                output.write(f'"{row[0]}"\r\n')
+            else:
+                writer.writerow(row)
+        return output.getvalue()
 
     @staticmethod
     def __to_line(row: List[str]):
@@ -0,0 +1,36 @@
+import time
+from typing import Optional
+
+from .errors import DeadlineExceededError
+
+
+class Deadline:
+    """lint の制限時刻。長いループの中で呼び出し、時間切れの場合は DeadlineExceededError を送出する。
+
+    Args:
+        timeout: 制限時間 (秒)。None の場合は時間切れにならない。
+    """
+    CHECK_INTERVAL = 1024  # tick で時刻を確認する間隔
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = None if timeout is None else time.monotonic(
+        ) + timeout
+        self.__ticks = 0
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def check(self):
+        if self.expires_at is not None and time.monotonic() > self.expires_at:
+            raise DeadlineExceededError()
+
+    def tick(self):
+        """セルごとのループで呼び出す。CHECK_INTERVAL 回に1回だけ時刻を確認する。"""
+        if self.expires_at is None:
+            return
+        self.__ticks += 1
+        if self.__ticks >= self.CHECK_INTERVAL:
+            self.__ticks = 0
+            self.check()
@@ -1,2 +1,14 @@
 class HeaderEstimateError(Exception):
     pass
+
+
+class MemoryBudgetExceededError(Exception):
+    pass
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+class RaggedTableError(ValueError):
+    pass
@@ -1,20 +1,50 @@
 import csv
 import datetime
 import io
+import json
+import os
+from typing import Dict, Iterator, Tuple
 
 import openpyxl
 from openpyxl.cell import Cell
 
 from .csv_linter import CSVLinter
-from .funcs import before_check_1_1
-from .vo import LintResult
+from .deadline import Deadline
+from .errors import DeadlineExceededError
+from .funcs import before_check_1_1, validate_in_order
+from .vo import LintResult, ValidationResult
+
+
+def get_used_range(ws) -> Tuple[int, int]:
+    """値のあるセルを全て含む範囲の、最後の行と列の番号 (1-base)。値がない場合は (0, 0)。
+
+    Note:
+        ws.max_row・ws.max_column は書式のみが設定された空のセルも含むため、
+        読み込み済みのセル (ws._cells) のうち、値のあるものから求める。
+    """
+    max_row = max_column = 0
+    for (r, c), cell in ws._cells.items():
+        if cell.value is not None:
+            max_row = max(max_row, r)
+            max_column = max(max_column, c)
+    return max_row, max_column
 
 
 def ws2csv(ws) -> str:
+    """シートの値のある範囲を CSV に変換する。
+
+    Note:
+        末尾の空の行・列は書き出さない。セルの位置は変わらない。
+        ws.rows と異なり、値のない位置のセルを生成しない。
+    """
+    max_row, max_column = get_used_range(ws)
+    rows = [[None] * max_column for _ in range(max_row)]
+    for (r, c), cell in ws._cells.items():
+        if cell.value is not None:
+            rows[r - 1][c - 1] = __to_value(cell)
     with io.StringIO() as s:
         writer = csv.writer(s)
-        for row in ws.rows:
-            writer.writerow([__to_value(cell) for cell in row])
+        writer.writerows(rows)
         return s.getvalue()
 
 
@@ -39,7 +69,12 @@ class ExcelLinter:
                  data: bytes,
                  filename: str,
                  title_line_num=None,
-                 header_line_num=None):
+                 header_line_num=None,
+                 engine=None,
+                 workers=None,
+                 schema_store=None,
+                 timeout=None):
+        deadline = Deadline(timeout)
         with io.BytesIO(data) as f:
             wb = openpyxl.load_workbook(f)
             # df = pd.read_excel(f, header=None)
@@ -51,33 +86,105 @@ class ExcelLinter:
             break
 
         self.wb = wb
+        self.__saved_cells = None
         self.csv_linter = CSVLinter(self.text.encode(),
                                     "from_excel.csv",
                                     title_line_num=title_line_num,
-                                    header_line_num=header_line_num)
+                                    header_line_num=header_line_num,
+                                    engine=engine,
+                                    workers=workers,
+                                    schema_store=schema_store,
+                                    timeout=deadline.remaining())
+
+    @classmethod
+    def from_artifacts(cls, path: str, **kwargs):
+        """save_artifacts で保存した解析結果から linter を生成する。ブックは読み込まない。"""
+        linter = cls.__new__(cls)
+        linter.ws = None
+        linter.wb = None
+        linter.text = None
+        with open(os.path.join(path, "excel.json"), encoding="utf-8") as f:
+            linter.__saved_cells = {
+                k: [tuple(c) for c in v]
+                for k, v in json.load(f).items()
+            }
+        linter.csv_linter = CSVLinter.from_artifacts(os.path.join(path, "csv"),
+                                                     **kwargs)
+        return linter
+
+    def save_artifacts(self, path: str):
+        """表の解析結果と、結合されたセル・数式のセルの位置をディレクトリ path に保存する。"""
+        self.csv_linter.save_artifacts(os.path.join(path, "csv"))
+        with open(os.path.join(path, "excel.json"), "w",
+                  encoding="utf-8") as f:
+            json.dump(
+                {
+                    "merged_cells": list(self.__iter_merged_cells()),
+                    "formula_cells": list(self.__iter_formula_cells())
+                }, f)
+
+    def __iter_merged_cells(self) -> Iterator[Tuple[int, int]]:
+        if self.__saved_cells is not None:
+            yield from self.__saved_cells["merged_cells"]
+            return
+        for merged_cell in self.ws.merged_cells:
+            b = merged_cell.bounds
+            yield b[1] - 1, b[0] - 1  # 0-base-index
+
+    def __iter_formula_cells(self) -> Iterator[Tuple[int, int]]:
+        if self.__saved_cells is not None:
+            yield from self.__saved_cells["formula_cells"]
+            return
+        # 値のないセルは数式を含まないため、読み込み済みのセルのみを行・列の順に確認する
+        cells = self.ws._cells
+        for r, c in sorted(cells):
+            self.deadline.tick()
+            if str(cells[r, c].value).startswith("="):
+                yield r - 1, c - 1
+
+    def run(self, checks=None) -> Dict[str, LintResult]:
+        """指定されたチェックが依存する成果物だけを生成し、チェックを実行する。
+        """
+        if checks is None:
+            checks = self.csv_linter.VALIDATION_ORDER
+        try:
+            self.csv_linter.prepare([
+                artifact for name in checks for artifact in getattr(
+                    getattr(self.csv_linter, name), "required_artifacts", [])
+            ])
+        except DeadlineExceededError:
+            pass
+        return {name: getattr(self, name)() for name in checks}
+
+    def validate(self, checks=None) -> ValidationResult:
+        """各チェックを計算コストの小さい順に実行し、最初に違反が見つかった時点で打ち切る。
+        """
+        return validate_in_order(self, self.csv_linter.VALIDATION_ORDER,
+                                 checks)
 
     @before_check_1_1
-    def check_1_4(self):
+    def check_1_4(self, fail_fast=False):
         """チェック項目1-4に沿って、セルの結合をしていないか確認する。
         """
         invalid_cells = []
-        for merged_cell in self.ws.merged_cells:
-            b = merged_cell.bounds
-            invalid_cells.append((b[1] - 1, b[0] - 1))  # 0-base-index
+        for cell in self.__iter_merged_cells():
+            invalid_cells.append(cell)
+            if fail_fast:
+                break
         return LintResult.gen_single_error_message_result(
             "結合されたセルが存在します", invalid_cells)
 
     @before_check_1_1
-    def check_1_7(self):
+    def check_1_7(self, fail_fast=False):
         """チェック項目1-7に沿って、数式を使⽤している場合は数値データに修正しているか確認する。
 
         Note:
             '='から始まるセルを invalid とみなす。
         """
         invalid_cells = []
-        for r in range(0, self.ws.max_row):
-            for c in range(0, self.ws.max_column):
-                if str(self.ws.cell(r + 1, c + 1).value).startswith("="):
-                    invalid_cells.append((r, c))
+        for cell in self.__iter_formula_cells():
+            invalid_cells.append(cell)
+            if fail_fast:
+                break
         return LintResult.gen_single_error_message_result(
             "数式が含まれています", invalid_cells)
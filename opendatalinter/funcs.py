@@ -1,15 +1,19 @@
-from functools import wraps
+from functools import lru_cache, wraps
 
+import numpy as np
 import pandas as pd
 from jeraconv import jeraconv
-from typing import Pattern
+from typing import Any, Callable, Iterable, List, Optional, Pattern, Tuple
+
+from pandas.api.types import union_categoricals
 
 from .regex import (
     EMPTY_REGEX_LIST,
     VALID_PREFECTURE_NAME,
     INVALID_PREFECTURE_NAME,
 )
-from .vo import LintResult
+from .errors import DeadlineExceededError
+from .vo import LintResult, TimedOutLintResult, ValidationResult
 
 
 def is_number(elem):
@@ -87,6 +91,14 @@ def is_include_number(elem):
     return any(map(str.isdigit, str(elem)))
 
 
+@lru_cache(maxsize=None)
+def get_j2w() -> jeraconv.J2W:
+    """
+    和暦の変換器を返す。変換表の読み込みは初回のみ行う
+    """
+    return jeraconv.J2W()
+
+
 def is_jp_calendar_year(j2w: jeraconv.J2W, year_str: str) -> bool:
     try:
         j2w.convert(year_str)
@@ -95,12 +107,197 @@ def is_jp_calendar_year(j2w: jeraconv.J2W, year_str: str) -> bool:
         return False
 
 
+def requires(*artifacts):
+    """チェックが依存する成果物を登録し、チェックの実行前に必要な成果物だけを生成する。
+
+    Note:
+        制限時間を過ぎた場合は、チェックを打ち切って TimedOutLintResult を返す。
+
+    Args:
+        artifacts: CSVLinter.ARTIFACT_DEPENDENCIES に定義された成果物名。
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                self.deadline.check()
+                if not self.prepare(artifacts) or not self.check_1_1().is_valid:
+                    return LintResult.gen_simple_error_result(
+                        "ファイルが読み込めなかったため、チェックできませんでした。",
+                        is_valid=None)
+                return func(self, *args, **kwargs)
+            except DeadlineExceededError:
+                return TimedOutLintResult.gen_result()
+
+        wrapper.required_artifacts = artifacts
+        return wrapper
+
+    return decorator
+
+
+def to_compact_df(df: pd.DataFrame,
+                  max_unique_rate: float = 0.5) -> pd.DataFrame:
+    """文字列のみからなる列を、値の種類が少ない場合に categorical に変換する。
+
+    Note:
+        同じ文字列 (都道府県名、和暦、'***' など) を1つのオブジェクトで共有し、セルごとには
+        整数のコードのみを持たせる。数値の列は numpy の配列のまま変換しない。
+        文字列以外の値を含む列は、True と 1 のように等価な値がまとめられてしまうため変換しない。
+        df.copy(deep=False) は元の表のブロックへの参照 (parent) を持ち続けるため、列から作り直す。
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object and pd.api.types.infer_dtype(
+                values, skipna=True) == "string" and values.nunique(
+                ) <= len(values) * max_unique_rate:
+            values = values.astype("category")
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index, columns=df.columns)
+
+
+def concat_chunks(chunks: Iterable[pd.DataFrame],
+                  compact: bool = True,
+                  max_unique_rate: float = 0.5) -> pd.DataFrame:
+    """行のチャンクごとに読み込んだ表を、1度に読み込んだ場合と同じ表に結合する。
+
+    Note:
+        pd.read_csv が内部のチャンクを結合する場合と同様に、列ごとに np.concatenate で結合する。
+        compact の場合、文字列のみからなるチャンクは読み込んだ時点で categorical に変換し、
+        全体の object の配列を作らない。結合後の列が to_compact_df の条件を満たさない場合のみ
+        object の配列に戻すため、結果は to_compact_df を適用した場合と一致する。
+    """
+    parts: Optional[List[List[Any]]] = None
+    for df in chunks:
+        if parts is None:
+            parts = [[] for _ in df.columns]
+        for j in range(len(df.columns)):
+            values = df.iloc[:, j].values
+            if compact and values.dtype == object and pd.api.types.infer_dtype(
+                    values, skipna=True) == "string":
+                values = pd.Categorical(values)
+            parts[j].append(values)
+    if parts is None:
+        return pd.DataFrame()
+    return pd.DataFrame(
+        {
+            j: _concat_column(arrays, compact, max_unique_rate)
+            for j, arrays in enumerate(parts)
+        },
+        index=pd.RangeIndex(sum(len(a) for a in parts[0])))
+
+
+def _concat_column(arrays: List[Any], compact: bool, max_unique_rate: float):
+    categoricals = [a for a in arrays if isinstance(a, pd.Categorical)]
+    # 全て欠損値のチャンクは float64 で読み込まれ、文字列の列と結合すると nan になる
+    if categoricals and all(
+            isinstance(a, pd.Categorical) or (
+                a.dtype == np.float64 and np.isnan(a).all()) for a in arrays):
+        length = sum(len(a) for a in arrays)
+        merged = union_categoricals([
+            a if isinstance(a, pd.Categorical) else pd.Categorical(
+                np.full(len(a), np.nan, dtype=object)) for a in arrays
+        ],
+                                    sort_categories=True)
+        if len(merged.categories) <= length * max_unique_rate:
+            return merged
+    if len(arrays) == 1 and not categoricals:
+        return arrays[0]
+    return np.concatenate([
+        np.asarray(a, dtype=object) if isinstance(a, pd.Categorical) else a
+        for a in arrays
+    ])
+
+
+def map_cells(df: pd.DataFrame, func: Callable[[Any], bool]) -> np.ndarray:
+    """``df.applymap(func).values`` と同じ bool の配列を求める。
+
+    Note:
+        列ごとに、同じ型・同じ値のセルについては func を1度だけ評価する。
+    """
+    result = np.zeros(df.shape, dtype=bool)
+    for j in range(len(df.columns)):
+        memo = {}
+        flags = []
+        for v in df.iloc[:, j].tolist():
+            key = (type(v), v)
+            if key not in memo:
+                memo[key] = func(v)
+            flags.append(memo[key])
+        result[:, j] = flags
+    return result
+
+
+def find_first_cell(df: pd.DataFrame,
+                    func: Callable[[Any], bool],
+                    deadline=None) -> Optional[Tuple[int, int]]:
+    """func が True となる最初のセルの位置を返す。
+
+    ``np.argwhere(map_cells(df, func))[0]`` と同じ位置（行優先で最初）を、
+    見つかった時点で打ち切って求める。該当するセルがない場合は None を返す。
+
+    Note:
+        列ごとに走査し、2列目以降はそれまでに見つかった行より前だけを調べる。
+    """
+    first = None
+    for j in range(len(df.columns)):
+        if deadline is not None:
+            deadline.check()
+        rows = len(df) if first is None else first[0]
+        memo = {}
+        for i, v in enumerate(df.iloc[:rows, j].tolist()):
+            key = (type(v), v)
+            if key not in memo:
+                memo[key] = func(v)
+            if memo[key]:
+                first = (i, j)
+                break
+    return first
+
+
 def before_check_1_1(func):
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        if not self.check_1_1().is_valid:
-            return LintResult.gen_simple_error_result(
-                "ファイルが読み込めなかったため、チェックできませんでした。", is_valid=None)
-        return func(self, *args, **kwargs)
+        try:
+            self.deadline.check()
+            result = self.check_1_1()
+            if isinstance(result, TimedOutLintResult):
+                return result
+            if not result.is_valid:
+                return LintResult.gen_simple_error_result(
+                    "ファイルが読み込めなかったため、チェックできませんでした。", is_valid=None)
+            return func(self, *args, **kwargs)
+        except DeadlineExceededError:
+            return TimedOutLintResult.gen_result()
 
     return wrapper
+
+
+def validate_in_order(linter,
+                      order: List[str],
+                      checks: Optional[List[str]] = None) -> ValidationResult:
+    """チェック項目を order の順に fail_fast で実行し、最初に失敗した時点で打ち切る。
+
+    Args:
+        linter: チェックを実行する linter。
+        order: 計算コストの小さい順に並べたチェック項目名。
+        checks: 実行するチェック項目名。None の場合は order の全てを実行する。
+    """
+    if checks is None:
+        checks = order
+    unknown_checks = set(checks) - set(order)
+    if unknown_checks:
+        raise ValueError(f"unknown checks: {sorted(unknown_checks)}")
+
+    for name in sorted(set(checks) | {"check_1_1"}, key=order.index):
+        result = getattr(linter, name)(fail_fast=True)
+        if result.is_valid:
+            continue
+
+        if not result.invalid_contents:
+            return ValidationResult(result.is_valid, name)
+        content = result.invalid_contents[0]
+        return ValidationResult(
+            result.is_valid, name, content.error_message,
+            content.invalid_cells[0] if content.invalid_cells else None)
+    return ValidationResult(True)
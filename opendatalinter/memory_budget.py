@@ -0,0 +1,295 @@
+import ctypes
+import gc
+import io
+import os
+import resource
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .arrow_engine import pandas_buffer_lines
+from .csv_linter import CSVLinter
+from .deadline import Deadline
+from .errors import MemoryBudgetExceededError
+from .excel_linter import ExcelLinter
+from .open_data_linter import EXCEL_EXTENSIONS
+from .sampling import SampledCSVLinter
+from .scheduler import EXCEL_XML_BYTES_PER_CELL, PEEK_SIZE, estimate_cost
+from .vo import LintResult
+
+IN_MEMORY_PATH = "in_memory"
+CHUNKED_PATH = "chunked"
+SAMPLED_PATH = "sampled"
+# メモリ使用量の多い順
+EXECUTION_PATHS = [IN_MEMORY_PATH, CHUNKED_PATH, SAMPLED_PATH]
+
+# 以下の係数は、生成した CSV (数値の多い表・文字列の多い表) を lint した際の
+# RSS の増分の最大値に当てはめ、切り上げた値
+# 入力によらず確保されるバイト数 (チェックで初めて読み込むモジュールなど)
+FIXED_BYTES = 32 * 2**20
+# 入力の1バイトあたりに確保されるバイト数 (デコードしたテキストと RowIndex)
+BYTES_PER_INPUT_BYTE = 6
+# 読み込み中のテキストの1バイト・1セルあたりに確保されるバイト数。
+# in_memory は表全体を、chunked はチャンクの分だけを一度に読み込む
+LOAD_BYTES_PER_BYTE = 20
+LOAD_BYTES_PER_CELL = 50
+# 読み込んだ表・マスクと、チェックの作業領域のセル1つあたりのバイト数
+RETAINED_BYTES_PER_CELL = 40
+# chunked で一度に読み込むセル数の目安。pandas が型を推定するチャンクの行数に切り上げる
+CHUNK_CELLS = 2**20
+# sampled で読み込むバイト数の目安 (先頭とサンプリングした行)
+SAMPLED_BYTES = SampledCSVLinter.DEFAULT_HEAD_SIZE + \
+    SampledCSVLinter.DEFAULT_SAMPLE_SIZE * 1024
+# Excel の XML の1バイトあたりにブックの読み込みで確保されるバイト数
+EXCEL_BYTES_PER_XML_BYTE = 12
+
+_LIBC = None
+
+
+@dataclass
+class MemoryPlan:
+    """lint の実行経路と、推定・実測したメモリ使用量 (バイト)。
+
+    Attributes:
+        estimates: 実行経路ごとの推定使用量。実行できない経路は含まない
+        execution_path: 結果を返した実行経路。どの経路でも予算を超えた場合は None
+        fallbacks: 実行中に予算を超えたため打ち切った実行経路
+        observed_peak: 監視した使用量 (RSS の開始時からの増分) の最大値
+    """
+    budget: int
+    kind: str
+    estimates: Dict[str, int]
+    execution_path: Optional[str]
+    fallbacks: List[str] = field(default_factory=list)
+    observed_peak: int = 0
+
+    def to_dict(self):
+        return {
+            "budget": self.budget,
+            "kind": self.kind,
+            "estimates": self.estimates,
+            "execution_path": self.execution_path,
+            "fallbacks": self.fallbacks,
+            "observed_peak": self.observed_peak,
+        }
+
+
+def estimate_footprint(head: bytes, size: int,
+                       filename: str) -> Dict[str, int]:
+    """ファイルの先頭 head と大きさ size から、実行経路ごとのメモリ使用量を推定する。
+
+    Note:
+        CSV の行数・列数は scheduler.estimate_cost と同じ方法で推定する。
+        入力のバイト列は呼び出し元が保持しているため含めない。
+        Excel はブック全体を読み込むため in_memory のみ、
+        CSV・Excel 以外のファイルは読み込まずにエラーとなるため 0 とする。
+    """
+    cost = estimate_cost(head, size, filename)
+    if cost.kind == "excel":
+        # cost は XML のバイト数とセル数を CSV のセル数に換算した値
+        return {
+            IN_MEMORY_PATH:
+            int(FIXED_BYTES + cost.cost * EXCEL_XML_BYTES_PER_CELL *
+                EXCEL_BYTES_PER_XML_BYTE)
+        }
+    if cost.kind != "csv":
+        return {IN_MEMORY_PATH: 0}
+
+    cells = cost.row_count * cost.column_count
+    # gen_rows_dfs は pandas のチャンクの行数の倍数に切り上げて読み込む
+    buffer_lines = pandas_buffer_lines(cost.column_count)
+    chunk_rows = -(-_chunk_rows(cost.column_count) // buffer_lines) * buffer_lines
+    chunk_rate = min(chunk_rows / max(cost.row_count, 1), 1.0)
+
+    def estimate(load_rate: float) -> float:
+        return (FIXED_BYTES + size * BYTES_PER_INPUT_BYTE +
+                (size * LOAD_BYTES_PER_BYTE + cells * LOAD_BYTES_PER_CELL) *
+                load_rate + cells * RETAINED_BYTES_PER_CELL)
+
+    sampled_rate = min(SAMPLED_BYTES / max(size, 1), 1.0)
+    return {
+        IN_MEMORY_PATH: int(estimate(1.0)),
+        CHUNKED_PATH: int(estimate(chunk_rate)),
+        SAMPLED_PATH: int(FIXED_BYTES + (estimate(1.0) - FIXED_BYTES) *
+                          sampled_rate),
+    }
+
+
+def choose_execution_path(estimates: Dict[str, int], budget: int) -> str:
+    """推定使用量が budget に収まる、最もメモリを使う実行経路。収まらない場合は最も安い経路。"""
+    paths = [p for p in EXECUTION_PATHS if p in estimates]
+    for path in paths:
+        if estimates[path] <= budget:
+            return path
+    return paths[-1]
+
+
+def current_rss() -> int:
+    """このプロセスの常駐メモリのバイト数。/proc がない場合は最大常駐メモリで代用する。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+def release_memory():
+    """解放済みのメモリを回収し、可能であれば OS に返す (glibc の malloc_trim)。"""
+    global _LIBC
+    gc.collect()
+    if _LIBC is None:
+        try:
+            _LIBC = ctypes.CDLL("libc.so.6")
+            _LIBC.malloc_trim
+        except (OSError, AttributeError):
+            _LIBC = False
+    if _LIBC:
+        _LIBC.malloc_trim(0)
+
+
+class MemoryWatch(Deadline):
+    """制限時刻に加えて、lint 中のメモリ使用量を監視する Deadline。
+
+    Note:
+        使用量は開始時からの RSS の増分で、Deadline の check・tick を呼び出す時点で確認する。
+        pandas の読み込みなど、確認の間に確保されるメモリは確保した後に検出する。
+
+    Args:
+        limit: 使用してよいバイト数。超えた場合は MemoryBudgetExceededError を送出する
+    """
+    def __init__(self,
+                 limit: int,
+                 timeout: Optional[float] = None,
+                 baseline: Optional[int] = None):
+        super().__init__(timeout)
+        self.limit = limit
+        self.baseline = current_rss() if baseline is None else baseline
+        self.peak = 0
+        self.exceeded = False
+        self.__ticks = 0
+
+    def check(self):
+        super().check()
+        usage = current_rss() - self.baseline
+        self.peak = max(self.peak, usage)
+        if usage > self.limit:
+            self.exceeded = True
+            raise MemoryBudgetExceededError()
+
+    def tick(self):
+        self.__ticks += 1
+        if self.__ticks >= self.CHECK_INTERVAL:
+            self.__ticks = 0
+            self.check()
+
+
+class MemoryBudgetedLinter:
+    """推定したメモリ使用量が memory_budget に収まる実行経路で lint する。
+
+    Note:
+        CSV は表全体を一度に読み込む in_memory、行のチャンクごとに読み込む chunked、
+        行をサンプリングする sampled (SampledCSVLinter) の順に、推定使用量が予算に収まる経路を選ぶ。
+        実行中は MemoryWatch で使用量を監視し、予算を超えた場合は次の経路で実行し直す。
+        Excel はブック全体を読み込むため、予算に収まらない場合は読み込まずにエラーとする。
+        選んだ経路と推定・実測した使用量は plan に記録する。
+
+    Args:
+        memory_budget: lint が使用してよいメモリのバイト数。入力のバイト列は含めない
+        kwargs: CSVLinter・ExcelLinter に渡す引数 (engine, workers など)
+    """
+    def __getattr__(self, name):
+        return getattr(self.linter, name)
+
+    def __init__(self,
+                 data: bytes,
+                 filename: str,
+                 memory_budget: int,
+                 timeout: Optional[float] = None,
+                 **kwargs):
+        self.data = data
+        self.filename = filename
+        self.kwargs = kwargs
+        self.deadline = Deadline(timeout)
+        head = data if os.path.splitext(
+            filename)[1] in EXCEL_EXTENSIONS else data[:PEEK_SIZE]
+        estimates = estimate_footprint(head, len(data), filename)
+        self.cost = estimate_cost(head, len(data), filename)
+        self.plan = MemoryPlan(memory_budget, self.cost.kind, estimates,
+                               choose_execution_path(estimates, memory_budget))
+        self.__baseline = current_rss()
+        self.linter = None
+        if self.plan.kind == "excel" and estimates[
+                IN_MEMORY_PATH] > memory_budget:
+            self.plan.execution_path = None
+            self.linter = self.__create_error_linter()
+
+    def run(self, checks=None) -> Dict[str, LintResult]:
+        """予算に収まる実行経路でチェックを実行する。"""
+        if checks is None:
+            checks = CSVLinter.VALIDATION_ORDER
+        while self.plan.execution_path is not None:
+            path = self.plan.execution_path
+            watch = MemoryWatch(self.plan.budget, self.deadline.remaining(),
+                                self.__baseline)
+            try:
+                self.linter = self.__create_linter(path, watch)
+                results = self.__run(path, checks)
+                if not watch.exceeded:
+                    return results
+            except MemoryBudgetExceededError:
+                pass
+            finally:
+                self.plan.observed_peak = max(self.plan.observed_peak,
+                                              watch.peak)
+            self.linter = None
+            release_memory()
+            self.plan.fallbacks.append(path)
+            self.plan.execution_path = self.__next_path(path)
+
+        if self.linter is None:
+            self.linter = self.__create_error_linter()
+        return self.linter.run(checks)
+
+    def __next_path(self, path: str) -> Optional[str]:
+        paths = [p for p in EXECUTION_PATHS if p in self.plan.estimates]
+        k = paths.index(path) + 1
+        return paths[k] if k < len(paths) else None
+
+    def __create_linter(self, path: str, watch: MemoryWatch):
+        kwargs = dict(self.kwargs, timeout=watch.remaining())
+        if path == SAMPLED_PATH:
+            engine = kwargs.get("engine")
+            linter = SampledCSVLinter(io.BytesIO(self.data),
+                                      self.filename,
+                                      title_line_num=kwargs.get(
+                                          "title_line_num"),
+                                      header_line_num=kwargs.get(
+                                          "header_line_num"),
+                                      engine=engine)
+            linter.linter.deadline = watch
+            return linter
+        if self.plan.kind == "excel":
+            linter = ExcelLinter(self.data, self.filename, **kwargs)
+            linter.csv_linter.deadline = watch
+            return linter
+        if path == CHUNKED_PATH:
+            kwargs["chunk_rows"] = _chunk_rows(self.cost.column_count)
+        linter = CSVLinter(self.data, self.filename, **kwargs)
+        linter.deadline = watch
+        return linter
+
+    def __run(self, path: str, checks: List[str]) -> Dict[str, LintResult]:
+        if path == SAMPLED_PATH:
+            return {name: getattr(self.linter, name)() for name in checks}
+        return self.linter.run(checks)
+
+    def __create_error_linter(self) -> CSVLinter:
+        linter = CSVLinter(b"", self.filename)
+        linter.cache["1-1"] = LintResult.gen_simple_error_result(
+            "ファイルが大きすぎるため、チェックできませんでした。")
+        return linter
+
+
+def _chunk_rows(column_count: int) -> int:
+    return max(CHUNK_CELLS // max(column_count, 1), 1)
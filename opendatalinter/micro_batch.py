@@ -0,0 +1,76 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .arrow_engine import PANDAS_ENGINE, read_csv_batch
+from .column_classifier import classify_tables
+from .csv_linter import CSVLinter
+from .csv_structure_analyzer import CSVStructureAnalyzer
+from .vo import LintResult
+
+
+def lint_small_files(inputs: Iterable[Tuple[str, bytes]],
+                     checks: Optional[List[str]] = None,
+                     engine: str = PANDAS_ENGINE
+                     ) -> List[Dict[str, LintResult]]:
+    """多数の小さな CSV ファイルをまとめてチェックする。
+
+    Note:
+        文字コードの推定と構造の推定はファイルごとに行う。表の読み込みは列数が同じファイルの
+        ヘッダー・表本体をそれぞれつなげて Arrow で1度に行い、列の分類は全てのファイルの列を
+        classify_tables でまとめて行う。チェックはファイルごとに実行し、結果は個別に
+        CSVLinter でチェックした場合と同じになる。
+
+    Args:
+        inputs: (ファイル名, ファイルの内容) の組
+        checks: 実行するチェック項目名のリスト。None の場合は全てのチェックを実行する。
+        engine: まとめて読み込めなかった表の読み込みに用いるエンジン。
+            小さな表では起動コストの小さい pandas を既定とする。
+
+    Returns:
+        inputs と同じ順に並んだ、チェック項目名をキーとするチェック結果
+    """
+    linters = [
+        CSVLinter(data, filename, engine=engine, compact=False, workers=1)
+        for filename, data in inputs
+    ]
+    loaded = [linter for linter in linters if linter.prepare(["structure"])]
+
+    tables = _read_tables_in_batch(
+        [linter.csv_structure_analyzer for linter in loaded])
+    for linter, (header_df, df) in zip(loaded, tables):
+        linter.assign_artifacts(header_df=header_df, df=df)
+
+    loaded = [linter for linter in loaded if linter.prepare(["df"])]
+    for linter, column_types in zip(
+            loaded, classify_tables([linter.df for linter in loaded],
+                                    CSVLinter.CLASSIFY_RATE)):
+        linter.assign_artifacts(column_types=column_types)
+    return [linter.run(checks) for linter in linters]
+
+
+def _read_tables_in_batch(analyzers: List[CSVStructureAnalyzer]) -> List[Tuple]:
+    """ヘッダーと表本体を、列数が同じものどうしまとめて読み込む。
+
+    Returns:
+        analyzers と同じ順の (header_df, df)。まとめて読み込めなかったものは None。
+    """
+    tables = [[None, None] for _ in analyzers]
+    groups = defaultdict(list)
+    for i, analyzer in enumerate(analyzers):
+        record_counts = analyzer.get_record_counts()
+        # ヘッダーのない表は read_csv を用いないため、個別に生成する
+        if analyzer.header_line_num > 0:
+            groups[(0, analyzer.get_column_count())].append(
+                (i, analyzer.get_header_text(), record_counts[0]))
+        groups[(1, analyzer.get_column_count())].append(
+            (i, analyzer.get_content_text(), record_counts[1]))
+
+    for (k, column_count), members in groups.items():
+        # 空のテキストは read_csv でエラーとなるため、個別に読み込む
+        members = [member for member in members if member[2] > 0]
+        dfs = read_csv_batch([text for _, text, _ in members],
+                             [count for _, _, count in members],
+                             column_count)
+        for (i, _, _), df in zip(members, dfs or []):
+            tables[i][k] = df
+    return [tuple(t) for t in tables]
@@ -3,6 +3,8 @@ import os
 from .excel_linter import ExcelLinter
 from .csv_linter import CSVLinter
 
+EXCEL_EXTENSIONS = [".xls", ".xlsx", ".xlsm", ".xlsb", ".xlsxm"]
+
 
 class OpenDataLinter:
     def __getattr__(self, name):
@@ -12,10 +14,28 @@ class OpenDataLinter:
                  data: bytes,
                  filename: str,
                  title_line_num=None,
-                 header_line_num=None):
+                 header_line_num=None,
+                 engine=None,
+                 workers=None,
+                 schema_store=None,
+                 timeout=None):
 
         exp = os.path.splitext(filename)[1]
-        if exp in [".xls", ".xlsx", ".xlsm", ".xlsb", ".xlsxm"]:
-            self.linter = ExcelLinter(data, filename)
+        if exp in EXCEL_EXTENSIONS:
+            self.linter = ExcelLinter(data,
+                                      filename,
+                                      title_line_num=title_line_num,
+                                      header_line_num=header_line_num,
+                                      engine=engine,
+                                      workers=workers,
+                                      schema_store=schema_store,
+                                      timeout=timeout)
         else:
-            self.linter = CSVLinter(data, filename)
+            self.linter = CSVLinter(data,
+                                    filename,
+                                    title_line_num=title_line_num,
+                                    header_line_num=header_line_num,
+                                    engine=engine,
+                                    workers=workers,
+                                    schema_store=schema_store,
+                                    timeout=timeout)
@@ -0,0 +1,257 @@
+import glob
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .arrow_engine import has_pyarrow
+from .vo import LintResult
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+ARROW_FORMAT = "arrow"
+PARQUET_FORMAT = "parquet"
+BINARY_FORMAT = "binary"
+FORMAT_EXTENSIONS = {
+    ARROW_FORMAT: ".arrow",
+    PARQUET_FORMAT: ".parquet",
+    BINARY_FORMAT: ".npy",
+}
+
+# 組み込みの形式で、1バッチを構成する配列の名前 (書き出す順)
+_BINARY_ARRAYS = [
+    "include_cells", "file_offsets", "file_data", "check_offsets", "check_data",
+    "message_offsets", "message_data", "message_null", "is_valid",
+    "cell_count", "cell_offsets", "cell_rows", "cell_columns"
+]
+
+
+class ResultSink:
+    """lint 結果を (ファイル, チェック項目, メッセージ) ごとの1行として列指向のファイルに追記する。
+
+    Note:
+        行は batch_size 行ごとにまとめて書き出す。ファイルはプロセスごとに分け、
+        集計時に read_results でまとめて読み込む。ロックは用いない。
+        pyarrow がある場合は Arrow IPC (ストリーム形式) または Parquet、ない場合は
+        numpy の .npy を連結した組み込みの形式で書き出す。
+        違反のないチェックも、メッセージを null とした1行として記録する。
+
+    Args:
+        path: 出力先のファイル
+        format: "arrow"、"parquet" または "binary"。None の場合は pyarrow があれば "arrow"
+        include_cells: True の場合、違反したセルの行・列の配列も書き出す。
+            列全体・行全体の違反は、それぞれ行・列を -1 とする
+    """
+    DEFAULT_BATCH_SIZE = 10000
+
+    def __init__(self,
+                 path: str,
+                 format: Optional[str] = None,
+                 include_cells: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        if format is None:
+            format = ARROW_FORMAT if has_pyarrow() else BINARY_FORMAT
+        if format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"unknown format: {format}")
+        if format != BINARY_FORMAT and not has_pyarrow():
+            raise ImportError(f"pyarrow is required for the {format} format")
+
+        self.path = path
+        self.format = format
+        self.include_cells = include_cells
+        self.batch_size = batch_size
+        self.__rows: List[tuple] = []
+        self.__file = open(path, "wb")
+        self.__writer = None
+
+    @classmethod
+    def for_worker(cls, directory: str, worker_id: str, **kwargs):
+        """ワーカーごとのファイルに書き出す ResultSink を生成する。"""
+        sink_format = kwargs.pop("format", None)
+        if sink_format is None:
+            sink_format = ARROW_FORMAT if has_pyarrow() else BINARY_FORMAT
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory,
+                            worker_id + FORMAT_EXTENSIONS[sink_format])
+        return cls(path, format=sink_format, **kwargs)
+
+    def write(self, file: str, results: Dict[str, Union[LintResult, Dict]]):
+        """1ファイル分のチェック結果を追加する。結果は LintResult またはその to_dict()。"""
+        for check, result in results.items():
+            if isinstance(result, LintResult):
+                result = result.to_dict()
+            contents = result["invalid_contents"]
+            if not contents:
+                self.__rows.append((file, check, result["is_valid"], None, []))
+            for content in contents:
+                self.__rows.append((file, check, result["is_valid"],
+                                    content["error_message"],
+                                    content["invalid_cells"]))
+        if len(self.__rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.__rows:
+            return
+        rows, self.__rows = self.__rows, []
+        if self.format == BINARY_FORMAT:
+            self.__write_binary(rows)
+        else:
+            self.__write_arrow(rows)
+        self.__file.flush()
+
+    def close(self):
+        self.flush()
+        if self.__writer is not None:
+            self.__writer.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __write_arrow(self, rows: List[tuple]):
+        files, checks, is_valids, messages, cells = zip(*rows)
+        columns = {
+            "file": pa.array(files, pa.string()),
+            "check": pa.array(checks, pa.string()),
+            "is_valid": pa.array(is_valids, pa.bool_()),
+            "error_message": pa.array(messages, pa.string()),
+            "cell_count": pa.array([len(c) for c in cells], pa.int64()),
+        }
+        if self.include_cells:
+            columns["cell_rows"] = pa.array(
+                [[_to_index(i) for i, _ in c] for c in cells],
+                pa.list_(pa.int64()))
+            columns["cell_columns"] = pa.array(
+                [[_to_index(j) for _, j in c] for c in cells],
+                pa.list_(pa.int64()))
+        table = pa.table(columns)
+
+        if self.__writer is None:
+            if self.format == PARQUET_FORMAT:
+                self.__writer = pq.ParquetWriter(self.__file, table.schema)
+            else:
+                self.__writer = pa.ipc.new_stream(self.__file, table.schema)
+        self.__writer.write_table(table)
+
+    def __write_binary(self, rows: List[tuple]):
+        files, checks, is_valids, messages, cells = zip(*rows)
+        arrays = {}
+        for name, values in [("file", files), ("check", checks),
+                             ("message", messages)]:
+            arrays[f"{name}_offsets"], arrays[f"{name}_data"] = \
+                _encode_strings(values)
+        arrays["message_null"] = np.array([m is None for m in messages])
+        arrays["is_valid"] = np.array(
+            [-1 if v is None else int(v) for v in is_valids], dtype=np.int8)
+        arrays["cell_count"] = np.array([len(c) for c in cells],
+                                        dtype=np.int64)
+
+        cell_counts = arrays["cell_count"] if self.include_cells else np.zeros(
+            len(rows), dtype=np.int64)
+        arrays["include_cells"] = np.array(self.include_cells)
+        arrays["cell_offsets"] = np.concatenate([[0],
+                                                 np.cumsum(cell_counts)])
+        flat_cells = [cell for c in cells
+                      for cell in c] if self.include_cells else []
+        arrays["cell_rows"] = np.array([_to_index(i) for i, _ in flat_cells],
+                                       dtype=np.int64)
+        arrays["cell_columns"] = np.array(
+            [_to_index(j) for _, j in flat_cells], dtype=np.int64)
+
+        for name in _BINARY_ARRAYS:
+            np.save(self.__file, arrays[name], allow_pickle=False)
+
+
+def read_results(paths: Union[str, Iterable[str]]) -> pd.DataFrame:
+    """ResultSink で書き出したファイルを読み込み、1つの DataFrame にまとめる。
+
+    Args:
+        paths: ファイルのパスのリスト、またはディレクトリ。ディレクトリの場合は直下の全てのファイル。
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(os.path.join(paths, "*")))
+
+    frames = []
+    for path in paths:
+        if path.endswith(FORMAT_EXTENSIONS[PARQUET_FORMAT]):
+            frames.append(pq.read_table(path).to_pandas())
+        elif path.endswith(FORMAT_EXTENSIONS[ARROW_FORMAT]):
+            with pa.OSFile(path) as f:
+                frames.append(pa.ipc.open_stream(f).read_all().to_pandas())
+        else:
+            frames.append(_read_binary(path))
+    if not frames:
+        return pd.DataFrame(columns=[
+            "file", "check", "is_valid", "error_message", "cell_count"
+        ])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_binary(path: str) -> pd.DataFrame:
+    frames = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            arrays = {
+                name: np.load(f, allow_pickle=False)
+                for name in _BINARY_ARRAYS
+            }
+            messages = _decode_strings(arrays["message_offsets"],
+                                       arrays["message_data"])
+            is_valid = arrays["is_valid"].astype(object)
+            is_valid[arrays["is_valid"] == -1] = None
+            frame = pd.DataFrame({
+                "file":
+                _decode_strings(arrays["file_offsets"], arrays["file_data"]),
+                "check":
+                _decode_strings(arrays["check_offsets"],
+                                arrays["check_data"]),
+                "is_valid":
+                [None if v is None else bool(v) for v in is_valid],
+                "error_message": [
+                    None if is_null else m
+                    for m, is_null in zip(messages, arrays["message_null"])
+                ],
+                "cell_count":
+                arrays["cell_count"],
+            })
+            offsets = arrays["cell_offsets"]
+            if arrays["include_cells"]:
+                frame["cell_rows"] = [
+                    arrays["cell_rows"][s:e].tolist()
+                    for s, e in zip(offsets[:-1], offsets[1:])
+                ]
+                frame["cell_columns"] = [
+                    arrays["cell_columns"][s:e].tolist()
+                    for s, e in zip(offsets[:-1], offsets[1:])
+                ]
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _to_index(i) -> int:
+    return -1 if i is None else int(i)
+
+
+def _encode_strings(values) -> tuple:
+    encoded = [b"" if v is None else v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.array([len(b) for b in encoded], dtype=np.int64),
+              out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _decode_strings(offsets: np.ndarray, data: np.ndarray) -> List[str]:
+    buf = data.tobytes()
+    return [
+        buf[s:e].decode("utf-8") for s, e in zip(offsets[:-1], offsets[1:])
+    ]
@@ -0,0 +1,116 @@
+import csv
+from io import StringIO
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+_QUOTE, _DELIMITER, _LF, _CR = b'"', b",", b"\n", b"\r"
+
+
+class RowIndex:
+    """CSV テキストのレコードごとのフィールド数と、UTF-8 のバイト列上の位置。
+
+    Note:
+        レコード・フィールドの区切りは numpy でバイト列を走査して求め、セルごとの
+        Python のオブジェクトは生成しない。レコードの値が必要な場合は、その範囲のテキストのみを
+        csv.reader でパースする。フィールド数・レコードの区切りは、テキスト全体を
+        csv.reader でパースした場合と一致する。
+
+    Attributes:
+        field_counts: レコードごとのフィールド数。空行は 0
+        starts: レコードの先頭のバイト位置
+        ends: レコードの終端 (改行を除く) のバイト位置
+    """
+    def __init__(self, buf: bytes, field_counts: np.ndarray,
+                 starts: np.ndarray, ends: np.ndarray):
+        self.buf = buf
+        self.field_counts = field_counts
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def from_text(cls, text: str) -> Optional["RowIndex"]:
+        """text の区切りを求める。
+
+        Returns:
+            csv.reader と同じ区切りを求められない場合は None。
+            フィールドの途中のクォート、閉じていないクォート、クォートの外の単独の CR、
+            csv.field_size_limit を超える可能性のあるフィールドを含む場合が該当する。
+        """
+        buf = text.encode("utf-8", "surrogatepass")
+        b = np.frombuffer(buf, dtype=np.uint8)
+        n = len(b)
+
+        is_quote = b == ord(_QUOTE)
+        quotes = np.flatnonzero(is_quote)
+        if len(quotes) % 2 == 1:
+            return None
+        if len(quotes):
+            opens, closes = quotes[0::2], quotes[1::2]
+            # 開くクォートはフィールドの先頭か、エスケープ ("") の2文字目
+            prev = b[np.maximum(opens - 1, 0)]
+            after_close = np.zeros(len(opens), dtype=bool)
+            after_close[1:] = opens[1:] - 1 == closes[:-1]
+            if not np.all((opens == 0) | _is_separator(prev) | after_close):
+                return None
+            # 閉じるクォートの直後はフィールドの終わりか、エスケープ ("") の1文字目
+            following = b[np.minimum(closes + 1, n - 1)]
+            before_open = np.zeros(len(closes), dtype=bool)
+            before_open[:-1] = closes[:-1] + 1 == opens[1:]
+            if not np.all((closes == n - 1) | _is_separator(following)
+                          | before_open):
+                return None
+            outside = np.bitwise_xor.accumulate(is_quote.view(np.uint8)) == 0
+        else:
+            outside = np.ones(n, dtype=bool)
+
+        lfs = np.flatnonzero((b == ord(_LF)) & outside)
+        crs = np.flatnonzero((b == ord(_CR)) & outside)
+        # クォートの外の CR は CRLF か、テキストの末尾のみ許す
+        is_crlf = np.isin(crs + 1, lfs)
+        if not np.all(is_crlf | (crs == n - 1)):
+            return None
+        terminators = lfs
+        if len(crs) and not is_crlf[-1]:
+            terminators = np.append(terminators, crs[-1])
+
+        starts = np.concatenate([[0], terminators + 1])
+        ends = np.append(terminators, n)
+        if starts[-1] == n:
+            # 改行で終わる場合、最後の空のレコードは数えない
+            starts, ends = starts[:-1], ends[:-1]
+        ends = ends - np.isin(ends - 1, crs[is_crlf])
+
+        delimiters = np.flatnonzero((b == ord(_DELIMITER)) & outside)
+        field_counts = np.searchsorted(delimiters, ends) - np.searchsorted(
+            delimiters, starts) + 1
+        field_counts[starts == ends] = 0
+
+        separators = np.concatenate([[-1], delimiters, terminators, [n]])
+        separators.sort()
+        if len(separators) > 1 and np.max(
+                np.diff(separators)) > csv.field_size_limit():
+            return None
+        return cls(buf, field_counts, starts, ends)
+
+    def __len__(self) -> int:
+        return len(self.field_counts)
+
+    def get_text(self, start: int, stop: int) -> str:
+        """レコード [start, stop) のテキスト。各レコードの改行を含む。"""
+        if start >= stop:
+            return ""
+        end = self.starts[stop] if stop < len(self) else len(self.buf)
+        return self.buf[self.starts[start]:end].decode("utf-8",
+                                                       "surrogatepass")
+
+    def iter_rows(self, start: int, stop: int) -> Iterator[List[str]]:
+        """レコード [start, stop) を1行ずつパースする。"""
+        return csv.reader(StringIO(self.get_text(start, stop)))
+
+    def get_rows(self, start: int, stop: int) -> List[List[str]]:
+        return list(self.iter_rows(start, stop))
+
+
+def _is_separator(b: np.ndarray) -> np.ndarray:
+    return (b == ord(_DELIMITER)) | (b == ord(_LF)) | (b == ord(_CR))
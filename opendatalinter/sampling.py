@@ -0,0 +1,172 @@
+import csv
+from collections import Counter
+from io import StringIO
+from typing import BinaryIO, List, Optional
+
+import chardet
+
+from .csv_linter import CSVLinter
+from .csv_structure_analyzer import CSVStructureAnalyzer
+from .errors import HeaderEstimateError
+from .vo import LintResult, SampledLintResult
+
+
+class SampledCSVLinter:
+    """巨大な CSV ファイルから行をサンプリングし、概算のチェック結果を高速に返す。
+
+    Note:
+        先頭の head_size バイトからタイトル・ヘッダーを推定し、その行のみを残す。
+        ヘッダーより後はバイト位置で sample_size 個の区間に分け、各区間の先頭以降にある
+        最初の行を読む。先頭の表本体の行も他の区間と同じ密度でしか読まないため、
+        sample_size と violation_rate は層別に抽出した行のみから求まる。
+        列数が表と一致しない行 (複数行にまたがるセルの途中など) は捨てる。
+        ファイル全体が head_size に収まる場合はサンプリングしない。
+        各チェックの結果は SampledLintResult として返す。
+    """
+    DEFAULT_SAMPLE_SIZE = 1000
+    DEFAULT_HEAD_SIZE = 64 * 1024
+
+    def __getattr__(self, name):
+        attr = getattr(self.linter, name)
+        if name.startswith("check_") and name != "check_1_1":
+            return lambda *args, **kwargs: self.__to_sampled_result(
+                attr(*args, **kwargs))
+        return attr
+
+    def __init__(self,
+                 f: BinaryIO,
+                 filename: str,
+                 sample_size: int = DEFAULT_SAMPLE_SIZE,
+                 head_size: int = DEFAULT_HEAD_SIZE,
+                 title_line_num=None,
+                 header_line_num=None,
+                 engine=None):
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(0)
+        head = f.read(head_size)
+        if len(head) < file_size:
+            if b"\n" in head:
+                head = head[:head.rfind(b"\n") + 1]
+            else:
+                head += f.readline()  # 1行目を最後まで読む
+
+        encoding = chardet.detect(head)['encoding']
+        encoding = 'utf-8' if encoding is None else encoding
+
+        self.sampled_line_offsets: List[int] = []
+        data = head
+        if len(head) < file_size:
+            preamble, column_count, title_line_num, header_line_num = \
+                self.__split_preamble(head, encoding, title_line_num,
+                                      header_line_num)
+            lines = self.__read_sampled_lines(f, len(preamble), file_size,
+                                              sample_size)
+            data = preamble + b"".join(
+                self.__filter_lines(lines, encoding, column_count))
+        self.linter = CSVLinter(data,
+                                filename,
+                                title_line_num=title_line_num,
+                                header_line_num=header_line_num,
+                                encoding=encoding,
+                                engine=engine)
+
+    def __split_preamble(self, head: bytes, encoding: str, title_line_num,
+                         header_line_num):
+        """head をタイトル・ヘッダーの行とそれ以降に分ける。
+
+        Returns:
+            タイトル・ヘッダーの行のバイト列、表の列数、タイトルの行数、ヘッダーの行数。
+            推定できない場合は head 全体と None (列数はサンプリングした行から決める)、
+            与えられた行数を返す。
+        """
+        text = head.decode(encoding, "replace")
+        try:
+            analyzer = CSVStructureAnalyzer(text,
+                                            title_line_num=title_line_num,
+                                            header_line_num=header_line_num)
+        except (HeaderEstimateError, ValueError):
+            return head, None, title_line_num, header_line_num
+
+        reader = csv.reader(StringIO(text))
+        for _ in range(analyzer.title_line_num + analyzer.header_line_num):
+            next(reader, None)
+        # line_num は読んだ物理行数。\n はマルチバイト文字の一部にならない
+        end = 0
+        for _ in range(reader.line_num):
+            end = head.index(b"\n", end) + 1
+        return head[:end], analyzer.get_column_count(
+        ), analyzer.title_line_num, analyzer.header_line_num
+
+    def __read_sampled_lines(self, f: BinaryIO, start: int, end: int,
+                             sample_size: int) -> List[bytes]:
+        lines = []
+        if start >= end:
+            return lines
+
+        position = start
+        for k in range(sample_size):
+            offset = start + (end - start) * k // sample_size
+            if offset < position:
+                continue
+            f.seek(offset)
+            if offset > start:
+                f.readline()  # 区間の先頭が行の途中である可能性があるため読み捨てる
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+            self.sampled_line_offsets.append(position)
+            position = f.tell()
+        return lines
+
+    def __filter_lines(self, lines: List[bytes], encoding: str,
+                       column_count: Optional[int]) -> List[bytes]:
+        records = []
+        for line, offset in zip(lines, self.sampled_line_offsets):
+            try:
+                rows = list(csv.reader(StringIO(line.decode(encoding))))
+            except (UnicodeDecodeError, csv.Error):
+                continue
+            if len(rows) == 1:
+                records.append((line, offset, len(rows[0])))
+        if column_count is None and records:
+            column_count = Counter(r[2] for r in records).most_common(1)[0][0]
+
+        filtered_lines = []
+        filtered_offsets = []
+        for line, offset, count in records:
+            if count == column_count:
+                filtered_lines.append(line if line.endswith(b"\n") else line +
+                                      b"\n")
+                filtered_offsets.append(offset)
+        self.sampled_line_offsets = filtered_offsets
+        return filtered_lines
+
+    def __to_sampled_result(self, result: LintResult) -> SampledLintResult:
+        if not self.linter.check_1_1().is_valid:
+            return SampledLintResult(result.is_valid, result.invalid_contents)
+
+        row_count = len(self.linter.df)
+        cell_count = row_count * len(self.linter.df.columns)
+        content_start = self.linter.title_line_num + self.linter.header_line_num
+
+        invalid_cells = set()
+        invalid_columns = set()
+        for content in result.invalid_contents:
+            for i, j in content.invalid_cells:
+                if i is None:
+                    invalid_columns.add(j)
+                elif i >= content_start:
+                    invalid_cells.add((i, j))
+        invalid_cell_count = len(
+            [c for c in invalid_cells if c[1] not in invalid_columns
+             ]) + len(invalid_columns) * row_count
+
+        return SampledLintResult(
+            result.is_valid,
+            result.invalid_contents,
+            sample_size=row_count,
+            violation_rate=min(invalid_cell_count / cell_count, 1.0)
+            if cell_count else 0.0)
@@ -0,0 +1,264 @@
+import io
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from .open_data_linter import EXCEL_EXTENSIONS, OpenDataLinter
+
+SHORT_LANE = "short"
+LONG_LANE = "long"
+LANES = [SHORT_LANE, LONG_LANE]
+
+# 構造の推定に読む先頭のバイト数
+PEEK_SIZE = 64 * 1024
+# 長いレーンに入れるコスト (CSV のセル数に換算) の下限。1セルあたり数十マイクロ秒かかる
+LONG_JOB_MIN_COST = 100000
+# ブックの XML のうち、CSV の1セル分の処理時間で読み込めるバイト数
+EXCEL_XML_BYTES_PER_CELL = 30
+
+_DIMENSION_REGEX = re.compile(rb'<dimension ref="[A-Z]+\d+:([A-Z]+)(\d+)"')
+
+
+@dataclass
+class JobCost:
+    """lint の推定コスト。cost は CSV のセル数に換算した値。"""
+    size: int
+    kind: str
+    row_count: int
+    column_count: int
+    cost: float
+
+    @property
+    def lane(self) -> str:
+        return LONG_LANE if self.cost >= LONG_JOB_MIN_COST else SHORT_LANE
+
+
+def estimate_cost(head: bytes, size: int, filename: str) -> JobCost:
+    """ファイルの先頭 head と大きさ size から lint のコストを推定する。
+
+    Note:
+        CSV は先頭の行の平均の長さから行数を、区切り文字の数から列数を推定する。
+        クォートの中の改行・区切り文字は考慮しない。
+        Excel はブック全体を読み込むため、ZIP の中央ディレクトリから XML の展開後の大きさを求め、
+        最初のシートの dimension (ない場合は 0) からセル数を求める。
+        この場合 head はファイル全体である必要がある。
+        CSV・Excel 以外のファイルは読み込まずにエラーとなるため、コストを 0 とする。
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext in EXCEL_EXTENSIONS:
+        return _estimate_excel_cost(head, size)
+    if ext not in [".csv", ".CSV"]:
+        return JobCost(size, "other", 0, 0, 0)
+
+    head = head[:PEEK_SIZE]
+    if len(head) < size:
+        # 途中で切れた最後の行は数えない
+        head = head[:head.rfind(b"\n") + 1] or head
+    lines = head.splitlines()
+    if not lines:
+        return JobCost(size, "csv", 0, 0, 0)
+    column_count = max(line.count(b",") for line in lines[:100]) + 1
+    row_count = round(len(lines) * size / len(head))
+    return JobCost(size, "csv", row_count, column_count,
+                   row_count * column_count)
+
+
+def estimate_file_cost(path: str) -> JobCost:
+    """ファイルの先頭のみを読み、lint のコストを推定する。Excel は中央ディレクトリのみを読む。"""
+    size = os.path.getsize(path)
+    if os.path.splitext(path)[1] in EXCEL_EXTENSIONS:
+        try:
+            with zipfile.ZipFile(path) as z:
+                return _estimate_book_cost(z, size)
+        except (zipfile.BadZipFile, KeyError, OSError):
+            return JobCost(size, "excel", 0, 0, size)
+    with open(path, "rb") as f:
+        head = f.read(PEEK_SIZE)
+    return estimate_cost(head, size, path)
+
+
+def _estimate_excel_cost(data: bytes, size: int) -> JobCost:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            return _estimate_book_cost(z, size)
+    except (zipfile.BadZipFile, KeyError):
+        # 壊れたブックは読み込みに失敗するまでの時間のみかかるが、大きさに比例するとみなす
+        return JobCost(size, "excel", 0, 0, size / EXCEL_XML_BYTES_PER_CELL)
+
+
+def _estimate_book_cost(z: zipfile.ZipFile, size: int) -> JobCost:
+    xml_size = sum(info.file_size for info in z.infolist()
+                   if info.filename.endswith(".xml"))
+    row_count = column_count = 0
+    sheets = sorted(name for name in z.namelist()
+                    if name.startswith("xl/worksheets/sheet"))
+    if sheets:
+        with z.open(sheets[0]) as f:
+            result = _DIMENSION_REGEX.search(f.read(4096))
+        if result is not None:
+            column_count = _to_column_number(result.group(1).decode())
+            row_count = int(result.group(2))
+    return JobCost(size, "excel", row_count, column_count,
+                   xml_size / EXCEL_XML_BYTES_PER_CELL +
+                   row_count * column_count)
+
+
+def _to_column_number(letters: str) -> int:
+    n = 0
+    for c in letters:
+        n = n * 26 + ord(c) - ord("A") + 1
+    return n
+
+
+@dataclass
+class JobResult:
+    filename: str
+    lane: str
+    cost: float
+    # 投入からワーカーで実行を始めるまでの時間と、実行時間 (秒)
+    queue_wait: float
+    run_time: float
+    results: Optional[Dict] = None
+    error: Optional[str] = None
+
+
+def _lint_job(data: bytes, filename: str, workers: int, kwargs: Dict):
+    started_at = time.time()
+    try:
+        linter = OpenDataLinter(data, filename, workers=workers, **kwargs)
+        try:
+            results = {
+                name: result.to_dict()
+                for name, result in linter.run().items()
+            }
+        finally:
+            linter.close()
+        return started_at, results, None
+    except Exception as e:
+        return started_at, None, repr(e)
+
+
+@dataclass
+class _Job:
+    data: bytes
+    filename: str
+    cost: JobCost
+    submitted_at: float
+    future: Future
+
+
+class LaneScheduler:
+    """lint のジョブを推定コストで短いレーンと長いレーンに分け、プロセスプールで実行する。
+
+    Note:
+        短いレーンには short_workers 個、長いレーンには long_workers 個の実行枠を割り当てる。
+        短いジョブは専用の枠で実行するため、長いジョブの後ろで待ち続けることはない。
+        長いレーンの枠は、長いジョブが待っていない間だけ短いジョブも実行する。
+        レーン内は投入順に実行する。
+        split_workers が2以上の場合、長いジョブは split_workers 個のプロセスでセルごとのチェックを
+        タイルに分割して実行する (表のセル数が CSVLinter.PARALLEL_MIN_CELLS 以上の場合)。
+        短いジョブは分割しない。
+
+    Args:
+        kwargs: OpenDataLinter に渡す引数 (engine, timeout など)
+    """
+    def __init__(self,
+                 short_workers: int = 1,
+                 long_workers: int = 1,
+                 split_workers: Optional[int] = None,
+                 **kwargs):
+        if short_workers < 1 or long_workers < 1:
+            raise ValueError("each lane requires at least one worker")
+        self.short_workers = short_workers
+        self.long_workers = long_workers
+        self.split_workers = 1 if split_workers is None else split_workers
+        self.kwargs = kwargs
+        self.__executor = ProcessPoolExecutor(short_workers + long_workers)
+        self.__lock = threading.Condition()
+        self.__running = 0
+        self.__queues: Dict[str, Deque[_Job]] = {
+            lane: deque()
+            for lane in LANES
+        }
+        self.__free = {SHORT_LANE: short_workers, LONG_LANE: long_workers}
+        self.__waits: Dict[str, List[float]] = {lane: [] for lane in LANES}
+
+    def submit(self, data: bytes, filename: str) -> "Future[JobResult]":
+        cost = estimate_cost(data, len(data), filename)
+        job = _Job(data, filename, cost, time.time(), Future())
+        with self.__lock:
+            self.__queues[cost.lane].append(job)
+            self.__dispatch()
+        return job.future
+
+    def queue_wait_stats(self) -> Dict[str, Dict[str, float]]:
+        """レーンごとの待ち時間 (秒) の件数・平均・p95・最大"""
+        with self.__lock:
+            waits = {lane: list(w) for lane, w in self.__waits.items()}
+        return {
+            lane: {
+                "count": len(w),
+                "mean": float(np.mean(w)) if w else 0.0,
+                "p95": float(np.percentile(w, 95)) if w else 0.0,
+                "max": max(w, default=0.0),
+            }
+            for lane, w in waits.items()
+        }
+
+    def shutdown(self):
+        """レーンで待っているジョブを含め、全てのジョブが終わるのを待ってから終了する。"""
+        with self.__lock:
+            self.__lock.wait_for(lambda: self.__running == 0 and not any(
+                self.__queues.values()))
+        self.__executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def __dispatch(self):
+        # 呼び出し元で self.__lock を取得していること
+        while self.__free[SHORT_LANE] > 0 and self.__queues[SHORT_LANE]:
+            self.__start(self.__queues[SHORT_LANE].popleft(), SHORT_LANE)
+        while self.__free[LONG_LANE] > 0:
+            if self.__queues[LONG_LANE]:
+                self.__start(self.__queues[LONG_LANE].popleft(), LONG_LANE)
+            elif self.__queues[SHORT_LANE]:
+                self.__start(self.__queues[SHORT_LANE].popleft(), LONG_LANE)
+            else:
+                break
+
+    def __start(self, job: _Job, slot: str):
+        self.__free[slot] -= 1
+        self.__running += 1
+        workers = self.split_workers if job.cost.lane == LONG_LANE else 1
+        future = self.__executor.submit(_lint_job, job.data, job.filename,
+                                        workers, self.kwargs)
+        future.add_done_callback(lambda f: self.__finish(job, slot, f))
+
+    def __finish(self, job: _Job, slot: str, future: Future):
+        finished_at = time.time()
+        try:
+            started_at, results, error = future.result()
+        except Exception as e:
+            started_at, results, error = finished_at, None, repr(e)
+        queue_wait = max(started_at - job.submitted_at, 0.0)
+        with self.__lock:
+            self.__free[slot] += 1
+            self.__running -= 1
+            self.__waits[job.cost.lane].append(queue_wait)
+            self.__dispatch()
+            self.__lock.notify_all()
+        job.future.set_result(
+            JobResult(job.filename, job.cost.lane, job.cost.cost, queue_wait,
+                      finished_at - started_at, results, error))
@@ -0,0 +1,62 @@
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .vo import TableSchema
+
+
+class SchemaStore:
+    """ヘッダーのハッシュごとに、表の構造と列の分類を記録する。
+
+    Note:
+        path を指定した場合は JSON ファイルに保存し、次回以降の実行でも用いる。
+        複数のプロセスから保存する場合は、ロックファイル (path + ".lock") を排他ロックした上で
+        ファイルを読み直して記録をまとめ、書き込む。fcntl を使えない環境ではロックしない。
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.__schemas: Dict[str, TableSchema] = self.__load()
+
+    def get(self, fingerprint: str) -> Optional[TableSchema]:
+        return self.__schemas.get(fingerprint)
+
+    def put(self, fingerprint: str, schema: TableSchema):
+        if self.path is None:
+            self.__schemas[fingerprint] = schema
+            return
+
+        with self.__lock():
+            self.__schemas = dict(self.__schemas, **self.__load())
+            self.__schemas[fingerprint] = schema
+            tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({k: v.to_dict()
+                           for k, v in self.__schemas.items()},
+                          f,
+                          ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def __lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __load(self) -> Dict[str, TableSchema]:
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return {k: TableSchema(**v) for k, v in json.load(f).items()}
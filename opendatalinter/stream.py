@@ -0,0 +1,230 @@
+import asyncio
+import codecs
+import csv
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, List, Optional, Tuple, Union
+
+import chardet
+from chardet.universaldetector import UniversalDetector
+
+from .csv_linter import CSVLinter
+from .excel_linter import ExcelLinter
+from .funcs import is_number
+from .open_data_linter import EXCEL_EXTENSIONS
+
+
+class _NeedMoreData(Exception):
+    pass
+
+
+class _LineFeeder:
+    """``csv.reader`` に行を渡すイテレータ。行が足りない場合は読み込み途中の行を保持して中断する。"""
+    def __init__(self):
+        self.lines = deque()
+        self.record_lines = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise _NeedMoreData()
+        line = self.lines.popleft()
+        self.record_lines.append(line)
+        return line
+
+
+class StreamingCSVReader:
+    """チャンク単位で受け取ったバイト列から、文字コードの推定と行のパースを逐次行う。
+
+    Note:
+        文字コードが確定するまではチャンクを保持し、確定後は届いた順にデコードしてパースする。
+        最後まで確定しなかった場合は、全体を受け取った時点で推定結果を用いる。
+        確定した文字コードで途中からデコードできなくなった場合は、全体を受け取った時点で
+        全体から推定し直してパースし直す。
+        表の範囲 (要素数が同じ行の最も長い連続) とヘッダーの行数は、行をパースするたびに
+        更新し、CSVStructureAnalyzer と同じ推定結果を全体を受け取った時点で返す。
+    """
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.encoding: Optional[str] = None
+        self.__detector = UniversalDetector()
+        self.__reset()
+
+    def feed(self, chunk: bytes):
+        self.chunks.append(chunk)
+        if self.encoding is None:
+            self.__detector.feed(chunk)
+            if not self.__detector.done:
+                return
+            self.__detector.close()
+            self.__start_decoding(self.__detector.result['encoding'])
+            for c in self.chunks:
+                self.__decode(c)
+        else:
+            self.__decode(chunk)
+
+    def close(self) -> Optional[List[List[str]]]:
+        """入力の終わりを通知する。
+
+        Returns:
+            パース済みの行。デコードに失敗した場合は None。
+        """
+        if self.encoding is None:
+            self.__detector.close()
+            self.__start_decoding(self.__detector.result['encoding'])
+            for c in self.chunks:
+                self.__decode(c)
+        self.__decode(b"", final=True)
+        if self.__decode_failed:
+            # 先頭から推定した文字コードが誤っていた場合は、全体から推定し直す
+            encoding = chardet.detect(self.data)['encoding']
+            if encoding is None or encoding == self.encoding:
+                return None
+            self.__reset()
+            self.__start_decoding(encoding)
+            self.__decode(self.data, final=True)
+            if self.__decode_failed:
+                return None
+
+        if self.__pending_line:
+            self.__feeder.lines.append(self.__pending_line)
+            self.__pending_line = ""
+        for row in csv.reader(self.__feeder.lines):
+            self.__append_row(row)
+        self.__feeder.lines.clear()
+        self.__end_run()
+        return self.rows
+
+    @property
+    def data(self) -> bytes:
+        return b"".join(self.chunks)
+
+    def get_structure(self) -> Tuple[Optional[int], Optional[int]]:
+        """close した後に、推定したタイトルの行数とヘッダーの行数を返す。
+
+        Returns:
+            推定できない場合は (None, None)。
+        """
+        start, _, header_line_num = self.__best_run
+        if header_line_num is None:
+            return None, None
+        return start, header_line_num
+
+    def __reset(self):
+        self.rows: List[List[str]] = []
+        self.__decoder = None
+        self.__decode_failed = False
+        self.__pending_line = ""
+        self.__feeder = _LineFeeder()
+        self.__reader = csv.reader(self.__feeder)
+        # (先頭の行, 行数, 先頭から数値を含む最初の行までの行数)
+        self.__best_run = (0, 0, None)
+        self.__run_start = 0
+        self.__run_element_count = None
+        self.__run_header_line_num = None
+
+    def __start_decoding(self, encoding: Optional[str]):
+        self.encoding = 'utf-8' if encoding is None else encoding
+        try:
+            self.__decoder = codecs.getincrementaldecoder(self.encoding)()
+        except LookupError:
+            self.__decode_failed = True
+
+    def __decode(self, chunk: bytes, final=False):
+        if self.__decode_failed:
+            return
+        try:
+            text = self.__decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            self.__decode_failed = True
+            return
+
+        text = self.__pending_line + text
+        last_line_end = text.rfind("\n") + 1
+        self.__pending_line = text[last_line_end:]
+        # StringIO と同様に "\n" のみで行を区切る
+        self.__feeder.lines.extend(
+            line + "\n" for line in text[:last_line_end].split("\n")[:-1])
+        self.__parse_complete_records()
+
+    def __parse_complete_records(self):
+        while self.__feeder.lines:
+            self.__feeder.record_lines = []
+            try:
+                row = next(self.__reader)
+            except _NeedMoreData:
+                # 複数行にまたがるセルの途中のため、続きが届くまで待つ
+                self.__feeder.lines.extendleft(
+                    reversed(self.__feeder.record_lines))
+                break
+            self.__append_row(row)
+
+    def __append_row(self, row: List[str]):
+        if len(row) != self.__run_element_count:
+            self.__end_run()
+            self.__run_start = len(self.rows)
+            self.__run_element_count = len(row)
+            self.__run_header_line_num = None
+        if self.__run_header_line_num is None and any(
+                is_number(element) for element in row):
+            self.__run_header_line_num = len(self.rows) - self.__run_start
+        self.rows.append(row)
+
+    def __end_run(self):
+        # 最も長い連続のうち、最初のものを表とする
+        length = len(self.rows) - self.__run_start
+        if length > self.__best_run[1]:
+            self.__best_run = (self.__run_start, length,
+                               self.__run_header_line_num)
+
+
+async def lint_stream(stream: AsyncIterable[bytes],
+                      filename: str,
+                      title_line_num=None,
+                      header_line_num=None) -> Union[CSVLinter, ExcelLinter]:
+    """非同期に届くバイト列を受け取りながら、CSV の文字コード推定とパースを進める。
+
+    Note:
+        Excel ファイルは全体を受け取ってから読み込む。
+        CSV のパース・表の範囲の推定と列の分類などの重い処理はスレッドで実行し、
+        イベントループを塞がない。
+
+    Returns:
+        各チェックを実行できる状態の linter。
+    """
+    exp = os.path.splitext(filename)[1]
+    loop = asyncio.get_running_loop()
+
+    if exp in EXCEL_EXTENSIONS:
+        chunks = [chunk async for chunk in stream]
+        return await loop.run_in_executor(
+            None, lambda: ExcelLinter(b"".join(chunks),
+                                      filename,
+                                      title_line_num=title_line_num,
+                                      header_line_num=header_line_num))
+
+    reader = StreamingCSVReader()
+    # 届いた順にパースするため1スレッドで実行し、次のチャンクの受信と並行させる
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        feeding = []
+        async for chunk in stream:
+            feeding.append(loop.run_in_executor(executor, reader.feed, chunk))
+        await asyncio.gather(*feeding)
+        rows = await loop.run_in_executor(executor, reader.close)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if rows is not None and title_line_num is None and header_line_num is None:
+        title_line_num, header_line_num = reader.get_structure()
+
+    return await loop.run_in_executor(
+        None, lambda: CSVLinter(reader.data,
+                                filename,
+                                title_line_num=title_line_num,
+                                header_line_num=header_line_num,
+                                encoding=reader.encoding,
+                                rows=rows))
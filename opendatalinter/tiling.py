@@ -0,0 +1,267 @@
+import inspect
+import math
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from .deadline import Deadline
+from .errors import DeadlineExceededError
+
+# 1ワーカーあたりのタイル数。タイルごとの処理時間のばらつきを均す
+TILES_PER_WORKER = 4
+# Python 3.13 以降は、共有メモリを resource_tracker に登録せずに開ける
+_CAN_DISABLE_TRACKING = "track" in inspect.signature(
+    shared_memory.SharedMemory.__init__).parameters
+
+_NULL, _STRING, _INTEGER, _FLOAT, _BOOL = range(5)
+_INT64_MIN, _INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+
+class UnsupportedValueError(Exception):
+    """共有メモリに置けない値が表に含まれる"""
+    pass
+
+
+class SharedTable:
+    """DataFrame の列を、型タグ・数値・UTF-8 のバイト列に分けて共有メモリに置く。
+
+    Note:
+        ワーカーには共有メモリの名前のみを渡し、セルの値は pickle しない。
+        ワーカーで復元した値は、元の列を走査した場合と同じ型 (str, int, float, bool, nan) になる。
+    """
+    def __init__(self, df: DataFrame, columns: Sequence[int]):
+        self.row_count = len(df)
+        self.columns = list(columns)
+        size = self.row_count * len(self.columns)
+        tags = np.full(size, _NULL, dtype=np.uint8)
+        integers = np.zeros(size, dtype=np.int64)
+        floats = np.zeros(size, dtype=np.float64)
+        lengths = np.zeros(size, dtype=np.int64)
+        strings = []
+
+        for k, j in enumerate(self.columns):
+            column = df.iloc[:, j]
+            start = k * self.row_count
+            window = slice(start, start + self.row_count)
+            kind = column.dtype.kind
+            if kind == "b":
+                tags[window] = _BOOL
+                integers[window] = column.values
+            elif kind in "iu" and (kind == "i" or column.max() <= _INT64_MAX):
+                tags[window] = _INTEGER
+                integers[window] = column.values
+            elif kind == "f":
+                tags[window] = _FLOAT
+                floats[window] = column.values
+            else:
+                for i, v in enumerate(np.asarray(column, dtype=object)):
+                    p = start + i
+                    if isinstance(v, str):
+                        b = v.encode("utf-8", "surrogatepass")
+                        tags[p] = _STRING
+                        lengths[p] = len(b)
+                        strings.append(b)
+                    elif isinstance(v, (bool, np.bool_)):
+                        tags[p] = _BOOL
+                        integers[p] = v
+                    elif isinstance(v, (int, np.integer)):
+                        if not _INT64_MIN <= v <= _INT64_MAX:
+                            raise UnsupportedValueError(v)
+                        tags[p] = _INTEGER
+                        integers[p] = v
+                    elif isinstance(v, (float, np.floating)) and not np.isnan(v):
+                        tags[p] = _FLOAT
+                        floats[p] = v
+                    elif not (isinstance(v, float) and np.isnan(v)):
+                        raise UnsupportedValueError(v)
+
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = np.frombuffer(b"".join(strings) or b"\0", dtype=np.uint8)
+
+        self.__blocks = []
+        self.descriptor = {
+            "row_count": self.row_count,
+            "column_count": len(self.columns),
+        }
+        for name, array in [("tags", tags), ("integers", integers),
+                            ("floats", floats), ("offsets", offsets),
+                            ("data", data)]:
+            block = shared_memory.SharedMemory(create=True,
+                                               size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype,
+                       buffer=block.buf)[:] = array
+            self.__blocks.append(block)
+            self.descriptor[name] = (block.name, array.dtype.str, array.shape)
+
+    def close(self):
+        for block in self.__blocks:
+            block.close()
+            block.unlink()
+        self.__blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def plan_tiles(row_count: int, column_count: int,
+               workers: int) -> List[Tuple[int, int, int, int]]:
+    """表を (列の開始, 列の終了, 行の開始, 行の終了) のタイルに分割する。
+
+    Note:
+        列数が多い場合は列のブロックのみ、行数が多い場合は行のチャンクにも分割する。
+    """
+    target = max(workers * TILES_PER_WORKER, 1)
+    column_blocks = max(min(column_count, target), 1)
+    row_chunks = max(min(row_count, math.ceil(target / column_blocks)), 1)
+    column_size = math.ceil(column_count / column_blocks)
+    row_size = math.ceil(row_count / row_chunks)
+    return [(c, min(c + column_size, column_count), r,
+             min(r + row_size, row_count))
+            for c in range(0, column_count, column_size)
+            for r in range(0, row_count, row_size)]
+
+
+def map_tiles(df: DataFrame,
+              kernel: Callable[[List[Any], int], Any],
+              columns: Sequence[int],
+              workers: int,
+              args: Tuple = (),
+              deadline: Optional[Deadline] = None,
+              executor: Optional[ProcessPoolExecutor] = None,
+              table: Optional[SharedTable] = None
+              ) -> List[Tuple[int, int, Any]]:
+    """列 columns をタイルに分割し、プロセスプールで kernel を実行する。
+
+    Args:
+        kernel: ``kernel(values, row_start, *args)``。values はタイル内の1列分のセルの値、
+            row_start はタイルの先頭行の DataFrame 上の位置。モジュールの関数である必要がある。
+        executor: 実行に用いるプロセスプール。未指定の場合は workers 個のプロセスで作り、
+            終了時に破棄する。
+        table: df の列 columns を含む共有メモリの表。指定された場合は表を作り直さず、
+            終了時にも破棄しない。未指定の場合は列 columns のみで作り、終了時に破棄する。
+
+    Returns:
+        (列, タイルの先頭行, kernel の戻り値) のリスト。列、行の順に並ぶ。
+
+    Raises:
+        UnsupportedValueError: 共有メモリに置けない値が含まれる場合。
+        DeadlineExceededError: 制限時刻までに全てのタイルが終わらなかった場合。
+            未着手のタイルは取り消し、実行中のタイルの結果は待たない。
+    """
+    deadline = Deadline() if deadline is None else deadline
+    columns = list(columns)
+    if not columns or len(df) == 0:
+        return []
+
+    own_table = table is None
+    if own_table:
+        table = SharedTable(df, columns)
+    try:
+        index = {j: k for k, j in enumerate(table.columns)}
+        positions = [index[j] for j in columns]
+        tiles = plan_tiles(len(df), len(columns), workers)
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        futures = []
+        try:
+            futures = [
+                executor.submit(_run_tile, table.descriptor, kernel,
+                                positions[tile[0]:tile[1]], tile, args)
+                for tile in tiles
+            ]
+            results = []
+            for f in futures:
+                results.extend(f.result(timeout=deadline.remaining()))
+        except TimeoutError:
+            raise DeadlineExceededError()
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                for f in futures:
+                    f.cancel()
+    finally:
+        if own_table:
+            table.close()
+
+    results = [(columns[k], row_start, r) for k, row_start, r in results]
+    return sorted(results, key=lambda t: (t[0], t[1]))
+
+
+_attached_blocks: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(descriptor: Dict) -> Dict[str, np.ndarray]:
+    names = ["tags", "integers", "floats", "offsets", "data"]
+    # 別の表のタスクが届いた場合は、以前の表はもう使われないため閉じる
+    current = {descriptor[name][0] for name in names}
+    for block_name in list(_attached_blocks):
+        if block_name not in current:
+            try:
+                _attached_blocks[block_name].close()
+            except BufferError:
+                continue  # 値を参照中の配列が残っている場合は次の機会に閉じる
+            del _attached_blocks[block_name]
+
+    arrays = {}
+    for name in names:
+        block_name, dtype, shape = descriptor[name]
+        if block_name not in _attached_blocks:
+            # 共有メモリの破棄は生成したプロセスが行う。プロセスプールのワーカーは
+            # 開始方法によらず親プロセスの resource_tracker を共有するため、
+            # ワーカーで登録を解除すると親の登録が消える。解除はせず、可能であれば登録しない
+            if _CAN_DISABLE_TRACKING:
+                block = shared_memory.SharedMemory(name=block_name,
+                                                   track=False)
+            else:
+                block = shared_memory.SharedMemory(name=block_name)
+            _attached_blocks[block_name] = block
+        arrays[name] = np.ndarray(shape,
+                                  dtype=dtype,
+                                  buffer=_attached_blocks[block_name].buf)
+    return arrays
+
+
+def _decode(arrays: Dict[str, np.ndarray], start: int, stop: int) -> List:
+    tags = arrays["tags"][start:stop].tolist()
+    integers = arrays["integers"][start:stop].tolist()
+    floats = arrays["floats"][start:stop].tolist()
+    offsets = arrays["offsets"][start:stop + 1].tolist()
+    data = arrays["data"]
+
+    values = []
+    for p, tag in enumerate(tags):
+        if tag == _STRING:
+            values.append(data[offsets[p]:offsets[p + 1]].tobytes().decode(
+                "utf-8", "surrogatepass"))
+        elif tag == _INTEGER:
+            values.append(integers[p])
+        elif tag == _FLOAT:
+            values.append(floats[p])
+        elif tag == _BOOL:
+            values.append(bool(integers[p]))
+        else:
+            values.append(np.nan)
+    return values
+
+
+def _run_tile(descriptor: Dict, kernel: Callable, positions: List[int],
+              tile: Tuple[int, int, int, int], args: Tuple) -> List:
+    """positions は tile の各列の、共有メモリの表における位置。"""
+    arrays = _attach(descriptor)
+    row_count = descriptor["row_count"]
+    column_start, _, row_start, row_stop = tile
+    results = []
+    for k, position in enumerate(positions, column_start):
+        values = _decode(arrays, position * row_count + row_start,
+                         position * row_count + row_stop)
+        results.append((k, row_start, kernel(values, row_start, *args)))
+    return results
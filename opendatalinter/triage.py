@@ -0,0 +1,317 @@
+import csv
+import io
+import os
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from xml.etree import ElementTree
+
+import chardet
+
+from .csv_structure_analyzer import CSVStructureAnalyzer
+from .errors import HeaderEstimateError
+from .open_data_linter import EXCEL_EXTENSIONS
+from .scheduler import _to_column_number
+
+HIGH_CONFIDENCE = "high"
+MEDIUM_CONFIDENCE = "medium"
+LOW_CONFIDENCE = "low"
+
+# 構造の推定に読む先頭のバイト数。Excel は最初のシートの XML (展開後) のバイト数
+TRIAGE_PREFIX_SIZE = 64 * 1024
+# 文字コードの推定に用いる先頭のバイト数。chardet は Shift_JIS の 8 KiB に数十ミリ秒かかる
+ENCODING_PREFIX_SIZE = 8 * 1024
+# ファイルの一部のみを読んだ場合に、推定を確からしいとみなす表本体の行数の下限
+CONFIDENT_CONTENT_ROWS = 100
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_DOC_REL_NS = \
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_CELL_REF_REGEX = re.compile(r"([A-Z]+)(\d+)")
+_DIMENSION_REGEX = re.compile(r"[A-Z]+\d+:([A-Z]+)\d+|([A-Z]+)\d+")
+
+
+@dataclass
+class TriageResult:
+    """ファイルの先頭のみから推定した、文字コードと表の構造。
+
+    Attributes:
+        kind: "csv"・"excel"・"other"
+        encoding: 推定した文字コード。Excel・推定できない場合は None
+        title_line_num: タイトルの行数。推定できない場合は None
+        header_line_num: ヘッダーの行数。推定できない場合は None
+        column_count: 列数。推定できない場合は None
+        confidence: 推定の確からしさ ("high"・"medium"・"low")
+        scanned_bytes: 推定に読んだバイト数。Excel はシートの XML (展開後) のバイト数
+        truncated: ファイル (シート) の一部のみを読んだか
+    """
+    kind: str
+    encoding: Optional[str] = None
+    title_line_num: Optional[int] = None
+    header_line_num: Optional[int] = None
+    column_count: Optional[int] = None
+    confidence: str = LOW_CONFIDENCE
+    scanned_bytes: int = 0
+    truncated: bool = False
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "encoding": self.encoding,
+            "title_line_num": self.title_line_num,
+            "header_line_num": self.header_line_num,
+            "column_count": self.column_count,
+            "confidence": self.confidence,
+            "scanned_bytes": self.scanned_bytes,
+            "truncated": self.truncated,
+        }
+
+
+def triage(data: bytes,
+           filename: str,
+           prefix_size: int = TRIAGE_PREFIX_SIZE) -> TriageResult:
+    """lint の前に、先頭の prefix_size バイトのみから文字コードと表の構造を推定する。
+
+    Note:
+        CSV は先頭の ENCODING_PREFIX_SIZE バイトで文字コードを推定し、
+        prefix_size バイトを CSVStructureAnalyzer で解析する。
+        Excel は ZIP の中央ディレクトリと、最初のシートの XML の先頭 prefix_size バイト
+        (共有文字列も同じ大きさまで) のみを展開し、ws2csv と同じ表として解析する。
+        いずれもファイルの大きさによらず、読み込む量は prefix_size で抑えられる。
+
+        confidence は次のとおり。
+        high: ファイル全体を読んだ場合か、表本体が読んだ範囲の末尾まで
+            CONFIDENT_CONTENT_ROWS 行以上続いている場合
+        medium: 構造は推定できたが、ファイルの残りで推定が変わりうる場合
+        low: 文字コード・ヘッダーを推定できない場合
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext in EXCEL_EXTENSIONS:
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as z:
+                return _triage_book(z, prefix_size)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+            return TriageResult("excel")
+    if ext not in [".csv", ".CSV"]:
+        return TriageResult("other")
+    return _triage_csv(data[:prefix_size], len(data) > prefix_size)
+
+
+def triage_file(path: str,
+                prefix_size: int = TRIAGE_PREFIX_SIZE) -> TriageResult:
+    """ファイルの先頭 (Excel は中央ディレクトリと最初のシートの先頭) のみを読み、triage する。"""
+    if os.path.splitext(path)[1] in EXCEL_EXTENSIONS:
+        try:
+            with zipfile.ZipFile(path) as z:
+                return _triage_book(z, prefix_size)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError,
+                OSError):
+            return TriageResult("excel")
+    with open(path, "rb") as f:
+        head = f.read(prefix_size + 1)
+    return triage(head, path, prefix_size)
+
+
+def _triage_csv(head: bytes, truncated: bool) -> TriageResult:
+    if truncated:
+        # 途中で切れた最後の行は読まない
+        head = head[:head.rfind(b"\n") + 1] or head
+    encoding = _detect_encoding(head)
+    if encoding is None:
+        return TriageResult("csv", scanned_bytes=len(head), truncated=truncated)
+
+    confidence = HIGH_CONFIDENCE
+    if truncated and encoding == "ascii":
+        # 残りの部分に ASCII 以外の文字が含まれる可能性がある
+        confidence = MEDIUM_CONFIDENCE
+    result = _analyze("csv", head.decode(encoding), truncated, confidence)
+    result.encoding = encoding
+    result.scanned_bytes = len(head)
+    return result
+
+
+def _detect_encoding(head: bytes) -> Optional[str]:
+    """head の先頭で文字コードを推定し、head 全体をデコードできることを確かめる。"""
+    candidate = head[:ENCODING_PREFIX_SIZE]
+    if len(candidate) < len(head):
+        candidate = candidate[:candidate.rfind(b"\n") + 1] or candidate
+    encoding = chardet.detect(candidate)["encoding"] or "utf-8"
+    try:
+        head.decode(encoding)
+        return encoding
+    except (UnicodeDecodeError, LookupError):
+        pass
+    # 先頭以降に推定と異なる文字が含まれる場合は、読んだ範囲全体で推定し直す
+    encoding = chardet.detect(head)["encoding"] or "utf-8"
+    try:
+        head.decode(encoding)
+        return encoding
+    except (UnicodeDecodeError, LookupError):
+        return None
+
+
+def _analyze(kind: str, text: str, truncated: bool,
+             confidence: str) -> TriageResult:
+    try:
+        analyzer = CSVStructureAnalyzer(text)
+    except HeaderEstimateError:
+        return TriageResult(kind, truncated=truncated)
+
+    if truncated:
+        _, content_end = analyzer.get_content_range()
+        content_rows = content_end - analyzer.title_line_num - \
+            analyzer.header_line_num
+        # 最後の行は複数行にまたがるセルの途中で切れている可能性がある
+        if content_end < analyzer.get_row_count() - 1 or \
+                content_rows < CONFIDENT_CONTENT_ROWS:
+            confidence = MEDIUM_CONFIDENCE
+    return TriageResult(kind,
+                        title_line_num=analyzer.title_line_num,
+                        header_line_num=analyzer.header_line_num,
+                        column_count=analyzer.get_column_count(),
+                        confidence=confidence,
+                        truncated=truncated)
+
+
+def _triage_book(z: zipfile.ZipFile, prefix_size: int) -> TriageResult:
+    sheet = _find_first_sheet(z)
+    with z.open(sheet) as f:
+        xml = f.read(prefix_size)
+        truncated = bool(f.read(1))
+    shared_strings, strings_truncated = _read_shared_strings(z, prefix_size)
+    rows, dimension_width, unresolved = _parse_sheet_rows(
+        xml, shared_strings)
+
+    # ws2csv と同様に、値のある範囲の幅に全ての行をそろえる
+    width = max(map(len, rows), default=0)
+    with io.StringIO() as s:
+        writer = csv.writer(s)
+        for row in rows:
+            writer.writerow(row + [None] * (width - len(row)))
+        text = s.getvalue()
+
+    confidence = HIGH_CONFIDENCE
+    if (strings_truncated and unresolved) or (truncated and (
+            dimension_width is None or dimension_width > width)):
+        # 値の分からないセルや、読んでいない行に値のある列がありうる
+        confidence = MEDIUM_CONFIDENCE
+    result = _analyze("excel", text, truncated, confidence)
+    result.scanned_bytes = len(xml)
+    return result
+
+
+def _find_first_sheet(z: zipfile.ZipFile) -> str:
+    """workbook.xml で最初に定義されたシートの XML のパス。"""
+    names = z.namelist()
+    try:
+        workbook = ElementTree.fromstring(z.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+        sheet = workbook.find(f"{_MAIN_NS}sheets/{_MAIN_NS}sheet")
+        rel_id = sheet.get(f"{_DOC_REL_NS}id")
+        for rel in rels.iter(f"{_REL_NS}Relationship"):
+            if rel.get("Id") == rel_id:
+                target = rel.get("Target")
+                path = target.lstrip("/") if target.startswith(
+                    "/") else posixpath.normpath(posixpath.join("xl", target))
+                if path in names:
+                    return path
+    except (KeyError, AttributeError, ElementTree.ParseError):
+        pass
+    return sorted(name for name in names
+                  if name.startswith("xl/worksheets/sheet"))[0]
+
+
+def _read_shared_strings(z: zipfile.ZipFile,
+                         prefix_size: int) -> Tuple[List[str], bool]:
+    """共有文字列のうち、先頭 prefix_size バイトに含まれるものと、途中で切れたか。"""
+    try:
+        f = z.open("xl/sharedStrings.xml")
+    except KeyError:
+        return [], False
+    with f:
+        xml = f.read(prefix_size)
+        truncated = bool(f.read(1))
+    strings = []
+    for element in _iter_complete_elements(xml, f"{_MAIN_NS}si"):
+        strings.append("".join(t.text or ""
+                               for t in element.iter(f"{_MAIN_NS}t")))
+    return strings, truncated
+
+
+def _parse_sheet_rows(
+        xml: bytes, shared_strings: List[str]
+) -> Tuple[List[List[Optional[str]]], Optional[int], bool]:
+    """シートの XML の先頭から、読み終えた行の値を ws2csv と同じ文字列として求める。
+
+    Note:
+        ws2csv と同様に、書式のみが設定された値のないセルと、末尾の空の行は含めない。
+
+    Returns:
+        1 行目からの行の値、dimension の列数 (ない場合は None)、
+        読んでいない共有文字列を参照したか
+    """
+    rows: List[List[Optional[str]]] = []
+    dimension_width = None
+    unresolved = False
+    for element in _iter_complete_elements(
+            xml, f"{_MAIN_NS}row", f"{_MAIN_NS}dimension"):
+        if element.tag == f"{_MAIN_NS}dimension":
+            result = _DIMENSION_REGEX.fullmatch(element.get("ref", ""))
+            if result is not None:
+                dimension_width = _to_column_number(result.group(1)
+                                                    or result.group(2))
+            continue
+
+        row_number = int(element.get("r", len(rows) + 1))
+        rows.extend([] for _ in range(row_number - len(rows)))
+        row = rows[row_number - 1]
+        column_number = 0
+        for cell in element.iter(f"{_MAIN_NS}c"):
+            result = _CELL_REF_REGEX.fullmatch(cell.get("r", ""))
+            column_number = _to_column_number(
+                result.group(1)) if result else column_number + 1
+            value, is_resolved = _to_value(cell, shared_strings)
+            unresolved = unresolved or not is_resolved
+            if value is None:
+                continue
+            row.extend([None] * (column_number - len(row)))
+            row[column_number - 1] = value
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows, dimension_width, unresolved
+
+
+def _to_value(cell: ElementTree.Element,
+              shared_strings: List[str]) -> Tuple[Optional[str], bool]:
+    """セルの値と、値が分かったか。数式は openpyxl と同様に '=' から始まる文字列とする。"""
+    formula = cell.find(f"{_MAIN_NS}f")
+    if formula is not None:
+        return "=" + (formula.text or ""), True
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        return "".join(t.text or ""
+                       for t in cell.iter(f"{_MAIN_NS}t")), True
+    v = cell.find(f"{_MAIN_NS}v")
+    if v is None or v.text is None:
+        return None, True
+    if cell_type == "s":
+        k = int(v.text)
+        if k < len(shared_strings):
+            return shared_strings[k], True
+        return "", False
+    if cell_type == "b":
+        return str(v.text == "1"), True
+    return v.text, True
+
+
+def _iter_complete_elements(xml: bytes, *tags: str):
+    """途中で切れた XML から、閉じた tags の要素を順に返す。"""
+    parser = ElementTree.XMLPullParser(["end"])
+    parser.feed(xml)
+    for _, element in parser.read_events():
+        if element.tag in tags:
+            yield element
+            element.clear()
@@ -49,3 +49,96 @@ class InvalidCellFactory:
         if i is not None:
             i += self.row_offset
         return i, j
+
+
+@dataclass
+class TableRegion:
+    """シート上の表の領域。行・列ともに (inclusive, exclusive) の範囲で表す。"""
+    top: int
+    left: int
+    bottom: int
+    right: int
+
+    @property
+    def height(self):
+        return self.bottom - self.top
+
+    @property
+    def width(self):
+        return self.right - self.left
+
+    def to_dict(self):
+        return {
+            "top": self.top,
+            "left": self.left,
+            "bottom": self.bottom,
+            "right": self.right
+        }
+
+
+@dataclass
+class SampledLintResult(LintResult):
+    """サンプリングした行に対するチェック結果。
+
+    invalid_cells の行番号はサンプルした表における位置を表す。
+    """
+    sample_size: int = 0
+    violation_rate: float = 0.0
+    is_sampled: bool = True
+
+    def to_dict(self):
+        d = super().to_dict()
+        d.update({
+            "is_sampled": self.is_sampled,
+            "sample_size": self.sample_size,
+            "violation_rate": self.violation_rate
+        })
+        return d
+
+
+@dataclass
+class TimedOutLintResult(LintResult):
+    """制限時間内に終わらなかったチェックの結果。"""
+    is_timed_out: bool = True
+
+    @classmethod
+    def gen_result(cls):
+        return cls(None,
+                   [InvalidContent("制限時間内にチェックが終わりませんでした。", [])])
+
+    def to_dict(self):
+        d = super().to_dict()
+        d["is_timed_out"] = self.is_timed_out
+        return d
+
+
+@dataclass
+class ValidationResult:
+    """合否のみを判定した結果。invalid の場合は最初に見つかった違反を保持する。"""
+    is_valid: Optional[bool]
+    check_name: Optional[str] = None
+    error_message: Optional[str] = None
+    invalid_cell: Optional[Tuple[Optional[int], Optional[int]]] = None
+
+    def to_dict(self):
+        return {
+            "is_valid": self.is_valid,
+            "check_name": self.check_name,
+            "error_message": self.error_message,
+            "invalid_cell": self.invalid_cell
+        }
+
+
+@dataclass
+class TableSchema:
+    """過去に lint した表の構造と列の分類。列の分類は ColumnType の値で表す。"""
+    title_line_num: int
+    header_line_num: int
+    column_types: List[str]
+
+    def to_dict(self):
+        return {
+            "title_line_num": self.title_line_num,
+            "header_line_num": self.header_line_num,
+            "column_types": self.column_types
+        }
@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import socket
+import sys
+import time
+from typing import Callable, Dict, List, Optional, TextIO
+
+from .batch import lint_file
+from .open_data_linter import EXCEL_EXTENSIONS
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover
+    Observer = None
+
+# CSVLinter と同様に、大文字の拡張子の CSV も対象とする
+TARGET_EXTENSIONS = [".csv", ".CSV"] + EXCEL_EXTENSIONS
+
+
+class DirectoryWatcher:
+    """ディレクトリ以下の CSV/Excel ファイルを監視し、内容が変わったファイルだけを lint する。
+
+    Note:
+        watchdog がインストールされていれば OS のファイル変更通知 (inotify など) を用い、
+        なければ更新時刻とサイズのポーリングで変更を検出する。
+        保存が続く間は debounce 秒待ってから lint し、内容のハッシュが前回と同じ場合は lint しない。
+        同じプロセスで lint し続けるため、pandas などの読み込みは最初の1回だけで済む。
+
+    Args:
+        root: 監視するディレクトリ
+        on_result: lint 結果 (ファイルごとの dict) を受け取る関数
+        debounce: 最後の変更からこの秒数だけ変更がなければ lint する
+        poll_interval: ポーリングの間隔 (秒)
+        use_watchdog: None の場合、watchdog があれば用いる
+    """
+    def __init__(self,
+                 root: str,
+                 on_result: Callable[[Dict], None],
+                 debounce: float = 0.2,
+                 poll_interval: float = 0.5,
+                 use_watchdog: Optional[bool] = None):
+        if use_watchdog is None:
+            use_watchdog = Observer is not None
+        if use_watchdog and Observer is None:
+            raise ImportError("watchdog is required to use file system events")
+
+        self.root = root
+        self.on_result = on_result
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog
+        self.__stats: Dict[str, tuple] = {}
+        self.__hashes: Dict[str, str] = {}
+        self.__pending: Dict[str, float] = {}
+        self.__events: "queue.Queue[str]" = queue.Queue()
+        self.__observer = None
+
+    def start(self):
+        # 監視開始時点のファイルも lint する
+        for path in self.__scan():
+            self.__pending[path] = 0
+
+        if self.use_watchdog:
+            self.__observer = Observer()
+            self.__observer.schedule(_EventHandler(self.__events),
+                                     self.root,
+                                     recursive=True)
+            self.__observer.start()
+
+    def stop(self):
+        if self.__observer is not None:
+            self.__observer.stop()
+            self.__observer.join()
+            self.__observer = None
+
+    def run(self):
+        self.start()
+        try:
+            while True:
+                self.step()
+        finally:
+            self.stop()
+
+    def step(self) -> List[Dict]:
+        """変更を1回分待って取り込み、debounce が過ぎたファイルを lint する。
+
+        Returns:
+            今回 lint したファイルの結果
+        """
+        if self.use_watchdog:
+            changed_paths = self.__wait_events()
+        else:
+            time.sleep(self.poll_interval if not self.__pending else min(
+                self.poll_interval, self.debounce))
+            changed_paths = self.__scan()
+
+        now = time.monotonic()
+        for path in changed_paths:
+            self.__pending[path] = now
+
+        results = []
+        for path, changed_at in list(self.__pending.items()):
+            if now - changed_at < self.debounce:
+                continue
+            del self.__pending[path]
+            result = self.__lint(path)
+            if result is not None:
+                self.on_result(result)
+                results.append(result)
+        return results
+
+    def __wait_events(self) -> List[str]:
+        timeout = self.debounce if self.__pending else self.poll_interval
+        paths = []
+        try:
+            paths.append(self.__events.get(timeout=timeout))
+            while True:
+                paths.append(self.__events.get_nowait())
+        except queue.Empty:
+            pass
+        return [path for path in paths if _is_target(path)]
+
+    def __scan(self) -> List[str]:
+        stats = {}
+        for dir_path, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dir_path, filename)
+                if not _is_target(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                stats[path] = (stat.st_mtime_ns, stat.st_size)
+
+        changed_paths = [
+            path for path in stats.keys() | self.__stats.keys()
+            if stats.get(path) != self.__stats.get(path)
+        ]
+        self.__stats = stats
+        return changed_paths
+
+    def __lint(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            if self.__hashes.pop(path, None) is None:
+                return None
+            return {"path": path, "deleted": True}
+
+        if self.__hashes.get(path) == digest:
+            return None
+        self.__hashes[path] = digest
+        try:
+            result = lint_file(path)
+        except Exception as e:
+            result = {"error": repr(e)}
+        return dict(path=path, sha256=digest, **result)
+
+
+if Observer is not None:
+
+    class _EventHandler(FileSystemEventHandler):
+        def __init__(self, events: queue.Queue):
+            self.events = events
+
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            self.events.put(event.src_path)
+            if getattr(event, "dest_path", None):
+                self.events.put(event.dest_path)
+
+
+def _is_target(path: str) -> bool:
+    return os.path.splitext(path)[1] in TARGET_EXTENSIONS
+
+
+def json_lines_writer(stream: TextIO) -> Callable[[Dict], None]:
+    """lint 結果を JSON Lines として stream に書き出す関数を返す。"""
+    def write(result: Dict):
+        stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        stream.flush()
+
+    return write
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m opendatalinter.watch",
+        description="ディレクトリを監視し、変更されたファイルを lint する。")
+    parser.add_argument("root")
+    parser.add_argument("--socket",
+                        help="結果を書き出す UNIX ドメインソケットのパス (省略時は標準出力)")
+    parser.add_argument("--debounce", type=float, default=0.2)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--polling",
+                        action="store_true",
+                        help="ファイル変更通知を使わずにポーリングする")
+    args = parser.parse_args(args)
+
+    if args.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(args.socket)
+        stream = sock.makefile("w", encoding="utf-8")
+    else:
+        stream = sys.stdout
+
+    watcher = DirectoryWatcher(args.root,
+                               json_lines_writer(stream),
+                               debounce=args.debounce,
+                               poll_interval=args.poll_interval,
+                               use_watchdog=False if args.polling else None)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from opendatalinter.archive import is_archive, iter_members, lint_archive
+from tests.util import gen_csv_linter, gen_excel_linter
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+MEMBERS = {
+    "data/nb01h0013.csv": "nb01h0013.csv",
+    "data/check_1_5.csv": "check_1_5.csv",
+    "excel/date.xlsx": "date.xlsx",
+}
+
+
+def read_sample(name: str) -> bytes:
+    with open(os.path.join(SAMPLES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def gen_zip() -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for path, name in MEMBERS.items():
+            z.writestr(path, read_sample(name))
+    return buf.getvalue()
+
+
+def gen_tar_gz() -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for path, name in MEMBERS.items():
+            data = read_sample(name)
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def expected_results(name: str):
+    if name.endswith(".xlsx"):
+        return gen_excel_linter(f"./samples/{name}").run()
+    return gen_csv_linter(f"./samples/{name}").run()
+
+
+def test_is_archive():
+    assert is_archive("a.zip")
+    assert is_archive("a.csv.gz")
+    assert is_archive("a.TAR.GZ")
+    assert not is_archive("a.csv")
+
+
+@pytest.mark.parametrize("filename,gen", [("data.zip", gen_zip),
+                                          ("data.tar.gz", gen_tar_gz)])
+def test_lint_archive(filename, gen):
+    results = lint_archive(io.BytesIO(gen()), filename, max_workers=2)
+    assert sorted(results) == sorted(MEMBERS)
+    for path, name in MEMBERS.items():
+        assert results[path] == expected_results(name)
+
+
+def test_lint_gzip():
+    data = gzip.compress(read_sample("check_1_5.csv"))
+    assert [p for p, _ in iter_members(io.BytesIO(data), "dir/a.csv.gz")
+            ] == ["a.csv"]
+    results = lint_archive(io.BytesIO(data), "dir/a.csv.gz")
+    assert results == {"a.csv": expected_results("check_1_5.csv")}
+
+
+def test_lint_archive_with_broken_member():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("a.csv", read_sample("check_1_5.csv"))
+        z.writestr("broken.xlsx", b"not a workbook")
+    results = lint_archive(io.BytesIO(buf.getvalue()), "data.zip")
+
+    # 壊れたメンバーがあっても、他のメンバーの結果は返す
+    assert results["a.csv"] == expected_results("check_1_5.csv")
+    broken = results["broken.xlsx"]
+    assert not broken["check_1_1"].is_valid
+    assert all(r.is_valid is None for name, r in broken.items()
+               if name != "check_1_1")
@@ -0,0 +1,107 @@
+import csv
+import glob
+import os
+import random
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+from opendatalinter.arrow_engine import read_csv, read_csv_batch, ARROW_ENGINE, PANDAS_ENGINE
+from tests.util import gen_csv_linter
+
+pytest.importorskip("pyarrow")
+
+TOKENS = [
+    "", "1", "-2", " +3 ", "\t4", "007", "1.5", ".5", "5.", "-.5", "1e5",
+    "1E-3", "1e", "inf", "-Infinity", "NA", "nan", "NULL", "<NA>", "None",
+    "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "N/A", "NaN", "n/a", "null",
+    "True", "false", "TRUE ", "tRUE", "FaLsE", "abc", "東京都", "１２", "1,000", "+", "-",
+    "***", "X", "平成30年", "a\nb", '"q"', "9223372036854775807",
+    "99999999999999999999", "0x10", "1_000"
+]
+
+
+def to_text(rows):
+    output = StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+
+def assert_same_as_pandas(text, column_count):
+    expected = pd.read_csv(StringIO(text), header=None)
+    actual = read_csv(text, column_count, ARROW_ENGINE)
+    pd.testing.assert_frame_equal(actual, expected)
+    for j in range(column_count):
+        assert list(map(type, actual[j])) == list(map(type, expected[j]))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_tokens(seed):
+    rnd = random.Random(seed)
+    pool = rnd.sample(TOKENS, rnd.randint(1, 4))
+    column_count = rnd.randint(1, 5)
+    rows = [[rnd.choice(pool) for _ in range(column_count)]
+            for _ in range(rnd.randint(1, 30))]
+    assert_same_as_pandas(to_text(rows), column_count)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_read_csv_batch(seed):
+    rnd = random.Random(seed)
+    column_count = rnd.randint(1, 4)
+    tables = []
+    for _ in range(rnd.randint(1, 5)):
+        pool = rnd.sample(TOKENS, rnd.randint(1, 3))
+        tables.append([[rnd.choice(pool) for _ in range(column_count)]
+                       for _ in range(rnd.randint(1, 10))])
+    texts = [to_text(rows) for rows in tables]
+
+    actual = read_csv_batch(texts, [len(rows) for rows in tables],
+                            column_count)
+    if actual is None:
+        return  # 丸めが pandas と異なる可能性のある数値を含む
+    for text, df in zip(texts, actual):
+        expected = pd.read_csv(StringIO(text), header=None)
+        pd.testing.assert_frame_equal(df, expected)
+        for j in range(column_count):
+            assert list(map(type, df[j])) == list(map(type, expected[j]))
+
+
+@pytest.mark.parametrize("text", [
+    "tRUE,1\nfalse,2\n", "TrUe\nFALSE\n", "tRUE\nNA\n", "fALSE\nabc\n",
+    " true\nfalse\n"
+])
+def test_mixed_case_booleans(text):
+    # pandas は大文字・小文字を区別せずに真偽値とみなす
+    assert_same_as_pandas(text, text.split("\n")[0].count(",") + 1)
+
+
+def test_mixed_types_across_pandas_chunks():
+    # 列数 2**12 では pandas は 128 行ずつ読み込む
+    column_count = 2**12
+    rows = [["1"] * column_count for _ in range(130)]
+    rows[129][0] = "abc"
+    rows[3][1] = "1.5"
+    rows[128][2] = "True"
+    assert_same_as_pandas(to_text(rows), column_count)
+
+
+@pytest.mark.parametrize(
+    "file_path",
+    glob.glob(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples",
+                     "*.csv")))
+def test_same_results_as_pandas_engine(file_path):
+    expected = gen_csv_linter(file_path)
+    with open(file_path, "rb") as f:
+        from opendatalinter import CSVLinter
+        linter = CSVLinter(f.read(), file_path, engine=ARROW_ENGINE)
+    assert expected.engine == ARROW_ENGINE
+    expected = CSVLinter(expected.data, file_path, engine=PANDAS_ENGINE)
+    for check in [
+            "check_1_2", "check_1_3", "check_1_5", "check_1_6", "check_1_10",
+            "check_1_11", "check_1_12", "check_1_13", "check_2_x"
+    ]:
+        assert getattr(linter, check)() == getattr(expected, check)()
@@ -0,0 +1,180 @@
+import json
+import multiprocessing
+import os
+import shutil
+
+from benchmarks.memory_benchmark import gen_csv
+from opendatalinter import batch
+from opendatalinter.batch import DirectoryWorkQueue, lint_file, run_worker
+from opendatalinter.result_sink import ResultSink, read_results
+from opendatalinter.scheduler import LONG_LANE, SHORT_LANE
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+
+
+def start_worker(queue_dir: str, worker_id: str):
+    with ResultSink.for_worker(os.path.join(queue_dir, "columnar"),
+                               worker_id) as sink:
+        run_worker(DirectoryWorkQueue(queue_dir),
+                   worker_id,
+                   poll_interval=0.1,
+                   sink=sink)
+
+
+def test_batch_with_multiple_workers(tmp_path):
+    paths = []
+    for name in ["nb01h0013.csv", "check_1_5.csv", "check_1_12.csv"]:
+        paths.append(os.path.join(SAMPLES_DIR, name))
+    # 同じ内容のファイルは1度だけ lint する
+    duplicated_path = str(tmp_path / "copy.csv")
+    shutil.copy(paths[0], duplicated_path)
+    paths.append(duplicated_path)
+
+    queue_dir = str(tmp_path / "queue")
+    tasks = DirectoryWorkQueue(queue_dir).enqueue(paths)
+    assert len(tasks) == 3
+
+    workers = [
+        multiprocessing.Process(target=start_worker,
+                                args=(queue_dir, f"worker-{i}"))
+        for i in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    output_path = str(tmp_path / "report.jsonl")
+    assert DirectoryWorkQueue(queue_dir).merge_results(output_path) == 4
+    with open(output_path, encoding="utf-8") as f:
+        report = {r["path"]: r for r in map(json.loads, f)}
+    assert sorted(report) == sorted(paths)
+    assert report[duplicated_path]["results"] == report[paths[0]]["results"]
+    for path in paths:
+        expected = lint_file(path)["results"]
+        assert report[path]["results"] == expected
+    assert len(os.listdir(os.path.join(queue_dir, "done"))) == 3
+
+    # ワーカーごとに書き出した列指向の結果をまとめて読み込む
+    df = read_results(os.path.join(queue_dir, "columnar"))
+    assert sorted(df["file"].unique()) == sorted(paths)
+    assert len(df[df["file"] == duplicated_path]) == len(
+        df[df["file"] == paths[0]])
+
+
+def test_batch_lease_timeout(tmp_path):
+    path = os.path.join(SAMPLES_DIR, "check_1_5.csv")
+    queue = DirectoryWorkQueue(str(tmp_path), lease_seconds=0, max_attempts=2)
+    queue.enqueue([path])
+
+    # リースが切れたタスクは他のワーカーが再取得する
+    assert queue.claim("crashed-worker").attempts == 1
+    task = queue.claim("worker")
+    assert task.attempts == 2
+    queue.complete(task, lint_file(path), "worker")
+    assert queue.is_empty()
+
+    # 試行回数の上限を超えたタスクは failed に移す
+    queue = DirectoryWorkQueue(str(tmp_path / "other"),
+                               lease_seconds=0,
+                               max_attempts=1)
+    queue.enqueue([path])
+    assert queue.claim("crashed-worker") is not None
+    assert queue.claim("worker") is None
+    assert queue.is_empty()
+    assert len(os.listdir(os.path.join(queue.root, "failed"))) == 1
+
+
+def test_batch_enqueue_same_content(tmp_path):
+    path = os.path.join(SAMPLES_DIR, "check_1_5.csv")
+    copies = []
+    for name in ["a.csv", "b.csv", "c.csv"]:
+        copies.append(str(tmp_path / name))
+        shutil.copy(path, copies[-1])
+    queue = DirectoryWorkQueue(str(tmp_path / "queue"))
+
+    # 投入を分けても、同じ内容のタスクのパスに追加する
+    queue.enqueue(copies[:1])
+    queue.enqueue(copies[1:2])
+    task = queue.claim("worker")
+    assert task.paths == copies[:2]
+    queue.complete(task, lint_file(path), "worker")
+    # 完了した後に投入したパスは、lint し直さずに結果に含める
+    queue.enqueue(copies[2:])
+    assert queue.is_empty()
+    assert queue.claim("worker") is None
+
+    output_path = str(tmp_path / "report.jsonl")
+    assert queue.merge_results(output_path) == 3
+    with open(output_path, encoding="utf-8") as f:
+        assert sorted(json.loads(line)["path"] for line in f) == copies
+
+
+def test_batch_renew(tmp_path):
+    path = os.path.join(SAMPLES_DIR, "check_1_5.csv")
+    queue = DirectoryWorkQueue(str(tmp_path), lease_seconds=60)
+    queue.enqueue([path])
+    # pending で待った時間によらず、取得した時点からリースを数える
+    pending_dir = os.path.join(queue.root, "pending")
+    for name in os.listdir(pending_dir):
+        os.utime(os.path.join(pending_dir, name), (0, 0))
+    task = queue.claim("worker")
+    assert queue.claim("other-worker") is None
+
+    claimed_path = os.path.join(queue.root, "claimed",
+                                os.listdir(os.path.join(queue.root,
+                                                        "claimed"))[0])
+    os.utime(claimed_path, (0, 0))
+    queue.renew(task)
+    assert os.path.getmtime(claimed_path) > 0
+    assert queue.claim("other-worker") is None
+
+
+def test_batch_lanes(tmp_path):
+    large_path = str(tmp_path / "large.csv")
+    with open(large_path, "wb") as f:
+        f.write(gen_csv(30000))
+    small_paths = [
+        os.path.join(SAMPLES_DIR, name)
+        for name in ["nb01h0013.csv", "check_1_5.csv"]
+    ]
+    queue = DirectoryWorkQueue(str(tmp_path / "queue"))
+    tasks = queue.enqueue([large_path] + small_paths)
+    assert [t.lane for t in tasks] == [LONG_LANE, SHORT_LANE, SHORT_LANE]
+
+    # 短いレーンのみを処理するワーカーは長いタスクを取得しない
+    claimed = [queue.claim("short-worker", [SHORT_LANE]) for _ in range(3)]
+    assert sorted(t.paths[0] for t in claimed[:2]) == sorted(small_paths)
+    assert claimed[2] is None
+    # 同時に投入したタスクはコストの小さい順に取得する
+    assert claimed[0].cost <= claimed[1].cost
+
+    task = queue.claim("long-worker", [LONG_LANE, SHORT_LANE])
+    assert task.paths == [large_path]
+    assert task.queue_wait >= 0
+    for t in claimed[:2] + [task]:
+        queue.complete(t, {"results": {}}, "worker")
+    stats = queue.queue_wait_stats()
+    assert stats[SHORT_LANE]["count"] == 2
+    assert stats[LONG_LANE]["count"] == 1
+
+
+def test_batch_lanes_fifo(tmp_path, monkeypatch):
+    paths = []
+    for i, row_count in enumerate([300, 10, 20, 30, 40, 30000]):
+        paths.append(str(tmp_path / f"{i}.csv"))
+        with open(paths[-1], "wb") as f:
+            f.write(gen_csv(row_count))
+    queue = DirectoryWorkQueue(str(tmp_path / "queue"))
+    tasks = [queue.enqueue([path])[0] for path in paths]
+    assert tasks[0].cost > tasks[1].cost
+    assert [t.lane for t in tasks] == [SHORT_LANE] * 5 + [LONG_LANE]
+
+    linted = []
+    monkeypatch.setattr(batch, "lint_file",
+                        lambda path, **kwargs: linted.append(path) or {})
+    assert run_worker(queue, "worker", poll_interval=0.1) == 6
+    # 後から投入した小さいタスクに追い越されず、4回に1回は長いレーンから取得する
+    assert linted == paths[:3] + [paths[5]] + paths[3:5]
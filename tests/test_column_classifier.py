@@ -1,9 +1,17 @@
 import os
 import pytest
 
+import numpy as np
 import pandas as pd
 
-from opendatalinter.column_classifier import ColumnType, ColumnClassifier
+from opendatalinter.column_classifier import (
+    ColumnType,
+    ColumnClassifier,
+    classify_column,
+    classify_tables,
+    count_elements_and_empty,
+    get_plausible_column_type,
+)
 
 
 @pytest.mark.parametrize(('column', 'expected_type'), [
@@ -25,3 +33,32 @@ def test_column_classify(column, expected_type):
 
     column_types = classifier.perform()
     assert column_types[column] == expected_type
+
+
+def test_classify_tables():
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "./samples/classify_sample.csv")
+    df = pd.read_csv(file_path, header=0)
+    dfs = [df, df.iloc[:3, ::2], df.iloc[:0], df.iloc[:, 4:6].astype(str)]
+
+    assert classify_tables(dfs) == [ColumnClassifier(d).perform() for d in dfs]
+
+
+@pytest.mark.parametrize("column", [
+    pd.Series(np.arange(10000) % 47 + 1),
+    pd.Series(np.where(np.arange(10000) < 9000, np.nan, 2020.0)),
+    pd.Series(["東京都"] * 9000 + ["1"] * 1000, dtype=object),
+    pd.Series(["1"] * 5000 + ["a"] * 5000, dtype=object),
+    pd.Series(["", "-"] * 4000 + ["令和2年"] * 2000, dtype=object),
+    pd.Series([True, 1, 1.0, "1"] * 2500, dtype=object),
+    pd.Series(["北海道", None, "x"] * 3000, dtype=object).astype("category"),
+    pd.Series([], dtype=object),
+])
+@pytest.mark.parametrize("classify_rate", [0.5, 0.8])
+def test_classify_column(column, classify_rate):
+    # 途中で打ち切っても、全ての値を数えた場合と同じ分類になる
+    expected = get_plausible_column_type(*count_elements_and_empty(column),
+                                         len(column), classify_rate)
+    for block_rows in [1, 100, 4096]:
+        assert classify_column(column, classify_rate,
+                               block_rows=block_rows) == expected
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from opendatalinter.column_classifier import ColumnType
+from opendatalinter.column_relations import ColumnRelation, ColumnRelationIndex
+
+
+def test_jp_calendar_relations():
+    df = pd.DataFrame({
+        "code": [2017000000, 2020000000, 2018000000],
+        "jp": ["平成29年", "令和2年", np.nan],
+        "year": [2017, 2020, 2000],
+        "jp_ng": ["平成29年", "令和3年", "平成30年"],
+    })
+    types = [
+        ColumnType.DATETIME_CODE, ColumnType.JP_CALENDAR_YEAR,
+        ColumnType.CHRISTIAN_ERA, ColumnType.JP_CALENDAR_YEAR
+    ]
+    index = ColumnRelationIndex(df, types)
+
+    assert index.holds(1, 0, ColumnRelation.JP_CALENDAR_WITH_DATETIME_CODE)
+    assert index.holds(1, 2, ColumnRelation.JP_CALENDAR_WITH_CHRISTIAN_ERA)
+    assert not index.holds(3, 2,
+                           ColumnRelation.JP_CALENDAR_WITH_CHRISTIAN_ERA)
+    assert not index.has_adjacent(3, list(ColumnRelation))
+    # 分類が一致しない列の組は比較しない
+    assert not index.holds(0, 1,
+                           ColumnRelation.JP_CALENDAR_WITH_DATETIME_CODE)
+
+
+def test_prefecture_relations():
+    df = pd.DataFrame({
+        "name": ["北海道", "青森", "-"],
+        "code": [1, 2, 3],
+        "name_ng": ["北海道", "岩手", "東京都"],
+    })
+    types = [
+        ColumnType.PREFECTURE_NAME, ColumnType.PREFECTURE_CODE,
+        ColumnType.PREFECTURE_NAME
+    ]
+    index = ColumnRelationIndex(df, types)
+
+    assert index.has_adjacent(0, [ColumnRelation.PREFECTURE_NAME_WITH_CODE])
+    assert not index.has_adjacent(2,
+                                  [ColumnRelation.PREFECTURE_NAME_WITH_CODE])
@@ -1,5 +1,16 @@
+import multiprocessing
+
+import numpy as np
+import pandas as pd
 import pytest
 
+from opendatalinter import CSVLinter
+from opendatalinter.column_classifier import ColumnClassifier, ColumnType
+from opendatalinter.csv_structure_analyzer import CSVStructureAnalyzer
+from opendatalinter.deadline import Deadline
+from opendatalinter.funcs import find_first_cell, map_cells
+from opendatalinter.schema_store import SchemaStore
+from opendatalinter.vo import TableSchema, TimedOutLintResult
 from tests.util import gen_csv_linter, assert_valid_lint_result, assert_all_csv_check_is_valid
 
 
@@ -118,4 +129,290 @@ def test_check_2_x(perfect):
     assert_valid_lint_result(perfect.check_2_x())
 
     linter = gen_csv_linter("./samples/check_2_1.csv")
-    assert not linter.check_2_x().is_valid
+    result = linter.check_2_x()
+    assert not result.is_valid
+    assert set(result.invalid_contents[0].invalid_cells) == \
+           {(22, None), (None, 18)}
+    assert set(result.invalid_contents[1].invalid_cells) == {(0, 0), (23, 0)}
+
+    # 読み込めないファイルの場合、表の領域は推定しない
+    assert gen_csv_linter("./samples/text.txt").estimate_table_regions() == []
+
+
+@pytest.mark.parametrize("file_path", [
+    "./samples/check_1_2.csv", "./samples/check_1_3.csv",
+    "./samples/check_1_5.csv", "./samples/check_1_6.csv",
+    "./samples/check_1_11.csv", "./samples/check_1_12.csv",
+    "./samples/check_1_13.csv", "./samples/check_2_1.csv",
+    "./samples/nb01h0013_cp932.csv", "./samples/perfect.csv"
+])
+def test_fail_fast(file_path):
+    linter = gen_csv_linter(file_path)
+    for check in linter.VALIDATION_ORDER:
+        result = getattr(linter, check)()
+        fail_fast_result = getattr(linter, check)(fail_fast=True)
+        assert fail_fast_result.is_valid == result.is_valid
+        if not result.is_valid:
+            content = fail_fast_result.invalid_contents[0]
+            assert content in result.invalid_contents or \
+                   content.invalid_cells[0] in \
+                   [c for ic in result.invalid_contents for c in ic.invalid_cells]
+
+
+def test_find_first_cell():
+    df = pd.DataFrame([["a", "b", "x"], ["x", "c", "d"], ["e", "x", "x"]])
+    calls = []
+
+    def is_x(cell):
+        calls.append(cell)
+        return cell == "x"
+
+    assert find_first_cell(df, is_x) == tuple(
+        np.argwhere(map_cells(df, lambda cell: cell == "x"))[0]) == (0, 2)
+    # 2列目以降は1列目で見つかった2行目より前だけを調べる
+    assert calls == ["a", "x", "b", "x"]
+    assert find_first_cell(df, lambda cell: cell == "z") is None
+
+
+def test_validate(perfect):
+    assert perfect.validate().is_valid
+
+    linter = gen_csv_linter("./samples/check_1_13.csv")
+    result = linter.validate()
+    assert not result.is_valid
+    assert result.check_name == "check_1_13"
+    assert result.invalid_cell == (2, 0)
+
+    assert linter.validate(["check_1_5"]).is_valid
+    assert not gen_csv_linter("./samples/text.txt").validate().is_valid
+    with pytest.raises(ValueError):
+        linter.validate(["check_9_9"])
+
+
+def test_lazy_artifacts():
+    linter = gen_csv_linter("./samples/check_1_6.csv")
+    assert linter.check_1_1().is_valid
+    assert "df" not in linter.__dict__
+
+    assert not linter.check_1_6().is_valid
+    assert "header_df" in linter.__dict__
+    assert "df" not in linter.__dict__
+
+    results = linter.run(["check_1_2", "check_2_x"])
+    assert set(results) == {"check_1_2", "check_2_x"}
+    assert "df" in linter.__dict__
+    assert "column_classify" not in linter.__dict__
+
+    assert linter.column_classify[1] == ColumnType.OTHER_NUMBER
+
+
+def test_lazy_artifacts_error():
+    linter = gen_csv_linter("./samples/text.txt")
+    assert linter.check_1_2().is_valid is None
+    with pytest.raises(AttributeError):
+        linter.df
+
+
+@pytest.mark.parametrize("file_path", [
+    "./samples/check_1_2.csv", "./samples/check_1_3.csv",
+    "./samples/check_1_5.csv", "./samples/check_1_6.csv",
+    "./samples/check_1_11.csv", "./samples/check_1_12.csv",
+    "./samples/check_1_13.csv", "./samples/check_2_1.csv",
+    "./samples/nb01h0013_cp932.csv", "./samples/classify_sample.csv"
+])
+def test_compact_table(file_path):
+    linter = gen_csv_linter(file_path)
+    expected = CSVLinter(linter.data, file_path, compact=False)
+    assert linter.run() == expected.run()
+    assert linter.column_classify == expected.column_classify
+
+
+def test_compact_table_memory():
+    data = ("都道府県,年,人口\n" + "東京都,平成30年,1\n" * 1000).encode()
+    linter = CSVLinter(data, "memory.csv")
+    expected = CSVLinter(data, "memory.csv", compact=False)
+    assert linter.df[0].dtype == "category"
+    assert linter.df.memory_usage(deep=True).sum() * 5 < \
+           expected.df.memory_usage(deep=True).sum()
+
+    linter = CSVLinter(data, "memory.csv", memory_budget=1024)
+    assert linter.check_1_2().is_valid is None
+    assert not linter.check_1_1().is_valid
+
+
+def test_schema_store(tmp_path, monkeypatch):
+    path = str(tmp_path / "schemas.json")
+    expected = gen_csv_linter("./samples/classify_sample.csv")
+    linter = CSVLinter(expected.data,
+                       expected.filename,
+                       schema_store=SchemaStore(path))
+    assert linter.column_classify == expected.column_classify
+
+    classified_row_counts = []
+    perform = ColumnClassifier.perform
+
+    def count_rows(self):
+        classified_row_counts.append(len(self.df))
+        return perform(self)
+
+    monkeypatch.setattr(CSVLinter, "SCHEMA_SAMPLE_SIZE", 3)
+    monkeypatch.setattr(ColumnClassifier, "perform", count_rows)
+
+    # ヘッダーが一致する表は、一部の行で分類を確認するだけで済む
+    linter = CSVLinter(expected.data,
+                       expected.filename,
+                       schema_store=SchemaStore(path))
+    assert linter.column_classify == expected.column_classify
+    assert classified_row_counts == [3]
+
+    # 確認に失敗した場合は全ての行で分類し直し、記録を更新する
+    store = SchemaStore(path)
+    fingerprint = linter.csv_structure_analyzer.gen_header_fingerprint()
+    schema = store.get(fingerprint)
+    schema.column_types = [ColumnType.NONE_CATEGORY.value
+                           ] * len(schema.column_types)
+    store.put(fingerprint, schema)
+    classified_row_counts.clear()
+    linter = CSVLinter(expected.data, expected.filename, schema_store=store)
+    assert linter.column_classify == expected.column_classify
+    assert classified_row_counts == [3, len(expected.df)]
+    assert SchemaStore(path).get(fingerprint).column_types == [
+        t.value for t in expected.column_classify
+    ]
+
+
+def _put_schemas(path, worker):
+    store = SchemaStore(path)
+    for k in range(20):
+        store.put(f"{worker}-{k}", TableSchema(0, 1, []))
+
+
+def test_schema_store_concurrent_put(tmp_path):
+    path = str(tmp_path / "schemas.json")
+    processes = [
+        multiprocessing.Process(target=_put_schemas, args=(path, worker))
+        for worker in range(4)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    # 他のプロセスが保存した記録を上書きしない
+    store = SchemaStore(path)
+    assert all(
+        store.get(f"{worker}-{k}") is not None for worker in range(4)
+        for k in range(20))
+
+
+def test_timeout():
+    data = gen_csv_linter("./samples/nb01h0013.csv").data
+    linter = CSVLinter(data, "timeout.csv", timeout=0)
+    for result in linter.run().values():
+        assert isinstance(result, TimedOutLintResult)
+        assert result.is_valid is None
+        assert result.to_dict()["is_timed_out"]
+
+    # 時間切れまでに終わったチェックの結果は残る
+    linter = CSVLinter(data, "timeout.csv", timeout=60)
+    assert linter.check_1_6().is_valid is False
+    linter.deadline.expires_at = 0
+    results = linter.run(["check_1_1", "check_1_6", "check_1_3"])
+    assert results["check_1_1"].is_valid
+    assert isinstance(results["check_1_6"], TimedOutLintResult)
+    assert isinstance(results["check_1_3"], TimedOutLintResult)
+    assert linter.validate().is_valid is None
+
+
+def test_timeout_in_loop(monkeypatch):
+    expected = gen_csv_linter("./samples/nb01h0013.csv")
+    linter = CSVLinter(expected.data, "timeout.csv", timeout=60)
+    linter.prepare(["df"])
+    monkeypatch.setattr(Deadline, "CHECK_INTERVAL", 1)
+    ticks = []
+
+    def tick(self):
+        ticks.append(None)
+        if len(ticks) > 10:
+            self.expires_at = 0
+        self.check()
+
+    # 列の分類の途中で時間切れになった場合も、成果物を壊さずに打ち切る
+    monkeypatch.setattr(Deadline, "tick", tick)
+    assert isinstance(linter.check_1_3(), TimedOutLintResult)
+    assert "column_types" not in linter.__dict__
+    linter.deadline.expires_at = None
+    assert linter.check_1_3() == expected.check_1_3()
+
+
+@pytest.mark.parametrize("file_path", [
+    "./samples/nb01h0013_cp932.csv", "./samples/check_1_3.csv",
+    "./samples/check_1_12.csv", "./samples/check_2_1.csv",
+    "./samples/classify_sample.csv", "./samples/text.txt"
+])
+def test_artifacts(file_path, tmp_path):
+    expected = gen_csv_linter(file_path)
+    expected.save_artifacts(str(tmp_path))
+
+    linter = CSVLinter.from_artifacts(str(tmp_path))
+    assert linter.run() == expected.run()
+    if expected.check_1_1().is_valid:
+        assert linter.encoding == expected.encoding
+        assert linter.df.equals(expected.df)
+        assert linter.column_classify == expected.column_classify
+
+
+def test_resegment(nb01h0013, monkeypatch):
+    expected = nb01h0013.run()
+    non_empty_mask = nb01h0013.non_empty_mask
+
+    monkeypatch.setattr("chardet.detect", None)
+    monkeypatch.setattr(CSVStructureAnalyzer, "parse", None)
+    nb01h0013.resegment(title_line_num=2, header_line_num=1)
+    assert "df" not in nb01h0013.__dict__
+    assert (nb01h0013.title_line_num, nb01h0013.header_line_num) == (2, 1)
+    monkeypatch.undo()
+
+    fresh = CSVLinter(nb01h0013.data,
+                      nb01h0013.filename,
+                      title_line_num=2,
+                      header_line_num=1)
+    assert nb01h0013.run() == fresh.run()
+    assert len(nb01h0013.header_df) == 1
+    assert nb01h0013.non_empty_mask is non_empty_mask
+
+    nb01h0013.resegment()
+    assert nb01h0013.run() == expected
+
+
+def test_resegment_after_header_estimate_error():
+    linter = CSVLinter("名前,住所\nA,B\nC,D\n".encode(), "no_number.csv")
+    assert not linter.check_1_1().is_valid
+
+    linter.resegment(header_line_num=1)
+    assert linter.check_1_1().is_valid
+    assert list(linter.header_df.iloc[0]) == ["名前", "住所"]
+    assert len(linter.df) == 2
+
+
+@pytest.mark.parametrize("title_line_num, header_line_num", [(1, None),
+                                                             (1, 1), (0, 2)])
+def test_resegment_with_ragged_rows(title_line_num, header_line_num):
+    # タイトルの行数を小さく指定すると、列数の異なる備考の行が表に含まれる
+    text = "タイトル\n備考,あり\n名前,年齢,住所\nA,1,X\nB,2,Y\n"
+    with pytest.raises(ValueError):
+        CSVStructureAnalyzer(text,
+                             title_line_num=title_line_num,
+                             header_line_num=header_line_num)
+
+    linter = CSVLinter(text.encode(), "ragged.csv")
+    assert linter.check_1_1().is_valid
+    linter.resegment(title_line_num, header_line_num)
+    linter.run()
+    result = linter.check_1_1()
+    assert not result.is_valid
+    assert "列数の異なる行" in result.invalid_contents[0].error_message
+
+    linter.resegment(title_line_num=2)
+    assert linter.check_1_1().is_valid
+    assert len(linter.df) == 2
@@ -1,3 +1,10 @@
+import io
+
+import openpyxl
+import pytest
+from openpyxl.styles import Font
+
+from opendatalinter import ExcelLinter
 from tests.util import gen_excel_linter, assert_valid_lint_result, assert_all_excel_check_is_valid
 
 
@@ -25,6 +32,43 @@ def test_check_1_7():
            {(1, 2), (2, 0), (2, 2)}
 
 
+def test_used_range():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["都道府県", "人口", None])
+    ws.append(["東京都", 1, None, None])
+    ws.append(["大阪府", "=B2"])
+    # 書式のみが設定された空のセルは、表の範囲に含めない
+    ws.cell(row=100000, column=200).font = Font(bold=True)
+    with io.BytesIO() as f:
+        wb.save(f)
+        data = f.getvalue()
+
+    linter = ExcelLinter(data, "stray.xlsx", timeout=60)
+    assert linter.text == "都道府県,人口\r\n東京都,1\r\n大阪府,=B2\r\n"
+    assert linter.check_1_7().invalid_contents[0].invalid_cells == [(2, 1)]
+    assert_valid_lint_result(linter.check_2_x())
+
+
 def test_including_date_cell():
     linter = gen_excel_linter("./samples/date.xlsx")
     assert_all_excel_check_is_valid(linter)
+
+
+def test_validate():
+    linter = gen_excel_linter("./samples/expression.xlsx")
+    result = linter.validate(["check_1_7"])
+    assert not result.is_valid
+    assert result.check_name == "check_1_7"
+    assert result.invalid_cell == (1, 2)
+
+
+@pytest.mark.parametrize("file_path", [
+    "./samples/expression.xlsx", "./samples/since2003_visitor_arrivals.xlsx"
+])
+def test_artifacts(file_path, tmp_path):
+    expected = gen_excel_linter(file_path)
+    expected.save_artifacts(str(tmp_path))
+    linter = ExcelLinter.from_artifacts(str(tmp_path))
+    assert linter.ws is None
+    assert linter.run() == expected.run()
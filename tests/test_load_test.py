@@ -0,0 +1,53 @@
+import json
+
+from benchmarks.load_test import (ASGITarget, InProcessTarget, Sample,
+                                  build_corpus, run_load)
+from opendatalinter import OpenDataLinter
+
+
+async def lint_app(scope, receive, send):
+    # ファイル名をクエリ文字列、内容を本文で受け取る最小の lint サービス
+    filename = scope["query_string"].decode().split("=", 1)[1]
+    body = (await receive())["body"]
+    try:
+        results = {
+            k: v.to_dict()
+            for k, v in OpenDataLinter(body, filename).run().items()
+        }
+        status, content = 200, json.dumps(results, default=str).encode()
+    except Exception:
+        status, content = 500, b""
+    await send({"type": "http.response.start", "status": status})
+    await send({"type": "http.response.body", "body": content})
+
+
+def test_run_load_in_process():
+    corpus = build_corpus(large_rows=1000)
+    names = [sample.name for sample in corpus]
+    assert "large_1000.csv" in names
+    assert "invalid_utf8.csv" in names
+
+    target = InProcessTarget(pool_size=0)
+    report = run_load(target, corpus, requests=len(corpus), concurrency=2)
+    target.close()
+    assert report.requests == len(corpus)
+    # 壊れた xlsx はブックを開けずに例外となり、それ以外は lint 結果が返る
+    assert report.error_messages == {"truncated.xlsx: BadZipFile": 1}
+    assert len(report.latencies) == len(corpus) - 1
+    assert report.percentile(50) <= report.percentile(95) <= report.percentile(
+        99)
+    assert len(report.worker_max_rss) == 1
+
+
+def test_run_load_asgi():
+    corpus = [
+        Sample("perfect.csv", b"a,b\n1,2\n"),
+        Sample("truncated.xlsx", b"PK\x03\x04"),
+    ]
+    target = ASGITarget(lint_app)
+    report = run_load(target, corpus, requests=6, concurrency=3)
+    target.close()
+    assert report.errors == 3
+    assert report.error_rate == 0.5
+    assert report.error_messages == {"truncated.xlsx: RuntimeError": 3}
+    assert report.to_dict()["throughput"] > 0
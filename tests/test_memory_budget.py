@@ -0,0 +1,145 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.memory_benchmark import gen_csv
+from opendatalinter import CSVLinter
+from opendatalinter.batch import lint_file
+from opendatalinter import memory_budget
+from opendatalinter.errors import MemoryBudgetExceededError
+from opendatalinter.memory_budget import (
+    CHUNKED_PATH,
+    IN_MEMORY_PATH,
+    SAMPLED_PATH,
+    MemoryBudgetedLinter,
+    MemoryWatch,
+    choose_execution_path,
+    estimate_footprint,
+)
+from opendatalinter.vo import SampledLintResult
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+
+
+def gen_wide_csv(row_count: int) -> bytes:
+    # 300列の表は pandas が 2048 行ごとに型を推定する。チャンクごとに列の値の種類を変える
+    kinds = [
+        lambda i, j: ["東京", "大阪", " x"][(i + j) % 3],
+        lambda i, j: str((i * j) % 7),
+        lambda i, j: "",
+        lambda i, j: ["True", "false", ""][i % 3],
+        lambda i, j: f"u{i}",
+    ]
+    lines = [",".join(f"h{j}" for j in range(300))]
+    for i in range(row_count):
+        lines.append(",".join(kinds[(j + i // 2048 * (j % 3 + 1)) % 5](i, j)
+                              for j in range(300)))
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.mark.parametrize("engine", ["pandas", "pyarrow"])
+def test_chunked_df(engine):
+    data = gen_wide_csv(2500)
+    expected = CSVLinter(data, "wide.csv", engine=engine).df
+    df = CSVLinter(data, "wide.csv", engine=engine, chunk_rows=1).df
+    pd.testing.assert_frame_equal(df, expected)
+    assert (df.dtypes == "category").any()
+
+    expected = CSVLinter(data, "wide.csv", engine=engine, compact=False).df
+    df = CSVLinter(data, "wide.csv", engine=engine, compact=False,
+                   chunk_rows=1).df
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_chunked_results():
+    data = gen_csv(3000)
+    expected = CSVLinter(data, "a.csv").run()
+    assert CSVLinter(data, "a.csv", chunk_rows=100).run() == expected
+
+
+def test_estimate_footprint():
+    # 5列の表は 262144 行ごとに読み込むため、chunked は表の一部のみを一度に読み込む
+    data = gen_csv(400000)
+    estimates = estimate_footprint(data[:65536], len(data), "large.csv")
+    assert estimates[SAMPLED_PATH] < estimates[CHUNKED_PATH] < estimates[
+        IN_MEMORY_PATH]
+    assert choose_execution_path(estimates, 2**40) == IN_MEMORY_PATH
+    assert choose_execution_path(estimates,
+                                 estimates[CHUNKED_PATH]) == CHUNKED_PATH
+    assert choose_execution_path(estimates, 0) == SAMPLED_PATH
+
+    path = os.path.join(SAMPLES_DIR, "since2003_visitor_arrivals.xlsx")
+    with open(path, "rb") as f:
+        data = f.read()
+    assert list(estimate_footprint(data, len(data), path)) == [IN_MEMORY_PATH]
+
+
+def test_memory_watch():
+    # 使用量は RSS の baseline からの増分
+    watch = MemoryWatch(0, baseline=0)
+    with pytest.raises(MemoryBudgetExceededError):
+        watch.check()
+    assert watch.exceeded
+    assert watch.peak > 0
+
+    watch = MemoryWatch(2**40)
+    for _ in range(watch.CHECK_INTERVAL):
+        watch.tick()
+    assert not watch.exceeded
+
+
+def test_memory_budgeted_linter():
+    data = gen_csv(3000)
+    expected = CSVLinter(data, "a.csv").run()
+
+    linter = MemoryBudgetedLinter(data, "a.csv", 2**40)
+    assert linter.plan.execution_path == IN_MEMORY_PATH
+    assert linter.run() == expected
+    assert linter.plan.fallbacks == []
+
+    # 表が1つのチャンクに収まるため、chunked の推定使用量は in_memory と同じになる
+    linter = MemoryBudgetedLinter(data, "a.csv", 2**40)
+    linter.plan.execution_path = CHUNKED_PATH
+    assert linter.run() == expected
+    assert linter.linter.chunk_rows is not None
+
+    linter = MemoryBudgetedLinter(data, "a.csv", 0)
+    assert linter.plan.execution_path == SAMPLED_PATH
+    linter.plan.budget = 2**40
+    results = linter.run()
+    assert all(
+        isinstance(r, SampledLintResult) for name, r in results.items()
+        if name != "check_1_1")
+
+
+def test_memory_budgeted_linter_fallback(monkeypatch):
+    data = gen_csv(3000)
+    linter = MemoryBudgetedLinter(data, "a.csv", 2**30)
+    # 実行中の使用量が常に予算を超える場合、全ての経路を試してからエラーとする
+    rss = memory_budget.current_rss()
+    monkeypatch.setattr(memory_budget, "current_rss", lambda: rss + 2**31)
+    results = linter.run()
+    assert linter.plan.fallbacks == [
+        IN_MEMORY_PATH, CHUNKED_PATH, SAMPLED_PATH
+    ]
+    assert linter.plan.execution_path is None
+    assert not results["check_1_1"].is_valid
+    assert results["check_1_1"].invalid_contents[
+        0].error_message == "ファイルが大きすぎるため、チェックできませんでした。"
+    assert results["check_1_2"].is_valid is None
+
+    # Excel はブック全体を読み込むため、推定使用量が予算を超える場合は読み込まない
+    path = os.path.join(SAMPLES_DIR, "since2003_visitor_arrivals.xlsx")
+    with open(path, "rb") as f:
+        linter = MemoryBudgetedLinter(f.read(), path, 1024)
+    assert linter.plan.execution_path is None
+    assert not linter.run()["check_1_1"].is_valid
+
+
+def test_lint_file_with_memory_budget():
+    path = os.path.join(SAMPLES_DIR, "nb01h0013.csv")
+    result = lint_file(path, workers=1, memory_budget=2**40)
+    assert result["memory_plan"]["execution_path"] == IN_MEMORY_PATH
+    assert result["results"] == lint_file(path, workers=1)["results"]
@@ -0,0 +1,31 @@
+import glob
+import os
+
+from opendatalinter import CSVLinter
+from opendatalinter.micro_batch import lint_small_files
+
+
+def test_lint_small_files():
+    file_paths = sorted(
+        glob.glob(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "samples", "*.csv")))
+    inputs = []
+    for file_path in file_paths + [file_paths[0]]:
+        with open(file_path, "rb") as f:
+            inputs.append((file_path, f.read()))
+    inputs.append(("text.txt", b"hello"))
+    inputs.append(("empty.csv", b""))
+
+    results = lint_small_files(inputs)
+
+    assert len(results) == len(inputs)
+    for (filename, data), result in zip(inputs, results):
+        assert result == CSVLinter(data, filename).run()
+
+
+def test_lint_small_files_checks():
+    results = lint_small_files([("a.csv", "名前,値\nA,1\n".encode())],
+                               checks=["check_1_3"])
+    assert list(results[0]) == ["check_1_3"]
+    assert results[0]["check_1_3"].is_valid
@@ -0,0 +1,59 @@
+import pytest
+
+from opendatalinter.arrow_engine import has_pyarrow
+from opendatalinter.result_sink import ResultSink, read_results
+from tests.util import gen_csv_linter
+
+FORMATS = ["binary"] + (["arrow", "parquet"] if has_pyarrow() else [])
+
+
+def expected_rows(results):
+    rows = []
+    for check, result in results.items():
+        if not result.invalid_contents:
+            rows.append((check, result.is_valid, None, 0))
+        for content in result.invalid_contents:
+            rows.append((check, result.is_valid, content.error_message,
+                         len(content.invalid_cells)))
+    return rows
+
+
+def expected_cells(results):
+    cells = []
+    for result in results.values():
+        if not result.invalid_contents:
+            cells.append([])
+        cells.extend(c.invalid_cells for c in result.invalid_contents)
+    return cells
+
+
+@pytest.mark.parametrize("sink_format", FORMATS)
+@pytest.mark.parametrize("include_cells", [False, True])
+def test_result_sink(tmp_path, sink_format, include_cells):
+    files = {
+        name: gen_csv_linter(f"./samples/{name}").run()
+        for name in ["check_1_5.csv", "check_1_12.csv", "text.txt"]
+    }
+    with ResultSink.for_worker(str(tmp_path),
+                               "worker-0",
+                               format=sink_format,
+                               include_cells=include_cells,
+                               batch_size=5) as sink:
+        for name, results in files.items():
+            sink.write(name, results)
+
+    df = read_results(str(tmp_path))
+    assert (include_cells == ("cell_rows" in df.columns))
+    for name, results in files.items():
+        rows = df[df["file"] == name]
+        assert [(r.check, r.is_valid, r.error_message, r.cell_count)
+                for r in rows.itertuples()] == expected_rows(results)
+        if not include_cells:
+            continue
+        cells = [
+            list(zip(map(int, r), map(int, c)))
+            for r, c in zip(rows["cell_rows"], rows["cell_columns"])
+        ]
+        assert cells == [[(-1 if i is None else i, -1 if j is None else j)
+                          for i, j in cells]
+                         for cells in expected_cells(results)]
@@ -0,0 +1,67 @@
+import csv
+import glob
+import os
+from io import StringIO
+
+import pytest
+
+from opendatalinter.csv_structure_analyzer import CSVStructureAnalyzer
+from opendatalinter.row_index import RowIndex
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "a,b\n1,2\n",
+    "a,b\r\n\r\n1,2",
+    'a,"b\nc"\n"x,""y""",2\n',
+    '"",""\n,\n\n',
+    "タイトル\n\na,b,c\r",
+])
+def test_row_index(text):
+    rows = list(csv.reader(StringIO(text)))
+    index = RowIndex.from_text(text)
+    assert index.field_counts.tolist() == [len(row) for row in rows]
+    assert index.get_rows(0, len(index)) == rows
+    for i in range(len(rows)):
+        assert index.get_rows(i, i + 1) == [rows[i]]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        'a"b,c\n',  # フィールドの途中のクォート
+        '"a"b,c\n',  # 閉じたクォートの後に続く文字
+        '"a,b\n',  # 閉じていないクォート
+        "a\rb\n",  # クォートの外の単独の CR
+    ])
+def test_row_index_fallback(text):
+    assert RowIndex.from_text(text) is None
+
+
+def test_analyzer_with_row_index():
+    for path in glob.glob(os.path.join(SAMPLES_DIR, "*.csv")):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            text = data.decode()
+        except UnicodeDecodeError:
+            continue
+        rows = CSVStructureAnalyzer.parse(text)
+        fast = CSVStructureAnalyzer(text)
+        slow = CSVStructureAnalyzer(text, rows=rows)
+        assert (fast.title_line_num, fast.header_line_num) == \
+            (slow.title_line_num, slow.header_line_num)
+        assert fast.get_header_rows() == slow.get_header_rows()
+        assert fast.get_content_rows() == slow.get_content_rows()
+        assert fast.gen_rows_df().equals(slow.gen_rows_df())
+
+
+def test_whitespace_only_single_column():
+    # 空白のみの1列の行も、表の行として読み込む
+    for text in ['h\n1\n"  "\n2\n', 'h\n1\n  \n2\n']:
+        for rows in [None, CSVStructureAnalyzer.parse(text)]:
+            analyzer = CSVStructureAnalyzer(text, rows=rows)
+            assert analyzer.gen_rows_df()[0].tolist() == ["1", "  ", "2"]
@@ -0,0 +1,87 @@
+import io
+import os
+
+from opendatalinter.sampling import SampledCSVLinter
+from opendatalinter.vo import SampledLintResult
+from tests.util import gen_csv_linter
+
+
+def read_sample(file_path: str) -> bytes:
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             file_path)
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def gen_large_csv() -> bytes:
+    header = "都道府県,人口,備考\r\n"
+    rows = [f"東京都,{i},\r\n" for i in range(20000)]
+    rows[15000] = "東京都,10(20),\r\n"
+    rows[17000] = '東京都,"1\r\n2",\r\n'
+    return (header + "".join(rows)).encode()
+
+
+def test_small_file_is_read_entirely():
+    data = read_sample("./samples/check_1_13.csv")
+    linter = SampledCSVLinter(io.BytesIO(data), "check_1_13.csv")
+    expected = gen_csv_linter("./samples/check_1_13.csv")
+
+    result = linter.check_1_13()
+    assert isinstance(result, SampledLintResult)
+    assert result.is_sampled
+    assert result.sample_size == len(expected.df)
+    assert result.invalid_contents == expected.check_1_13().invalid_contents
+    assert result.violation_rate == 3 / (len(expected.df) * 3)
+
+
+def test_large_file_is_sampled():
+    data = gen_large_csv()
+    linter = SampledCSVLinter(io.BytesIO(data),
+                              "large.csv",
+                              sample_size=100,
+                              head_size=1024)
+
+    assert linter.check_1_1().is_valid
+    result = linter.check_1_2()
+    assert result.sample_size <= 100
+    assert linter.header_line_num == 1
+    assert len(linter.df.columns) == 3
+    assert all(data[o:o + 3] == "東".encode()[:3]
+               for o in linter.sampled_line_offsets)
+    assert linter.check_1_13().is_valid is not None
+    assert result.to_dict()["is_sampled"]
+
+
+def test_head_rows_are_not_oversampled():
+    # 先頭の head_size バイトに収まる行だけが違反している場合
+    header = "都道府県,人口,備考\r\n"
+    rows = [f"東京 都,{i}," if i < 100 else f"東京都,{i},"
+            for i in range(20000)]
+    data = (header + "\r\n".join(rows) + "\r\n").encode()
+    linter = SampledCSVLinter(io.BytesIO(data),
+                              "large.csv",
+                              sample_size=100,
+                              head_size=4096)
+
+    result = linter.check_1_5()
+    assert len(linter.df) == result.sample_size == len(
+        linter.sampled_line_offsets)
+    assert 0 < result.violation_rate <= 2 / (result.sample_size * 3)
+
+
+def test_head_without_line_break():
+    data = ("あ" * 1000 + "\n" + gen_large_csv().decode()).encode()
+    linter = SampledCSVLinter(io.BytesIO(data),
+                              "large.csv",
+                              sample_size=100,
+                              head_size=1024)
+
+    assert linter.check_1_1().is_valid
+    assert (linter.title_line_num, linter.header_line_num) == (1, 1)
+    assert 0 < len(linter.df) <= 100
+
+
+def test_invalid_file():
+    linter = SampledCSVLinter(io.BytesIO(b"hello"), "text.txt")
+    assert not linter.check_1_1().is_valid
+    assert linter.check_1_2().is_valid is None
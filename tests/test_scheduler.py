@@ -0,0 +1,59 @@
+import os
+
+from benchmarks.memory_benchmark import gen_csv
+from opendatalinter import OpenDataLinter
+from opendatalinter.scheduler import (LONG_LANE, SHORT_LANE, LaneScheduler,
+                                      estimate_cost, estimate_file_cost)
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+
+
+def test_estimate_cost():
+    data = gen_csv(30000)
+    cost = estimate_cost(data[:4096], len(data), "large.csv")
+    assert cost.column_count == 5
+    assert abs(cost.row_count - 30001) < 3000
+    assert cost.lane == LONG_LANE
+
+    path = os.path.join(SAMPLES_DIR, "nb01h0013.csv")
+    cost = estimate_file_cost(path)
+    assert cost.kind == "csv"
+    assert cost.lane == SHORT_LANE
+
+    # Excel は最初のシートの dimension からセル数を求める
+    path = os.path.join(SAMPLES_DIR, "since2003_visitor_arrivals.xlsx")
+    cost = estimate_file_cost(path)
+    assert cost.kind == "excel"
+    assert (cost.row_count, cost.column_count) == (96, 29)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert estimate_cost(data, len(data), path) == cost
+
+    assert estimate_cost(b"a,b\n", 4, "text.txt").cost == 0
+
+
+def test_lane_scheduler():
+    large = gen_csv(30000)
+    with open(os.path.join(SAMPLES_DIR, "nb01h0013.csv"), "rb") as f:
+        small = f.read()
+
+    with LaneScheduler(short_workers=1, long_workers=1,
+                       split_workers=1) as scheduler:
+        futures = [scheduler.submit(large, "large.csv")]
+        futures += [scheduler.submit(small, f"{i}.csv") for i in range(4)]
+        results = [f.result() for f in futures]
+        stats = scheduler.queue_wait_stats()
+
+    assert [r.lane for r in results] == [LONG_LANE] + [SHORT_LANE] * 4
+    assert all(r.error is None for r in results)
+    # 短いジョブは長いジョブの終了を待たない
+    assert max(r.queue_wait for r in results[1:]) < results[0].run_time
+    assert stats[SHORT_LANE]["count"] == 4
+    assert stats[LONG_LANE]["count"] == 1
+
+    expected = {
+        name: result.to_dict()
+        for name, result in OpenDataLinter(small, "0.csv").run().items()
+    }
+    assert results[1].results == expected
@@ -0,0 +1,100 @@
+import asyncio
+import csv
+import io
+import os
+
+import pytest
+from chardet.universaldetector import UniversalDetector
+
+from opendatalinter import stream
+from opendatalinter.stream import lint_stream, StreamingCSVReader
+from tests.util import gen_csv_linter, gen_excel_linter
+
+CHECKS = [
+    "check_1_1", "check_1_2", "check_1_3", "check_1_5", "check_1_6",
+    "check_1_10", "check_1_11", "check_1_12", "check_1_13", "check_2_x"
+]
+
+
+async def chunked(data: bytes, chunk_size: int):
+    for i in range(0, len(data), chunk_size):
+        await asyncio.sleep(0)
+        yield data[i:i + chunk_size]
+
+
+def read_sample(file_path: str) -> bytes:
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             file_path)
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("file_path", [
+    "./samples/nb01h0013.csv",
+    "./samples/nb01h0013_cp932.csv",
+    "./samples/check_1_5.csv",
+    "./samples/check_1_12.csv",
+    "./samples/check_2_1.csv",
+    "./samples/text.txt",
+])
+@pytest.mark.parametrize("chunk_size", [7, 1024])
+def test_lint_stream_matches_csv_linter(file_path, chunk_size):
+    expected = gen_csv_linter(file_path)
+    linter = asyncio.run(
+        lint_stream(chunked(read_sample(file_path), chunk_size), file_path))
+    for check in CHECKS:
+        assert getattr(linter, check)() == getattr(expected, check)()
+
+
+def test_lint_stream_excel():
+    file_path = "./samples/expression.xlsx"
+    expected = gen_excel_linter(file_path)
+    linter = asyncio.run(
+        lint_stream(chunked(read_sample(file_path), 1024), file_path))
+    assert linter.check_1_7() == expected.check_1_7()
+
+
+def test_streaming_reader_multiline_cell():
+    reader = StreamingCSVReader()
+    for chunk in [b'a,"b\n', b'c"\n', b'd,e']:
+        reader.feed(chunk)
+    assert reader.close() == [["a", "b\nc"], ["d", "e"]]
+
+
+def test_streaming_reader_redetects_encoding(monkeypatch):
+    class EagerDetector(UniversalDetector):
+        """最初のチャンクで UTF-8 と確定する"""
+        def feed(self, byte_str):
+            self.done = True
+            self.result = {"encoding": "utf-8"}
+
+        def close(self):
+            return self.result
+
+    monkeypatch.setattr(stream, "UniversalDetector", EagerDetector)
+    data = read_sample("./samples/nb01h0013_cp932.csv")
+    reader = StreamingCSVReader()
+    for i in range(0, len(data), 1024):
+        reader.feed(data[i:i + 1024])
+    rows = reader.close()
+
+    expected = gen_csv_linter("./samples/nb01h0013_cp932.csv")
+    assert reader.encoding == expected.encoding
+    assert rows == list(csv.reader(io.StringIO(expected.text)))
+
+
+def test_streaming_reader_structure():
+    for file_path in ["./samples/nb01h0013.csv", "./samples/check_2_1.csv"]:
+        data = read_sample(file_path)
+        reader = StreamingCSVReader()
+        for i in range(0, len(data), 7):
+            reader.feed(data[i:i + 7])
+        reader.close()
+        expected = gen_csv_linter(file_path)
+        assert reader.get_structure() == (expected.title_line_num,
+                                          expected.header_line_num)
+
+    reader = StreamingCSVReader()
+    reader.feed("あ,い\nう,え\n".encode())
+    reader.close()
+    assert reader.get_structure() == (None, None)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from opendatalinter.table_segmenter import TableSegmenter
+from opendatalinter.vo import TableRegion
+
+
+def test_single_table():
+    mask = np.array([
+        [0, 0, 0, 0],
+        [0, 1, 1, 0],
+        [0, 1, 0, 0],
+    ])
+    assert TableSegmenter(mask).perform() == [TableRegion(1, 1, 3, 3)]
+
+
+def test_multiple_tables():
+    mask = np.array([
+        [1, 1, 0, 1],
+        [1, 1, 0, 1],
+        [0, 0, 0, 0],
+        [1, 0, 0, 0],
+        [1, 1, 1, 1],
+    ])
+    assert TableSegmenter(mask).perform() == [
+        TableRegion(0, 0, 2, 2),
+        TableRegion(0, 3, 2, 4),
+        TableRegion(3, 0, 5, 4),
+    ]
+
+
+def test_pinwheel_tables():
+    # 行・列全体が空の箇所はないが、4つの表が空のセルで区切られている
+    mask = np.array([
+        [1, 1, 1, 0, 1],
+        [0, 0, 0, 0, 1],
+        [1, 0, 0, 0, 1],
+        [1, 0, 0, 0, 0],
+        [1, 0, 1, 1, 1],
+    ])
+    assert TableSegmenter(mask).perform() == [
+        TableRegion(0, 0, 1, 3),
+        TableRegion(0, 4, 3, 5),
+        TableRegion(2, 0, 5, 1),
+        TableRegion(4, 2, 5, 5),
+    ]
+
+
+def test_sparse_table():
+    # 空のセルで分かれた成分も、囲む矩形が重なる場合は1つの表とみなす
+    mask = np.array([
+        [1, 1, 1, 1],
+        [1, 0, 0, 0],
+        [1, 0, 1, 0],
+        [1, 0, 0, 0],
+        [1, 1, 1, 1],
+    ])
+    assert TableSegmenter(mask).perform() == [TableRegion(0, 0, 5, 4)]
+
+
+def test_empty_mask():
+    assert TableSegmenter(np.zeros((3, 3))).perform() == []
+    assert TableSegmenter(np.zeros((0, 0))).perform() == []
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from opendatalinter import CSVLinter
+from opendatalinter import tiling
+from opendatalinter.tiling import SharedTable, map_tiles, plan_tiles
+from tests.util import gen_csv_linter
+
+
+def collect_values(values, row_start):
+    return row_start, values
+
+
+def test_plan_tiles():
+    # 全てのセルがちょうど1つのタイルに含まれる
+    for row_count, column_count, workers in [(10, 3, 2), (1, 100, 4),
+                                             (1000, 1, 3), (7, 7, 1)]:
+        covered = np.zeros((row_count, column_count), dtype=int)
+        for c0, c1, r0, r1 in plan_tiles(row_count, column_count, workers):
+            covered[r0:r1, c0:c1] += 1
+        assert (covered == 1).all()
+
+
+def test_map_tiles_restores_values():
+    df = pd.DataFrame({
+        0: [1, 2, 3, 4, 5],
+        1: [1.5, np.nan, 3.0, -0.0, 1e300],
+        2: ["a", np.nan, "東京都", "", "\ud800"],
+        3: [True, False, True, np.nan, 1],
+        4: [True, False, True, True, False],
+    })
+    tiles = map_tiles(df, collect_values, [0, 1, 2, 3, 4], workers=2)
+    for j in range(5):
+        rows = [(row_start, values) for k, _, (row_start, values) in tiles
+                if k == j]
+        values = [v for _, values in sorted(rows) for v in values]
+        # numpy のスカラーは対応する Python の値として復元される
+        expected = [
+            e.item() if isinstance(e, np.generic) else e for e in df[j]
+        ]
+        assert [(type(v), repr(v)) for v in values
+                ] == [(type(e), repr(e)) for e in expected]
+
+
+@pytest.mark.parametrize("file_path", [
+    "./samples/nb01h0013.csv",
+    "./samples/check_1_2.csv",
+    "./samples/check_1_3.csv",
+    "./samples/check_1_13.csv",
+    "./samples/classify_sample.csv",
+])
+def test_tiled_checks(file_path, monkeypatch):
+    expected = gen_csv_linter(file_path)
+    monkeypatch.setattr(CSVLinter, "PARALLEL_MIN_CELLS", 0)
+    linter = CSVLinter(expected.data, file_path, workers=3)
+    assert linter.column_classify == expected.column_classify
+    for check in ["check_1_2", "check_1_3", "check_1_13"]:
+        assert getattr(linter, check)() == getattr(expected, check)()
+    linter.close()
+
+
+def test_tiled_checks_share_executor(monkeypatch):
+    created = []
+    original_init = ProcessPoolExecutor.__init__
+
+    def init(self, *args, **kwargs):
+        created.append(self)
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(ProcessPoolExecutor, "__init__", init)
+    monkeypatch.setattr(CSVLinter, "PARALLEL_MIN_CELLS", 0)
+    expected = gen_csv_linter("./samples/check_1_13.csv")
+    assert expected.run() and not created
+
+    tables = []
+    original_table_init = SharedTable.__init__
+
+    def table_init(self, *args, **kwargs):
+        tables.append(self)
+        original_table_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(SharedTable, "__init__", table_init)
+
+    # 並列に実行するのは workers を指定した場合のみで、プロセスプールと共有メモリの表は
+    # 1つを使い回す
+    linter = CSVLinter(expected.data, "check_1_13.csv", workers=2)
+    assert linter.run() == expected.run()
+    assert len(created) == 1
+    assert len(tables) == 1
+    linter.close()
+
+
+def test_attach_evicts_previous_table():
+    df = pd.DataFrame({0: ["a", "b"], 1: [1, 2]})
+    names = ["tags", "integers", "floats", "offsets", "data"]
+    with SharedTable(df, [0, 1]) as first, SharedTable(df, [0, 1]) as second:
+        first_blocks = {first.descriptor[name][0] for name in names}
+        second_blocks = {second.descriptor[name][0] for name in names}
+        tiling._attach(first.descriptor)
+        assert first_blocks <= set(tiling._attached_blocks)
+
+        # 別の表のタスクが届いた時点で、以前の表の共有メモリを閉じる
+        tiling._attach(second.descriptor)
+        assert set(tiling._attached_blocks) == second_blocks
+        for block_name in second_blocks:
+            tiling._attached_blocks.pop(block_name).close()
@@ -0,0 +1,92 @@
+import io
+import os
+
+import openpyxl
+import pytest
+
+from opendatalinter import OpenDataLinter
+from opendatalinter.triage import (HIGH_CONFIDENCE, LOW_CONFIDENCE,
+                                   MEDIUM_CONFIDENCE, triage, triage_file)
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+
+
+@pytest.mark.parametrize("filename", [
+    "nb01h0013.csv",
+    "nb01h0013_sjis.csv",
+    "check_1_6.csv",
+    "classify_sample.csv",
+    "expression.xlsx",
+    "since2003_visitor_arrivals.xlsx",
+])
+def test_triage(filename):
+    path = os.path.join(SAMPLES_DIR, filename)
+    with open(path, "rb") as f:
+        data = f.read()
+    linter = OpenDataLinter(data, path)
+    csv_linter = getattr(linter.linter, "csv_linter", linter.linter)
+    csv_linter.prepare(["structure"])
+
+    result = triage(data, path)
+    assert result.confidence == HIGH_CONFIDENCE
+    assert not result.truncated
+    assert (result.title_line_num, result.header_line_num,
+            result.column_count) == (
+                csv_linter.title_line_num, csv_linter.header_line_num,
+                csv_linter.csv_structure_analyzer.get_column_count())
+    if result.kind == "csv":
+        assert result.encoding == csv_linter.encoding
+    assert triage_file(path) == result
+
+
+def test_triage_prefix():
+    text = "統計表\n\n都道府県,市区町村,人口\n" + "".join(
+        f"東京都,千代田区{i},{i * 13}\n" for i in range(30000))
+    for encoding in ["utf-8", "cp932"]:
+        data = text.encode(encoding)
+        result = triage(data, "a.csv")
+        assert result.truncated
+        assert result.scanned_bytes <= 64 * 1024
+        assert result.encoding.lower() in ["utf-8", "shift_jis"]
+        assert (result.title_line_num, result.header_line_num,
+                result.column_count) == (2, 1, 3)
+        assert result.confidence == HIGH_CONFIDENCE
+
+    # 読んだ範囲が ASCII のみの場合、残りの文字コードは分からない
+    data = ("a,b\n" + "1,2\n" * 30000).encode()
+    assert triage(data, "a.csv").confidence == MEDIUM_CONFIDENCE
+    # 表本体が読んだ範囲の末尾まで続いていない場合
+    data = ("都,県\n" + "1,2\n" * 200 + "あ,い,う\n" * 1000).encode()
+    result = triage(data, "a.csv", prefix_size=1024)
+    assert result.encoding == "utf-8"
+    assert result.confidence == MEDIUM_CONFIDENCE
+
+
+def test_triage_excel_prefix():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["タイトル"])
+    ws.append([])
+    ws.append(["都道府県", "人口", "備考"])
+    for i in range(5000):
+        ws.append(["東京都", i, "=B4" if i % 100 == 0 else f"x{i % 7}"])
+    with io.BytesIO() as f:
+        wb.save(f)
+        data = f.getvalue()
+
+    result = triage(data, "a.xlsx", prefix_size=16 * 1024)
+    assert result.truncated
+    assert result.scanned_bytes == 16 * 1024
+    assert (result.title_line_num, result.header_line_num,
+            result.column_count) == (0, 3, 3)
+
+
+def test_triage_unknown():
+    assert triage(b"a,b\n", "a.txt").kind == "other"
+    assert triage(b"not a zip", "a.xlsx").confidence == LOW_CONFIDENCE
+    # 数値を含む行がない場合はヘッダーを推定できない
+    result = triage("あ,い\nう,え\n".encode(), "a.csv")
+    assert result.confidence == LOW_CONFIDENCE
+    assert result.encoding == "utf-8"
+    assert result.header_line_num is None
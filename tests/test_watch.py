@@ -0,0 +1,62 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from opendatalinter.watch import DirectoryWatcher, _is_target
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "samples")
+
+
+def wait_results(watcher: DirectoryWatcher, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        results = watcher.step()
+        if results:
+            return results
+    return []
+
+
+@pytest.mark.parametrize("use_watchdog", [False, True])
+def test_directory_watcher(tmp_path, use_watchdog):
+    if use_watchdog:
+        pytest.importorskip("watchdog")
+    path = str(tmp_path / "data.csv")
+    shutil.copy(os.path.join(SAMPLES_DIR, "check_1_5.csv"), path)
+    (tmp_path / "memo.txt").write_text("not a target")
+
+    watcher = DirectoryWatcher(str(tmp_path),
+                               lambda result: None,
+                               debounce=0.05,
+                               poll_interval=0.05,
+                               use_watchdog=use_watchdog)
+    watcher.start()
+    try:
+        results = wait_results(watcher)
+        assert [r["path"] for r in results] == [path]
+        assert not results[0]["results"]["check_1_5"]["is_valid"]
+
+        # 内容が変わらない保存は lint しない
+        os.utime(path)
+        assert wait_results(watcher, timeout=0.5) == []
+
+        start = time.monotonic()
+        shutil.copy(os.path.join(SAMPLES_DIR, "perfect.csv"), path)
+        results = wait_results(watcher)
+        assert time.monotonic() - start < 1
+        assert [r["path"] for r in results] == [path]
+        assert results[0]["results"]["check_1_5"]["is_valid"]
+
+        os.remove(path)
+        assert wait_results(watcher) == [{"path": path, "deleted": True}]
+    finally:
+        watcher.stop()
+
+
+def test_is_target():
+    assert _is_target("a.csv")
+    assert _is_target("A.CSV")
+    assert _is_target("a.xlsx")
+    assert not _is_target("a.txt")